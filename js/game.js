@@ -49,12 +49,22 @@ const EventBus = {
 // ==================== 题库加载器 ====================
 
 const PuzzleLoader = {
+    // 已加载（或正在加载）的分片 { "easy/0": Promise }
+    _shards: {},
+    
     _getPuzzleDB() {
         if (typeof PUZZLE_DB !== 'undefined') return PUZZLE_DB;
         if (typeof PUZZLE_DB_AA !== 'undefined') return PUZZLE_DB_AA;
         return null;
     },
     
+    // 分片题库清单（仅在没有整体题库时使用）
+    _getManifest() {
+        if (this._getPuzzleDB()) return null;
+        if (typeof PUZZLE_DB_MANIFEST !== 'undefined') return PUZZLE_DB_MANIFEST;
+        return null;
+    },
+    
     _getPuzzles(difficulty) {
         const db = this._getPuzzleDB();
         if (!db) return null;
@@ -63,40 +73,84 @@ const PuzzleLoader = {
         return null;
     },
     
+    // 返回 Promise：分片模式下按需加载所需分片
     getRandomPuzzle(difficulty) {
+        const manifest = this._getManifest();
+        if (manifest) {
+            const entry = manifest.difficulties[difficulty];
+            if (!entry || entry.count === 0) return Promise.resolve(null);
+            return this.getPuzzleByIndex(difficulty, Math.floor(Math.random() * entry.count));
+        }
+        
         const db = this._getPuzzleDB();
         if (!db) {
             console.error('❌ 题库未加载');
-            return null;
+            return Promise.resolve(null);
         }
         
         const puzzles = this._getPuzzles(difficulty);
-        if (!puzzles || puzzles.length === 0) return null;
+        if (!puzzles || puzzles.length === 0) return Promise.resolve(null);
         
         const index = Math.floor(Math.random() * puzzles.length);
-        const puzzle = puzzles[index];
-        
-        // 格式转换：处理压缩数组格式
-        if (!puzzle.gridSize && (puzzle[0] || Array.isArray(puzzle))) {
-            return this._convertPuzzleFormat(puzzle, difficulty, index);
-        }
-        
-        return { ...puzzle, difficulty, index };
+        return Promise.resolve(this._normalize(puzzles[index], difficulty, index));
     },
 
     getPuzzleByIndex(difficulty, index) {
-        const puzzles = this._getPuzzles(difficulty);
-        if (!puzzles || !puzzles[index]) return null;
+        const manifest = this._getManifest();
+        if (manifest) {
+            const entry = manifest.difficulties[difficulty];
+            const shard = entry && entry.shards.find(s => index >= s.start && index < s.end);
+            if (!shard) return Promise.resolve(null);
+            return this._loadShard(manifest, shard).then(data =>
+                this._normalize(data.puzzles[index - shard.start], difficulty, index, data));
+        }
         
-        let puzzle = puzzles[index];
+        const puzzles = this._getPuzzles(difficulty);
+        if (!puzzles || !puzzles[index]) return Promise.resolve(null);
+        return Promise.resolve(this._normalize(puzzles[index], difficulty, index));
+    },
+    
+    _loadShard(manifest, shard) {
+        if (!this._shards[shard.key]) {
+            // 校验和作为版本参数，分片内容变化时绕过缓存
+            const src = `${manifest.baseUrl}${shard.file}?v=${shard.sha256.slice(0, 12)}`;
+            this._shards[shard.key] = this._loadScript(src).then(() => {
+                const data = window.PUZZLE_SHARDS && window.PUZZLE_SHARDS[shard.key];
+                if (!data) throw new Error(`分片数据缺失: ${shard.key}`);
+                return data;
+            }).catch(e => {
+                delete this._shards[shard.key];
+                throw e;
+            });
+        }
+        return this._shards[shard.key];
+    },
+    
+    _loadScript(src) {
+        return new Promise((resolve, reject) => {
+            const script = document.createElement('script');
+            script.src = src;
+            script.onload = resolve;
+            script.onerror = () => reject(new Error(`无法加载: ${src}`));
+            document.head.appendChild(script);
+        });
+    },
+    
+    // 格式转换：处理压缩数组格式；table 为紧凑格式所用的词表（默认整体题库）
+    _normalize(puzzle, difficulty, index, table) {
+        if (!puzzle) return null;
         if (!puzzle.gridSize && (puzzle[0] || Array.isArray(puzzle))) {
-            return this._convertPuzzleFormat(puzzle, difficulty, index);
+            return this._convertPuzzleFormat(puzzle, difficulty, index, table);
         }
-        
         return { ...puzzle, difficulty, index };
     },
     
-    _convertPuzzleFormat(wordsArray, difficulty, index) {
+    _convertPuzzleFormat(wordsArray, difficulty, index, table) {
+        // 紧凑格式：[行数, 列数, 单词编号, 位置, ...]
+        if (typeof wordsArray[0] === 'number') {
+            return this._decodeCompactPuzzle(wordsArray, difficulty, index, table);
+        }
+        
         let maxRow = 0, maxCol = 0;
         wordsArray.forEach(word => {
             const endRow = word.d === 'H' ? word.r : word.r + word.w.length - 1;
@@ -114,6 +168,29 @@ const PuzzleLoader = {
         gridSize.cols = Math.max(gridSize.cols, maxCol + 1);
         
         return { gridSize, words: wordsArray, difficulty, index };
+    },
+    
+    _decodeCompactPuzzle(packed, difficulty, index, table) {
+        const db = table || this._getPuzzleDB();
+        const words = [];
+        for (let i = 2; i < packed.length; i += 2) {
+            const id = packed[i], pos = packed[i + 1];
+            words.push({
+                w: db.words[id],
+                r: pos >> 9,
+                c: (pos >> 1) & 0xFF,
+                d: (pos & 1) ? 'V' : 'H',
+                h: db.hints[id],
+                n: 0
+            });
+        }
+        
+        // 编号：起点按从上到下、从左到右排序，同一起点共用编号
+        const starts = [...new Set(words.map(w => w.r * 256 + w.c))].sort((a, b) => a - b);
+        const numbers = new Map(starts.map((key, i) => [key, i + 1]));
+        words.forEach(w => { w.n = numbers.get(w.r * 256 + w.c); });
+        
+        return { gridSize: { rows: packed[0], cols: packed[1] }, words, difficulty, index };
     }
 };
 
@@ -554,8 +631,12 @@ const GameController = {
     
     newGame(difficulty) {
         this.currentDifficulty = difficulty || this.currentDifficulty;
-        const puzzle = PuzzleLoader.getRandomPuzzle(this.currentDifficulty);
-        
+        return PuzzleLoader.getRandomPuzzle(this.currentDifficulty)
+            .then(puzzle => this._startPuzzle(puzzle))
+            .catch(e => console.error('无法加载谜题', e));
+    },
+    
+    _startPuzzle(puzzle) {
         if (!puzzle) {
             console.error('无法加载谜题');
             return;
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+填字游戏生成器基准测试
+使用固定种子和多种规模的词库测量 PuzzleGenerator.generate 的吞吐量，
+结果保存为 JSON，可与之前的结果对比并检查性能回退
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_db_aa import (
+    AttemptStats, CompactWordBank, Difficulty, FileIO, PuzzleGenerator, WordBank, create_generator,
+    derive_seed
+)
+
+# 默认结果文件，放在已被 .gitignore 忽略的缓存目录中
+DEFAULT_OUTPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache",
+                              "benchmark_results.json")
+
+# ==================== 词库 ====================
+
+# 英文字母频率（用于生成合成词库）
+LETTER_FREQUENCY = {
+    'E': 12.7, 'T': 9.1, 'A': 8.2, 'O': 7.5, 'I': 7.0, 'N': 6.7, 'S': 6.3,
+    'H': 6.1, 'R': 6.0, 'D': 4.3, 'L': 4.0, 'C': 2.8, 'U': 2.8, 'M': 2.4,
+    'W': 2.4, 'F': 2.2, 'G': 2.0, 'Y': 2.0, 'P': 1.9, 'B': 1.5, 'V': 1.0,
+    'K': 0.8, 'J': 0.15, 'X': 0.15, 'Q': 0.1, 'Z': 0.07
+}
+
+def synthetic_words(count: int, seed: int = 0) -> List[str]:
+    """按字母频率生成 count 个不重复的合成单词（长度 3-12）"""
+    rng = random.Random(seed)
+    letters = list(LETTER_FREQUENCY)
+    weights = list(LETTER_FREQUENCY.values())
+    words = set()
+    while len(words) < count:
+        length = rng.randint(3, 12)
+        words.add(''.join(rng.choices(letters, weights, k=length)))
+    return sorted(words)
+
+def load_word_list(name: str, words_file: str) -> List[str]:
+    """按名称加载词库: bundled 为 words.txt，10k/100k 等为合成词库"""
+    if name == 'bundled':
+        return FileIO.load_words(words_file)
+    size = name.lower()
+    multiplier = 1
+    if size.endswith('k'):
+        size, multiplier = size[:-1], 1000
+    return synthetic_words(int(size) * multiplier)
+
+# ==================== 测量 ====================
+
+def percentile(values: List[float], q: float) -> float:
+    """最近秩法百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(q / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+def run_case(words: List[str], difficulty: Difficulty, count: int, seed: int,
+             generator_options: dict, bank_class: type = WordBank) -> dict:
+    """计时运行一组生成：每题使用由固定种子派生的独立种子"""
+    started = time.perf_counter()
+    generator = create_generator(bank_class(words, {}), generator_options)
+    generator._get_context(difficulty)  # 计入上下文与倒排索引的构建时间
+    build_time = time.perf_counter() - started
+    
+    latencies = []
+    successes = 0
+    stats = AttemptStats()
+    total_started = time.perf_counter()
+    cpu_started = time.process_time()
+    for slot in range(count):
+        generator.rng.seed(derive_seed(seed, difficulty, slot))
+        generator.stats = AttemptStats()
+        t0 = time.perf_counter()
+        puzzle = generator.generate(difficulty)
+        if puzzle:
+            puzzle.to_dict()
+            successes += 1
+        latencies.append(time.perf_counter() - t0)
+        stats.merge(generator.stats)
+    elapsed = time.perf_counter() - total_started
+    cpu_seconds = time.process_time() - cpu_started
+    
+    return {
+        'slots': count,
+        'puzzles': successes,
+        'attempts': stats.attempts,
+        'dead_ends': stats.dead_ends,
+        'backtracks': stats.backtracks,
+        'seconds': round(elapsed, 4),
+        'setup_ms': round(build_time * 1000, 2),
+        'cpu_seconds': round(cpu_seconds, 4),
+        'puzzles_per_sec': round(successes / elapsed, 3) if elapsed else 0.0,
+        'puzzles_per_cpu_sec': round(successes / cpu_seconds, 3) if cpu_seconds else 0.0,
+        'attempts_per_puzzle': round(stats.attempts / successes, 3) if successes else None,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+
+def measure_peak_memory(words: List[str], difficulty: Difficulty, count: int, seed: int,
+                        generator_options: dict, bank_class: type = WordBank) -> float:
+    """单独再跑一遍测量峰值内存（tracemalloc 会拖慢计时，因此不与计时同时进行）"""
+    tracemalloc.start()
+    try:
+        generator = create_generator(bank_class(words, {}), generator_options)
+        for slot in range(count):
+            generator.rng.seed(derive_seed(seed, difficulty, slot))
+            puzzle = generator.generate(difficulty)
+            if puzzle:
+                puzzle.to_dict()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return round(peak / (1024 * 1024), 3)
+
+# ==================== 结果对比 ====================
+
+def case_key(result: dict) -> str:
+    return f"{result['wordlist']}/{result['difficulty']}"
+
+def compare(results: List[dict], baseline: List[dict], threshold: float) -> List[str]:
+    """与基线结果对比，返回超出阈值的回退项"""
+    baseline_by_key = {case_key(r): r for r in baseline}
+    regressions = []
+    for result in results:
+        old = baseline_by_key.get(case_key(result))
+        if not old:
+            continue
+        if old['puzzles_per_sec'] and \
+                result['puzzles_per_sec'] < old['puzzles_per_sec'] * (1 - threshold):
+            regressions.append(f"{case_key(result)}: 吞吐量 {old['puzzles_per_sec']} -> "
+                               f"{result['puzzles_per_sec']} 题/秒")
+        if old['p99_ms'] and result['p99_ms'] > old['p99_ms'] * (1 + threshold):
+            regressions.append(f"{case_key(result)}: p99 延迟 {old['p99_ms']} -> "
+                               f"{result['p99_ms']} ms")
+        if old.get('peak_mem_mb') and result.get('peak_mem_mb') and \
+                result['peak_mem_mb'] > old['peak_mem_mb'] * (1 + threshold):
+            regressions.append(f"{case_key(result)}: 峰值内存 {old['peak_mem_mb']} -> "
+                               f"{result['peak_mem_mb']} MB")
+    return regressions
+
+def git_revision() -> Optional[str]:
+    """当前提交（用于标记结果来源）"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ==================== 主程序 ====================
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="填字游戏生成器基准测试")
+    parser.add_argument('--wordlists', default="bundled,10k,100k",
+                        help="逗号分隔的词库: bundled=words.txt, 10k/100k=合成词库 (默认 bundled,10k,100k)")
+    parser.add_argument('--difficulty', action='append',
+                        choices=[d.value for d in Difficulty],
+                        help="只测试指定难度，可重复指定 (默认全部难度)")
+    parser.add_argument('--count', type=int, default=20,
+                        help="每组生成的槽位数 (默认 20)")
+    parser.add_argument('--seed', type=int, default=2024,
+                        help="固定主种子 (默认 2024)")
+    parser.add_argument('--compact-grid', action='store_true',
+                        help="使用位掩码紧凑网格 (CompactGrid)")
+    parser.add_argument('--backtrack', action='store_true',
+                        help="遇到死局时回溯")
+    parser.add_argument('--max-backtracks', type=int,
+                        default=PuzzleGenerator.DEFAULT_MAX_BACKTRACKS,
+                        help=f"回溯模式下每次尝试最多回溯的次数，束搜索中为切换分支的次数 "
+                             f"(默认 {PuzzleGenerator.DEFAULT_MAX_BACKTRACKS})")
+    parser.add_argument('--batch', action='store_true',
+                        help="用 NumPy 批量检查和打分候选（需要安装 numpy）")
+    parser.add_argument('--pattern-scan', action='store_true',
+                        help="按槽位查询词库模式索引来扫描候选")
+    parser.add_argument('--template-fill', action='store_true',
+                        help="使用模板填充引擎 (TemplateFiller)")
+    parser.add_argument('--beam', type=int, default=0, metavar='WIDTH',
+                        help="束搜索宽度，0 为贪心 (默认 0)")
+    parser.add_argument('--beam-branch', type=int, default=5, metavar='K',
+                        help="束搜索中每个状态展开的候选数 (默认 5)")
+    parser.add_argument('--compact-bank', action='store_true',
+                        help="使用内存紧凑的词库 (CompactWordBank)")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="跳过峰值内存测量（省去一遍额外运行）")
+    parser.add_argument('-o', '--output', default=DEFAULT_OUTPUT,
+                        help="结果输出文件 (默认 tools/.cache/benchmark_results.json)")
+    parser.add_argument('--compare', default=None, metavar='BASELINE',
+                        help="与之前保存的结果对比，出现回退时以非零状态退出")
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help="允许的性能回退比例 (默认 0.10，即 10%%)")
+    return parser.parse_args()
+
+def main() -> int:
+    """主函数"""
+    args = parse_args()
+    words_file = os.path.join(os.path.dirname(os.path.abspath(__file__)), "words.txt")
+    difficulties = [Difficulty(v) for v in args.difficulty] if args.difficulty else list(Difficulty)
+    generator_options = {'compact_grid': args.compact_grid, 'backtrack': args.backtrack,
+                         'batch': args.batch, 'pattern_scan': args.pattern_scan,
+                         'template_fill': args.template_fill}
+    if args.backtrack or args.beam > 0:
+        generator_options['max_backtracks'] = args.max_backtracks
+    if args.beam > 0:
+        generator_options.update(beam_width=args.beam, beam_branch=args.beam_branch)
+    bank_class = CompactWordBank if args.compact_bank else WordBank
+    
+    print("=" * 50)
+    print("填字游戏生成器基准测试")
+    print("=" * 50)
+    
+    results = []
+    for name in args.wordlists.split(','):
+        name = name.strip()
+        words = load_word_list(name, words_file)
+        if not words:
+            print(f"错误: 无法加载词库 {name}")
+            return 1
+        print(f"\n词库 {name} ({len(words)} 个单词)")
+        
+        for difficulty in difficulties:
+            result = {'wordlist': name, 'words': len(words), 'difficulty': difficulty.value}
+            result.update(run_case(words, difficulty, args.count, args.seed,
+                                   generator_options, bank_class))
+            if not args.no_memory:
+                result['peak_mem_mb'] = measure_peak_memory(words, difficulty, args.count,
+                                                            args.seed, generator_options,
+                                                            bank_class)
+            results.append(result)
+            print(f"  {difficulty.value:6s}: {result['puzzles']}/{result['slots']} 题, "
+                  f"{result['puzzles_per_sec']} 题/秒, "
+                  f"{result['puzzles_per_cpu_sec']} 题/CPU秒, "
+                  f"尝试/成功 {result['attempts_per_puzzle']}, "
+                  f"p50 {result['p50_ms']} ms, p99 {result['p99_ms']} ms"
+                  + (f", 峰值内存 {result['peak_mem_mb']} MB" if 'peak_mem_mb' in result else ""))
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'seed': args.seed,
+            'count': args.count,
+            'options': dict(generator_options, compact_bank=args.compact_bank),
+        },
+        'results': results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {args.output}")
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline['results'], args.threshold)
+        if regressions:
+            print(f"\n性能回退 (阈值 {args.threshold:.0%}):")
+            for line in regressions:
+                print(f"  - {line}")
+            return 1
+        print(f"\n与基线 {args.compare} 相比无回退 (阈值 {args.threshold:.0%})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,14 +5,32 @@
 生成 puzzle_db_aa.js 供 aa-秒开版.html 使用
 """
 
+import argparse
+import gzip
+import hashlib
+import heapq
 import json
+import math
+import mmap
 import random
 import re
 import os
-from collections import defaultdict
-from typing import List, Dict, Tuple, Optional, Set
+import shutil
+import sys
+import time
+import multiprocessing.pool
+from array import array
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from typing import Callable, Iterator, List, Dict, Tuple, Optional, Set, Union
 from dataclasses import dataclass, field
 from enum import Enum
+from datetime import datetime
+
+try:
+    import numpy as np
+except ImportError:  # 可选依赖：仅批量检查模式（--batch）需要
+    np = None
 
 # ==================== 配置常量 ====================
 
@@ -78,10 +96,16 @@ class Grid:
     rows: int
     cols: int
     cells: List[List[str]] = field(default_factory=list)
+    # 每个格子被哪个横向/纵向单词覆盖 {方向: [[单词或None]]}
+    owners: Dict[str, List[List[Optional[str]]]] = field(default_factory=dict)
     
     def __post_init__(self):
         if not self.cells:
             self.cells = [['' for _ in range(self.cols)] for _ in range(self.rows)]
+        if not self.owners:
+            self.owners = {
+                d: [[None] * self.cols for _ in range(self.rows)] for d in ('H', 'V')
+            }
     
     def get(self, row: int, col: int) -> str:
         """获取格子内容"""
@@ -94,6 +118,17 @@ class Grid:
         if 0 <= row < self.rows and 0 <= col < self.cols:
             self.cells[row][col] = char
     
+    def get_owner(self, row: int, col: int, direction: str) -> Optional[str]:
+        """获取覆盖该格子的指定方向单词"""
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return self.owners[direction][row][col]
+        return None
+    
+    def set_owner(self, row: int, col: int, direction: str, word: Optional[str]):
+        """记录覆盖该格子的指定方向单词（None 表示清除）"""
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            self.owners[direction][row][col] = word
+    
     def is_empty(self, row: int, col: int) -> bool:
         """检查格子是否为空"""
         return self.get(row, col) == ''
@@ -102,7 +137,145 @@ class Grid:
         """复制网格"""
         new_grid = Grid(self.rows, self.cols)
         new_grid.cells = [row[:] for row in self.cells]
+        new_grid.owners = {d: [row[:] for row in rows] for d, rows in self.owners.items()}
+        return new_grid
+
+class CompactGrid:
+    """紧凑网格类（与 Grid 接口相同）
+    
+    字母以字符编码存放在一维数组中（0 表示空格），
+    并维护按行/按列的占用位掩码，供按整段单词进行位运算检查。
+    """
+    
+    def __init__(self, rows: int, cols: int):
+        self.rows = rows
+        self.cols = cols
+        self.codes = array('H', [0]) * (rows * cols)
+        self.row_bits = [0] * rows        # 第 r 行已占用的列
+        self.col_bits = [0] * cols        # 第 c 列已占用的行
+        self.h_cover_rows = [0] * rows    # 第 r 行中被横向单词覆盖的列
+        self.v_cover_cols = [0] * cols    # 第 c 列中被纵向单词覆盖的行
+        self.owners = {d: [None] * (rows * cols) for d in ('H', 'V')}
+    
+    def get(self, row: int, col: int) -> str:
+        """获取格子内容"""
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            code = self.codes[row * self.cols + col]
+            return chr(code) if code else ''
+        return None
+    
+    def set(self, row: int, col: int, char: str):
+        """设置格子内容"""
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            self.codes[row * self.cols + col] = ord(char) if char else 0
+            if char:
+                self.row_bits[row] |= 1 << col
+                self.col_bits[col] |= 1 << row
+            else:
+                self.row_bits[row] &= ~(1 << col)
+                self.col_bits[col] &= ~(1 << row)
+    
+    def get_owner(self, row: int, col: int, direction: str) -> Optional[str]:
+        """获取覆盖该格子的指定方向单词"""
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return self.owners[direction][row * self.cols + col]
+        return None
+    
+    def set_owner(self, row: int, col: int, direction: str, word: Optional[str]):
+        """记录覆盖该格子的指定方向单词（None 表示清除）"""
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            self.owners[direction][row * self.cols + col] = word
+            if direction == 'H':
+                if word:
+                    self.h_cover_rows[row] |= 1 << col
+                else:
+                    self.h_cover_rows[row] &= ~(1 << col)
+            elif word:
+                self.v_cover_cols[col] |= 1 << row
+            else:
+                self.v_cover_cols[col] &= ~(1 << row)
+    
+    def is_empty(self, row: int, col: int) -> bool:
+        """检查格子是否为空"""
+        return self.get(row, col) == ''
+    
+    def copy(self) -> 'CompactGrid':
+        """复制网格"""
+        new_grid = CompactGrid.__new__(CompactGrid)
+        new_grid.rows = self.rows
+        new_grid.cols = self.cols
+        new_grid.codes = array('H', self.codes)
+        new_grid.row_bits = self.row_bits[:]
+        new_grid.col_bits = self.col_bits[:]
+        new_grid.h_cover_rows = self.h_cover_rows[:]
+        new_grid.v_cover_cols = self.v_cover_cols[:]
+        new_grid.owners = {d: cells[:] for d, cells in self.owners.items()}
         return new_grid
+    
+    def span_occupancy(self, word_len: int, pos: Position) -> Tuple[int, int]:
+        """返回单词所在行/列的整段掩码及其中已占用的位"""
+        if pos.direction == 'H':
+            span = ((1 << word_len) - 1) << pos.col
+            return span, self.row_bits[pos.row] & span
+        span = ((1 << word_len) - 1) << pos.row
+        return span, self.col_bits[pos.col] & span
+    
+    def is_valid_span(self, word: str, pos: Position) -> bool:
+        """以位运算检查放置是否有效（规则与 PuzzleGenerator._is_valid_placement 相同）"""
+        word_len = len(word)
+        if pos.row < 0 or pos.col < 0:
+            return False
+        
+        if pos.direction == 'H':
+            line, start, limit = pos.row, pos.col, self.cols
+            if start + word_len > limit or line >= self.rows:
+                return False
+            bits, cover = self.row_bits, self.h_cover_rows
+            lines = self.rows
+        else:
+            line, start, limit = pos.col, pos.row, self.rows
+            if start + word_len > limit or line >= self.cols:
+                return False
+            bits, cover = self.col_bits, self.v_cover_cols
+            lines = self.cols
+        
+        line_bits = bits[line]
+        # 首尾不能紧贴其他字母
+        if start > 0 and line_bits >> (start - 1) & 1:
+            return False
+        end = start + word_len
+        if end < limit and line_bits >> end & 1:
+            return False
+        
+        span = ((1 << word_len) - 1) << start
+        occupied = line_bits & span
+        if not occupied:
+            return False
+        # 交叉点不能已属于同方向的单词（否则两个单词重叠）
+        if occupied & cover[line]:
+            return False
+        
+        # 空格子两侧不能有字母（平行单词或另一方向单词的首尾）
+        empty = span & ~occupied
+        if line > 0 and empty & bits[line - 1]:
+            return False
+        if line < lines - 1 and empty & bits[line + 1]:
+            return False
+        
+        # 交叉点字母必须一致
+        codes, cols = self.codes, self.cols
+        while occupied:
+            low = occupied & -occupied
+            offset = low.bit_length() - 1
+            if pos.direction == 'H':
+                index = line * cols + offset
+            else:
+                index = offset * cols + line
+            if codes[index] != ord(word[offset - start]):
+                return False
+            occupied ^= low
+        
+        return True
 
 @dataclass
 class Puzzle:
@@ -128,6 +301,115 @@ class Puzzle:
             ]
         }
 
+@dataclass
+class AttemptStats:
+    """生成尝试统计"""
+    attempts: int = 0          # 尝试次数
+    failures: int = 0          # 失败的尝试次数
+    dead_ends: int = 0         # 无可用候选（死局）次数
+    backtracks: int = 0        # 回溯撤销的放置次数
+    iterations: int = 0        # 放置循环累计迭代次数
+    fallbacks: int = 0         # 模板填充引擎改用默认引擎的尝试次数
+    failure_time: float = 0.0  # 失败尝试累计耗时（秒）
+    time: float = 0.0          # 全部尝试累计耗时（秒）
+    
+    def merge(self, other: 'AttemptStats'):
+        """累加另一份统计"""
+        self.attempts += other.attempts
+        self.failures += other.failures
+        self.dead_ends += other.dead_ends
+        self.backtracks += other.backtracks
+        self.iterations += other.iterations
+        self.fallbacks += other.fallbacks
+        self.failure_time += other.failure_time
+        self.time += other.time
+    
+    @property
+    def failure_rate(self) -> float:
+        """失败率"""
+        return self.failures / self.attempts if self.attempts else 0.0
+    
+    @property
+    def mean_time_to_failure(self) -> float:
+        """失败尝试的平均耗时（秒）"""
+        return self.failure_time / self.failures if self.failures else 0.0
+
+class GenerationProfile:
+    """生成过程的性能剖析数据（需显式开启）
+    
+    记录放置被拒绝的原因、每题的尝试与迭代次数，以及候选搜索、
+    有效性验证、打分、序列化各阶段的耗时。未开启时生成器不做任何记录。
+    """
+    
+    STAGES = ('candidate_search', 'validation', 'scoring', 'serialization')
+    
+    def __init__(self):
+        self.rejections: Dict[str, int] = defaultdict(int)  # 拒绝原因 -> 次数
+        self.accepted = 0                                    # 通过验证的放置数
+        self.puzzles = 0                                     # 成功生成的谜题数
+        self.failed_puzzles = 0                              # 放弃的谜题数
+        self.attempts_per_puzzle: Dict[int, int] = defaultdict(int)    # 尝试次数分布
+        self.iterations_per_puzzle: Dict[int, int] = defaultdict(int)  # 迭代次数分布
+        self.stats = AttemptStats()
+        self.timers: Dict[str, float] = dict.fromkeys(self.STAGES, 0.0)
+        self.calls: Dict[str, int] = dict.fromkeys(self.STAGES, 0)
+    
+    def add_time(self, stage: str, seconds: float):
+        """累加某阶段耗时"""
+        self.timers[stage] += seconds
+        self.calls[stage] += 1
+    
+    def record_puzzle(self, success: bool, stats: AttemptStats):
+        """记录一题（包含其所有尝试）的结果"""
+        if success:
+            self.puzzles += 1
+        else:
+            self.failed_puzzles += 1
+        self.attempts_per_puzzle[stats.attempts] += 1
+        self.iterations_per_puzzle[stats.iterations] += 1
+    
+    def merge(self, other: 'GenerationProfile'):
+        """累加另一份剖析数据"""
+        for reason, count in other.rejections.items():
+            self.rejections[reason] += count
+        self.accepted += other.accepted
+        self.puzzles += other.puzzles
+        self.failed_puzzles += other.failed_puzzles
+        for n, count in other.attempts_per_puzzle.items():
+            self.attempts_per_puzzle[n] += count
+        for n, count in other.iterations_per_puzzle.items():
+            self.iterations_per_puzzle[n] += count
+        self.stats.merge(other.stats)
+        for stage in self.STAGES:
+            self.timers[stage] += other.timers[stage]
+            self.calls[stage] += other.calls[stage]
+    
+    def to_dict(self) -> dict:
+        """导出为可序列化的字典"""
+        validated = self.accepted + sum(self.rejections.values())
+        return {
+            'puzzles': self.puzzles,
+            'failed_puzzles': self.failed_puzzles,
+            'attempts': self.stats.attempts,
+            'failures': self.stats.failures,
+            'dead_ends': self.stats.dead_ends,
+            'backtracks': self.stats.backtracks,
+            'iterations': self.stats.iterations,
+            'fallbacks': self.stats.fallbacks,
+            'attempts_per_puzzle': {str(n): c for n, c in sorted(self.attempts_per_puzzle.items())},
+            'iterations_per_puzzle': {str(n): c for n, c in sorted(self.iterations_per_puzzle.items())},
+            'validation': {
+                'checked': validated,
+                'accepted': self.accepted,
+                'rejected': dict(sorted(self.rejections.items(), key=lambda x: -x[1])),
+            },
+            # candidate_search 包含其中的 validation 与 scoring
+            'timers': {
+                stage: {'seconds': round(self.timers[stage], 6), 'calls': self.calls[stage]}
+                for stage in self.STAGES
+            },
+        }
+
 # ==================== 词库管理 ====================
 
 class WordBank:
@@ -136,6 +418,9 @@ class WordBank:
     def __init__(self, words: List[str], hints: Dict[str, str]):
         self.words = [w.upper().strip() for w in words if w.strip()]
         self.hints = {k.upper(): v for k, v in hints.items()}
+        # 词典提示库：提示表中没有的单词再到这里查找
+        self.hint_store: Optional['HintStore'] = None
+        self._fingerprint: Optional[str] = None
         self._build_index()
     
     def _build_index(self):
@@ -150,10 +435,60 @@ class WordBank:
         for word in self.words:
             for i, char in enumerate(word):
                 self.by_char_at[(i, char)].append(word)
+        
+        # 按长度范围缓存的 字母 -> (单词, 位置) 倒排索引
+        self._char_index_cache: Dict[Tuple[int, int], Dict[str, List[Tuple[str, int]]]] = {}
+        # 按长度缓存的模式查询位图
+        self._pattern_cache: Dict[int, Tuple[List[str], Dict[Tuple[int, str], int]]] = {}
+    
+    @classmethod
+    def from_index(cls, words: List[str], hints: Dict[str, str],
+                   by_length: Mapping, by_char_at: Mapping) -> 'WordBank':
+        """由已构建好的索引直接创建（用于磁盘缓存）"""
+        bank = cls.__new__(cls)
+        bank.words = words
+        bank.hints = hints
+        bank.hint_store = None
+        bank.by_length = by_length
+        bank.by_char_at = by_char_at
+        bank._char_index_cache = {}
+        bank._pattern_cache = {}
+        bank._fingerprint = None
+        return bank
+    
+    def fingerprint(self) -> str:
+        """词库内容（单词及其顺序、非空提示、词典提示库）的指纹，与索引实现无关"""
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for word in self.words:
+                digest.update(word.encode('utf-8') + b'\n')
+            digest.update(b'\0')
+            for word, hint in sorted(self.hints.items()):
+                if hint:
+                    digest.update(f"{word}\t{hint}\n".encode('utf-8'))
+            if self.hint_store is not None:
+                digest.update(f"\0{self.hint_store.fingerprint()}".encode('utf-8'))
+            self._fingerprint = digest.hexdigest()[:32]
+        return self._fingerprint
+    
+    def set_hint_store(self, hint_store: Optional['HintStore']):
+        """设置词典提示库（提示表优先）"""
+        self.hint_store = hint_store
+        self._fingerprint = None
+    
+    def has_hint(self, word: str) -> bool:
+        """单词是否有真实提示（提示表或词典提示库中）"""
+        word = word.upper()
+        return bool(self.hints.get(word)) or \
+            (self.hint_store is not None and word in self.hint_store)
     
     def get_hint(self, word: str) -> str:
-        """获取单词提示"""
-        return self.hints.get(word.upper(), f"Definition of {word}")
+        """获取单词提示：先查提示表，再查词典提示库，都没有时为占位提示"""
+        word = word.upper()
+        hint = self.hints.get(word)
+        if not hint and self.hint_store is not None:
+            hint = self.hint_store.get(word)
+        return hint or f"Definition of {word}"
     
     def get_words_by_length(self, min_len: int, max_len: int) -> List[str]:
         """获取指定长度范围的单词"""
@@ -167,63 +502,548 @@ class WordBank:
         """获取在指定位置有指定字母的单词"""
         candidates = self.by_char_at.get((position, char.upper()), [])
         return [w for w in candidates if min_len <= len(w) <= max_len]
+    
+    def get_char_index(self, min_len: int, max_len: int) -> Dict[str, List[Tuple[str, int]]]:
+        """获取指定长度范围内的倒排索引 {字母: [(单词, 位置)]}（按长度范围缓存）"""
+        key = (min_len, max_len)
+        if key not in self._char_index_cache:
+            index: Dict[str, List[Tuple[str, int]]] = defaultdict(list)
+            for (position, char), words in self.by_char_at.items():
+                for word in words:
+                    if min_len <= len(word) <= max_len:
+                        index[char].append((word, position))
+            self._char_index_cache[key] = dict(index)
+        return self._char_index_cache[key]
+    
+    def match_pattern(self, pattern: str) -> List[str]:
+        """获取符合模式的单词，'?' 表示任意字母，如 '?A??E?S'"""
+        pattern = pattern.upper()
+        return self.match_constraints(len(pattern), [(i, char) for i, char in enumerate(pattern)
+                                                     if char != '?'])
+    
+    def match_constraints(self, length: int, constraints: List[Tuple[int, str]]) -> List[str]:
+        """获取长度为 length 且在各 (位置, 字母) 上一致的单词（按 by_length 中的顺序）
+        
+        每个 (位置, 字母) 对应一个位图（第 i 位表示该长度的第 i 个单词），
+        查询时按位与，再逐个取出结果位，耗时与结果数量成正比。
+        """
+        words, bitsets = self._pattern_index(length)
+        if not constraints:
+            return list(words)
+        bits = -1
+        for position, char in constraints:
+            bits &= bitsets.get((position, char), 0)
+            if not bits:
+                return []
+        result = []
+        while bits:
+            lowest = bits & -bits
+            result.append(words[lowest.bit_length() - 1])
+            bits ^= lowest
+        return result
+    
+    def _pattern_index(self, length: int) -> Tuple[List[str], Dict[Tuple[int, str], int]]:
+        """该长度的单词列表及 {(位置, 字母): 位图}（首次查询时构建）"""
+        entry = self._pattern_cache.get(length)
+        if entry is None:
+            words = self.get_words_by_length(length, length)
+            members: Dict[Tuple[int, str], List[int]] = defaultdict(list)
+            for i, word in enumerate(words):
+                for position, char in enumerate(word):
+                    members[(position, char)].append(i)
+            bitsets = {}
+            for key, ids in members.items():
+                mask = bytearray((len(words) + 7) // 8)
+                for i in ids:
+                    mask[i >> 3] |= 1 << (i & 7)
+                bitsets[key] = int.from_bytes(mask, 'little')
+            entry = self._pattern_cache[length] = (words, bitsets)
+        return entry
+
+class CharPostings:
+    """某个字母的倒排表：单词编号与字母位置两个紧凑数组，迭代时产出 (单词, 位置)"""
+    
+    __slots__ = ('words', 'ids', 'positions')
+    
+    def __init__(self, words: List[str]):
+        self.words = words
+        self.ids = array('I')
+        self.positions = array('B')
+    
+    def __iter__(self) -> Iterator[Tuple[str, int]]:
+        return zip(map(self.words.__getitem__, self.ids), self.positions)
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+
+class CompactWordBank(WordBank):
+    """内存紧凑的词库
+    
+    每个单词只保存一份字符串，并以其在 words 中的下标作为编号，长度存为 uint8 数组；
+    by_length / by_char_at 的值是单词编号数组而不是字符串列表，
+    get_char_index 返回 CharPostings。查询结果与 WordBank 完全一致。
+    """
+    
+    def _build_index(self):
+        """构建紧凑索引"""
+        self._build_lengths()
+        lengths = self.lengths
+        
+        self.by_length: Dict[int, array] = {}
+        self.by_char_at: Dict[Tuple[int, str], array] = {}
+        for word_id, word in enumerate(self.words):
+            postings = self.by_length.get(lengths[word_id])
+            if postings is None:
+                postings = self.by_length[lengths[word_id]] = array('I')
+            postings.append(word_id)
+            for i, char in enumerate(word):
+                postings = self.by_char_at.get((i, char))
+                if postings is None:
+                    postings = self.by_char_at[(i, char)] = array('I')
+                postings.append(word_id)
+        
+        self._char_index_cache: Dict[Tuple[int, int], Dict[str, CharPostings]] = {}
+        self._pattern_cache: Dict[int, Tuple[List[str], Dict[Tuple[int, str], int]]] = {}
+    
+    def _build_lengths(self):
+        """单词长度数组（按编号查询长度，不必访问字符串）"""
+        self.lengths = array('B', (len(w) for w in self.words))
+    
+    @classmethod
+    def from_index(cls, words: List[str], hints: Dict[str, str],
+                   by_length: Mapping, by_char_at: Mapping) -> 'CompactWordBank':
+        """由单词编号索引直接创建（用于磁盘缓存）"""
+        bank = super().from_index(words, hints, by_length, by_char_at)
+        bank._build_lengths()
+        return bank
+    
+    def get_words_by_length(self, min_len: int, max_len: int) -> List[str]:
+        """获取指定长度范围的单词"""
+        words = self.words
+        result = []
+        for length in range(min_len, max_len + 1):
+            result.extend(words[i] for i in self.by_length.get(length, ()))
+        return result
+    
+    def get_words_with_char_at(self, position: int, char: str,
+                                min_len: int = 3, max_len: int = 15) -> List[str]:
+        """获取在指定位置有指定字母的单词"""
+        words, lengths = self.words, self.lengths
+        return [words[i] for i in self.by_char_at.get((position, char.upper()), ())
+                if min_len <= lengths[i] <= max_len]
+    
+    def get_char_index(self, min_len: int, max_len: int) -> Dict[str, CharPostings]:
+        """获取指定长度范围内的倒排索引 {字母: CharPostings}（按长度范围缓存）"""
+        key = (min_len, max_len)
+        if key not in self._char_index_cache:
+            lengths = self.lengths
+            index: Dict[str, CharPostings] = {}
+            for (position, char), ids in self.by_char_at.items():
+                selected = [i for i in ids if min_len <= lengths[i] <= max_len]
+                if not selected:
+                    continue
+                entry = index.get(char)
+                if entry is None:
+                    entry = index[char] = CharPostings(self.words)
+                entry.ids.extend(selected)
+                entry.positions.extend([position] * len(selected))
+            self._char_index_cache[key] = index
+        return self._char_index_cache[key]
+
+class PostingsView(Mapping):
+    """内存映射的倒排表：按需把单词编号还原为单词列表并缓存"""
+    
+    def __init__(self, words: List[str], postings: memoryview,
+                 spans: Dict[object, Tuple[int, int]]):
+        self._words = words
+        self._postings = postings
+        self._spans = spans  # 键 -> (起始下标, 数量)
+        self._cache: Dict[object, List[str]] = {}
+    
+    def __getitem__(self, key) -> List[str]:
+        result = self._cache.get(key)
+        if result is None:
+            start, count = self._spans[key]
+            words = self._words
+            result = [words[i] for i in self._postings[start:start + count]]
+            self._cache[key] = result
+        return result
+    
+    def __iter__(self):
+        return iter(self._spans)
+    
+    def __len__(self) -> int:
+        return len(self._spans)
+
+class WordBankCache:
+    """词库索引的磁盘缓存
+    
+    以词库文件和HTML提示文件内容的哈希为键，把单词表、提示表以及
+    by_length/by_char_at 索引（单词编号的 int32 数组）写入一个二进制文件。
+    输入不变时直接内存映射该文件，倒排表按需还原，无需重新解析和建索引；
+    输入变化时哈希随之变化，自动重新构建。不同输入（词库、提示文件、
+    require_hints 与提示库）各有各的缓存文件，交替使用时互不删除，
+    目录中按最近使用时间保留 MAX_ENTRIES 个。
+    
+    文件结构: MAGIC | 头部长度(u32) | JSON头部 | 对齐填充 | 单词 | 提示 | 倒排表
+    """
+    
+    VERSION = 1
+    MAGIC = b'WBC1'
+    # 缓存目录中最多保留的词库缓存文件数
+    MAX_ENTRIES = 8
+    
+    def __init__(self, cache_dir: str = ".cache"):
+        self.cache_dir = cache_dir
+    
+    @classmethod
+    def input_key(cls, *paths: str) -> str:
+        """输入文件内容的哈希（文件不存在时按空内容计算）"""
+        digest = hashlib.sha256(f"{cls.VERSION}:{sys.byteorder}".encode('utf-8'))
+        for path in paths:
+            digest.update(b'\0')
+            if os.path.exists(path):
+                with open(path, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1 << 20), b''):
+                        digest.update(chunk)
+        return digest.hexdigest()[:16]
+    
+    def path_for(self, key: str) -> str:
+        """缓存文件路径"""
+        return os.path.join(self.cache_dir, f"wordbank-{key}.bin")
+    
+    def ensure(self, words_file: str, html_file: str, hint_store: Optional[str] = None,
+               require_hints: bool = False) -> Optional[str]:
+        """确保缓存存在且与输入一致，返回缓存文件路径；无法加载词库时返回 None
+        
+        require_hints 为 True 时只保留有提示的单词（提示表或 hint_store 指定的词典提示库中），
+        此时缓存还取决于提示库的内容。
+        """
+        key = self.input_key(words_file, html_file)
+        store = HintStore(hint_store) if hint_store else None
+        if require_hints:
+            source = store.fingerprint() if store else ''
+            key = hashlib.sha256(f"{key}:hinted:{source}".encode('utf-8')).hexdigest()[:16]
+        path = self.path_for(key)
+        if os.path.exists(path):
+            # 更新修改时间，淘汰时按最近使用排序
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            print(f"词库索引缓存命中: {path}")
+            return path
+        
+        words = FileIO.load_words(words_file)
+        hints = HintExtractor.extract_from_html(html_file)
+        if require_hints:
+            words = words_with_hints(words, hints, store)
+        if not words:
+            return None
+        self.save(WordBank(words, hints), path)
+        self._evict(path)
+        print(f"词库索引缓存已更新: {path}")
+        return path
+    
+    def load_or_build(self, words_file: str, html_file: str,
+                      compact: bool = False) -> Optional[WordBank]:
+        """从缓存加载词库，必要时先构建缓存"""
+        path = self.ensure(words_file, html_file)
+        return self.load(path, compact) if path else None
+    
+    @classmethod
+    def save(cls, bank: WordBank, path: str):
+        """把词库及其索引写入缓存文件（先写临时文件再原子替换）"""
+        if isinstance(bank, CompactWordBank):
+            to_ids = list  # 紧凑词库的索引本身就是单词编号
+        else:
+            ids: Dict[str, int] = {}
+            for i, word in enumerate(bank.words):
+                ids.setdefault(word, i)
+            to_ids = lambda words: [ids[w] for w in words]
+        
+        postings = array('i')
+        by_length = {}
+        for length, words in bank.by_length.items():
+            by_length[str(length)] = [len(postings), len(words)]
+            postings.extend(to_ids(words))
+        by_char_at = {}
+        for (position, char), words in bank.by_char_at.items():
+            by_char_at[f"{position}:{char}"] = [len(postings), len(words)]
+            postings.extend(to_ids(words))
+        
+        # 提示按单词编号对齐存储；只保留词库中单词的提示
+        words_blob = '\n'.join(bank.words).encode('utf-8')
+        hints_blob = '\n'.join(bank.hints.get(w, '').replace('\n', ' ')
+                               for w in bank.words).encode('utf-8')
+        hints_blob += b'\0' if bank.words else b''
+        words_size = len(words_blob)
+        hints_size = len(hints_blob)
+        postings_offset = (words_size + hints_size + 3) & ~3
+        header = json.dumps({
+            'version': cls.VERSION,
+            'word_count': len(bank.words),
+            'words': [0, words_size],
+            'hints': [words_size, hints_size],
+            'postings': [postings_offset, len(postings)],
+            'by_length': by_length,
+            'by_char_at': by_char_at,
+        }, separators=(',', ':')).encode('utf-8')
+        data_start = (8 + len(header) + 3) & ~3
+        
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = path + '.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(cls.MAGIC)
+            f.write(len(header).to_bytes(4, 'little'))
+            f.write(header)
+            f.write(b'\0' * (data_start - 8 - len(header)))
+            f.write(words_blob)
+            f.write(hints_blob)
+            f.write(b'\0' * (postings_offset - words_size - hints_size))
+            postings.tofile(f)
+        os.replace(temp_path, path)
+    
+    @classmethod
+    def load(cls, path: str, compact: bool = False) -> WordBank:
+        """内存映射缓存文件并创建词库
+        
+        compact 为 True 时创建 CompactWordBank，索引直接引用映射内存中的编号数组。
+        """
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if data[:4] != cls.MAGIC:
+            raise ValueError(f"不是词库缓存文件: {path}")
+        header_size = int.from_bytes(data[4:8], 'little')
+        header = json.loads(data[8:8 + header_size])
+        if header['version'] != cls.VERSION:
+            raise ValueError(f"词库缓存版本不匹配: {path}")
+        base = (8 + header_size + 3) & ~3
+        
+        words: List[str] = []
+        hints: Dict[str, str] = {}
+        if header['word_count']:
+            start, size = header['words']
+            words = data[base + start:base + start + size].decode('utf-8').split('\n')
+            start, size = header['hints']
+            hint_list = data[base + start:base + start + size - 1].decode('utf-8').split('\n')
+            hints = {w: h for w, h in zip(words, hint_list) if h}
+        
+        start, count = header['postings']
+        postings = memoryview(data)[base + start:base + start + count * 4].cast('i')
+        if compact:
+            by_length = {int(length): postings[offset:offset + n]
+                         for length, (offset, n) in header['by_length'].items()}
+            by_char_at = {(int(key[:-2]), key[-1]): postings[offset:offset + n]
+                          for key, (offset, n) in header['by_char_at'].items()}
+            return CompactWordBank.from_index(words, hints, by_length, by_char_at)
+        
+        by_length = PostingsView(words, postings, {
+            int(length): tuple(span) for length, span in header['by_length'].items()
+        })
+        by_char_at = PostingsView(words, postings, {
+            (int(key[:-2]), key[-1]): tuple(span) for key, span in header['by_char_at'].items()
+        })
+        return WordBank.from_index(words, hints, by_length, by_char_at)
+    
+    def _evict(self, keep: str):
+        """缓存文件超过 MAX_ENTRIES 个时删除最久未使用的（keep 除外）"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith('wordbank-') and name.endswith('.bin') and \
+                    os.path.abspath(path) != os.path.abspath(keep):
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+        entries.sort(reverse=True)
+        for _, path in entries[max(self.MAX_ENTRIES - 1, 0):]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
 
 # ==================== 谜题生成器 ====================
 
 class PuzzleGenerator:
     """谜题生成器"""
     
-    def __init__(self, word_bank: WordBank):
+    DEFAULT_MAX_ATTEMPTS = 50
+    DEFAULT_MAX_BACKTRACKS = 20
+    # 回溯模式中每层按得分顺序保留的候选数
+    BACKTRACK_BRANCH = 5
+    # 束搜索中父分支每个开放锚点折算的得分（前瞻项）
+    LOOKAHEAD_WEIGHT = 2.0
+    
+    def __init__(self, word_bank: WordBank, seed: Optional[int] = None,
+                 compact_grid: bool = False, backtrack: bool = False,
+                 max_backtracks: int = DEFAULT_MAX_BACKTRACKS, profile: bool = False,
+                 batch: bool = False,
+                 pattern_scan: bool = False, beam_width: int = 0, beam_branch: int = 5):
         self.word_bank = word_bank
+        # 网格实现：默认 Grid，可选位掩码实现 CompactGrid
+        self.grid_class = CompactGrid if compact_grid else Grid
+        # 束搜索：每层保留排名最高的 beam_width 个分支（0 表示贪心），
+        # 每个分支展开其前 beam_branch 个候选
+        self.beam_width = max(0, beam_width)
+        self.beam_branch = max(1, beam_branch)
+        # 回溯模式：按得分顺序试放候选并做前向检查，遇到死局时撤销最近的放置
+        # 而不是放弃整次尝试
+        if backtrack and self.beam_width:
+            print("警告: 束搜索不使用回溯，已关闭回溯模式")
+            backtrack = False
+        self.backtrack = backtrack
+        self.max_backtracks = max_backtracks
+        # 每题最多尝试次数（调度器会按观察到的成功率调整）
+        self.max_attempts = self.DEFAULT_MAX_ATTEMPTS
+        # 批量模式：用 NumPy 一次检查并打分锚点上的全部候选（结果与逐个检查相同）
+        if batch and np is None:
+            print("警告: 未安装 NumPy，批量模式不可用，改为逐个检查")
+            batch = False
+        if batch and profile:
+            print("警告: 性能剖析需要逐个检查候选，已关闭批量模式")
+            batch = False
+        self.batch = batch
+        # 模式扫描：按包含锚点的槽位查询 WordBank 模式索引（结果与逐个检查相同）
+        if pattern_scan and profile:
+            print("警告: 性能剖析需要逐个检查候选，已关闭模式扫描")
+            pattern_scan = False
+        self.pattern_scan = pattern_scan
+        # 使用独立的随机数生成器，保证相同种子可复现
+        self.rng = random.Random(seed)
+        self.stats = AttemptStats()
+        # 各难度的可复用生成上下文
+        self._contexts: Dict[Difficulty, GenerationContext] = {}
+        # 性能剖析（默认关闭；开启时用计时包装替换热点方法，关闭时没有额外开销）
+        self.profile: Optional[GenerationProfile] = None
+        if profile:
+            self.profile = GenerationProfile()
+            self._instrument()
     
-    def generate(self, difficulty: Difficulty) -> Optional[Puzzle]:
-        """生成一个谜题"""
-        config = DIFFICULTY_CONFIG[difficulty]
-        grid_size = config['grid_size']
-        word_count_range = config['word_count_range']
-        word_length_range = config['word_length_range']
+    def _instrument(self):
+        """用记录耗时和拒绝原因的包装替换实例上的热点方法"""
+        scan_anchor = self._scan_anchor
+        is_valid_placement = self._is_valid_placement
+        calculate_score = self._calculate_score
+        perf_counter = time.perf_counter
         
-        # 获取符合长度要求的单词
-        available_words = self.word_bank.get_words_by_length(
-            word_length_range[0], word_length_range[1]
-        )
+        def timed_scan_anchor(*args):
+            started = perf_counter()
+            result = scan_anchor(*args)
+            self.profile.add_time('candidate_search', perf_counter() - started)
+            return result
+        
+        def timed_is_valid_placement(grid, word, pos):
+            started = perf_counter()
+            valid = is_valid_placement(grid, word, pos)
+            self.profile.add_time('validation', perf_counter() - started)
+            if valid:
+                self.profile.accepted += 1
+            else:
+                self.profile.rejections[self._placement_rejection(grid, word, pos)] += 1
+            return valid
+        
+        def timed_calculate_score(grid, word, pos):
+            started = perf_counter()
+            score = calculate_score(grid, word, pos)
+            self.profile.add_time('scoring', perf_counter() - started)
+            return score
+        
+        self._scan_anchor = timed_scan_anchor
+        self._is_valid_placement = timed_is_valid_placement
+        self._calculate_score = timed_calculate_score
+    
+    def generate(self, difficulty: Difficulty, seed: Optional[int] = None) -> Optional[Puzzle]:
+        """生成一个谜题
         
-        if len(available_words) < word_count_range[1]:
-            print(f"警告: 可用单词不足 ({len(available_words)})")
+        给出 seed 时本次调用使用独立的随机数生成器，结果只取决于种子、词库、
+        难度配置和 output_options()，且不影响生成器自身的随机序列。
+        """
+        if seed is not None:
+            rng = self.rng
+            self.rng = random.Random(seed)
+            try:
+                return self.generate(difficulty)
+            finally:
+                self.rng = rng
+        
+        ctx = self._get_context(difficulty)
+        
+        if len(ctx.base_words) < ctx.word_count_range[1]:
+            print(f"警告: 可用单词不足 ({len(ctx.base_words)})")
             return None
         
         # 尝试生成
-        max_attempts = 50
-        for attempt in range(max_attempts):
-            result = self._try_generate(
-                grid_size, 
-                word_count_range,
-                available_words.copy()
-            )
-            if result:
+        if self.profile is not None:
+            before = self.stats
+            self.stats = AttemptStats()
+        puzzle = None
+        for attempt in range(self.max_attempts):
+            started = time.perf_counter()
+            self.stats.attempts += 1
+            result = self._try_generate(ctx)
+            elapsed = time.perf_counter() - started
+            self.stats.time += elapsed
+            if not result:
+                self.stats.failures += 1
+                self.stats.failure_time += elapsed
+            else:
                 puzzle = Puzzle(
-                    grid_size=grid_size,
+                    grid_size=ctx.grid_size,
                     words=result,
                     difficulty=difficulty.value
                 )
                 self._assign_numbers(puzzle)
                 self._assign_hints(puzzle)
-                return puzzle
+                break
         
-        return None
+        if self.profile is not None:
+            # 单独统计本题，再并回累计统计
+            self.profile.record_puzzle(puzzle is not None, self.stats)
+            self.profile.stats.merge(self.stats)
+            before.merge(self.stats)
+            self.stats = before
+        return puzzle
     
-    def _try_generate(self, grid_size: Tuple[int, int], 
-                      word_count_range: Tuple[int, int],
-                      available_words: List[str]) -> Optional[List[PlacedWord]]:
-        """尝试生成一个谜题"""
-        grid = Grid(grid_size[0], grid_size[1])
-        placed_words: List[PlacedWord] = []
-        used_words: Set[str] = set()
+    def output_options(self) -> dict:
+        """影响生成结果的选项（可传给 create_generator 重建生成器；其余选项只影响速度）"""
+        options = {'backtrack': self.backtrack, 'max_backtracks': self.max_backtracks}
+        if self.beam_width:
+            options.update(beam_width=self.beam_width, beam_branch=self.beam_branch)
+        return options
+    
+    def fingerprint(self) -> str:
+        """按种子复现谜题所需的全部输入的指纹：词库、难度配置与 output_options()"""
+        config = {d.value: [DIFFICULTY_CONFIG[d][key] for key in
+                            ('grid_size', 'word_count_range', 'word_length_range')]
+                  for d in Difficulty}
+        payload = json.dumps({'bank': self.word_bank.fingerprint(), 'config': config,
+                              'options': self.output_options()}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+    
+    def _get_context(self, difficulty: Difficulty) -> 'GenerationContext':
+        """获取（必要时创建）指定难度的可复用生成上下文"""
+        ctx = self._contexts.get(difficulty)
+        if ctx is None:
+            ctx = GenerationContext(self, difficulty)
+            self._contexts[difficulty] = ctx
+        return ctx
+    
+    def _start_attempt(self, ctx: 'GenerationContext') -> Optional[int]:
+        """开始新一轮尝试：打乱单词并放置种子词，返回目标单词数；没有合适的种子词时返回 None"""
+        ctx.reset()
+        grid_size = ctx.grid_size
+        word_count_range = ctx.word_count_range
+        available_words = ctx.words
         
-        target_count = random.randint(word_count_range[0], word_count_range[1])
+        target_count = self.rng.randint(word_count_range[0], word_count_range[1])
         
         # 随机打乱单词顺序
-        random.shuffle(available_words)
+        self.rng.shuffle(available_words)
+        # 打乱后的顺序决定同分候选的先后
+        for rank, word in enumerate(available_words):
+            ctx.word_rank[word] = rank
         
         # 放置第一个单词（种子词）
         seed_word = self._select_seed_word(available_words, grid_size)
@@ -231,60 +1051,172 @@ class PuzzleGenerator:
             return None
         
         seed_pos = self._get_center_position(seed_word, grid_size, 'H')
-        self._place_word(grid, seed_word, seed_pos)
-        placed_words.append(PlacedWord(
-            word=seed_word,
-            row=seed_pos.row,
-            col=seed_pos.col,
-            direction=seed_pos.direction
-        ))
-        used_words.add(seed_word)
+        ctx.place(seed_word, seed_pos)
+        return target_count
+    
+    def _try_generate(self, ctx: 'GenerationContext') -> Optional[List[PlacedWord]]:
+        """尝试生成一个谜题"""
+        if self.beam_width:
+            return self._try_beam(ctx)
+        target_count = self._start_attempt(ctx)
+        if target_count is None:
+            return None
+        word_count_range = ctx.word_count_range
+        placed_words = ctx.placed_words
         
         # 迭代放置更多单词
         max_iterations = 500
         iteration = 0
+        # 回溯模式下每层通过前向检查、尚未尝试的其他候选（得分高的在末尾）
+        alternatives: List[List[Tuple[str, Position]]] = []
+        backtracks = 0
         
         while len(placed_words) < target_count and iteration < max_iterations:
             iteration += 1
             
             # 找到最佳放置方案
-            best_placement = self._find_best_placement(
-                grid, placed_words, available_words, used_words
-            )
+            if self.backtrack:
+                # 按得分顺序；还需要更多单词时跳过会让所有锚点失去候选的放置
+                candidates = ctx.pool.top(self.BACKTRACK_BRANCH)
+                if len(placed_words) + 1 < word_count_range[0]:
+                    candidates = [(word, pos) for word, pos in candidates
+                                  if ctx.pool.forward_check(word, pos)]
+                candidates.reverse()
+                best_placement = candidates.pop() if candidates else None
+            else:
+                best_placement = self._find_best_placement(ctx.pool)
             
             if not best_placement:
-                continue
+                # 死局：没有任何候选，网格不会再变化
+                self.stats.dead_ends += 1
+                if not self.backtrack or len(placed_words) >= word_count_range[0]:
+                    break
+                
+                # 没有可行候选：撤销放置，直到某一层还有未尝试的候选
+                while alternatives and not alternatives[-1]:
+                    alternatives.pop()
+                    ctx.undo()
+                if not alternatives or backtracks >= self.max_backtracks:
+                    break
+                
+                ctx.undo()
+                backtracks += 1
+                self.stats.backtracks += 1
+                best_placement = alternatives[-1].pop()
+                candidates = None
             
             word, position = best_placement
-            self._place_word(grid, word, position)
-            placed_words.append(PlacedWord(
-                word=word,
-                row=position.row,
-                col=position.col,
-                direction=position.direction
-            ))
-            used_words.add(word)
+            ctx.place(word, position)
+            if self.backtrack and candidates is not None:
+                alternatives.append(candidates)
+        
+        self.stats.iterations += iteration
         
         # 检查是否达到最小单词数
         if len(placed_words) < word_count_range[0]:
             return None
         
-        return placed_words
+        return list(placed_words)
+    
+    def _try_beam(self, ctx: 'GenerationContext') -> Optional[List[PlacedWord]]:
+        """以束搜索尝试生成一个谜题
+        
+        分支不复制网格：每个分支只记录从种子词起的放置步骤，共享上下文中的网格，
+        切换分支时按撤销日志回退到公共前缀再重放，同一时刻只物化一个分支。
+        展开分支时先按估计排名（累计放置得分 + 本步得分 + 父分支开放锚点数 × LOOKAHEAD_WEIGHT）
+        给前 beam_branch 个候选排序，每层只保留前 beam_width 个未展开的分支
+        （放置同一组单词的分支只保留一个；还需要更多单词时跳过通不过前向检查的候选），
+        选中后才物化。每次沿当前层排名最高的分支前进，不需要切换时代价与贪心相同。
+        达到目标单词数，或已达最少单词数但无法扩展时返回当前布局；
+        不足最少单词数时切换到最深一层排名最高的未展开分支（最多 max_backtracks 次）。
+        """
+        target_count = self._start_attempt(ctx)
+        if target_count is None:
+            return None
+        min_count = ctx.word_count_range[0]
+        seed_count = len(ctx.placed_words)
+        
+        # 当前物化分支的放置步骤 (单词, 位置) 与累计放置得分
+        path: List[Tuple[str, Position]] = []
+        score = 0.0
+        # 第 d 层（已放置 d 步）未展开的分支: (-排名, 序号, 步骤, 累计得分)，按排名排序
+        levels: List[List[Tuple[float, int, List[Tuple[str, Position]], float]]] = []
+        seen: Set[frozenset] = set()
+        order = 0
+        iteration = 0
+        switches = 0
+        
+        while seed_count + len(path) < target_count and iteration < 500:
+            iteration += 1
+            depth = len(path)
+            levels.append([])
+            
+            # 子分支未物化，前瞻项按父分支的开放锚点数估计（同层不同父分支间才有差别）
+            lookahead = self.LOOKAHEAD_WEIGHT * len(ctx.pool.open_anchors)
+            key = frozenset((word, pos.row, pos.col, pos.direction) for word, pos in path)
+            level = levels[depth]
+            check = seed_count + depth + 1 < min_count
+            for move_score, word, pos in ctx.pool.top_scored(self.beam_branch):
+                child_key = key | {(word, pos.row, pos.col, pos.direction)}
+                if child_key in seen:
+                    continue
+                seen.add(child_key)
+                if check and not ctx.pool.forward_check(word, pos):
+                    continue
+                rank = score + move_score + lookahead
+                level.append((-rank, order, path + [(word, pos)], score + move_score))
+                order += 1
+            level.sort(key=lambda entry: entry[:2])
+            del level[self.beam_width:]
+            
+            if not level:
+                self.stats.dead_ends += 1
+                if seed_count + depth >= min_count:
+                    break
+                # 切换到最深一层排名最高的未展开分支
+                while levels and not levels[-1]:
+                    levels.pop()
+                if not levels or switches >= self.max_backtracks:
+                    break
+                level = levels[-1]
+                switches += 1
+                self.stats.backtracks += 1
+            
+            _, _, steps, score = level.pop(0)
+            self._switch_branch(ctx, path, steps)
+            path = steps
+        
+        self.stats.iterations += iteration
+        if seed_count + len(path) < min_count:
+            return None
+        return list(ctx.placed_words)
+    
+    def _switch_branch(self, ctx: 'GenerationContext', path: List[Tuple[str, Position]],
+                       steps: List[Tuple[str, Position]]):
+        """把上下文从 path 分支切换到 steps 分支：撤销到公共前缀后重放其余步骤"""
+        common = 0
+        while common < min(len(path), len(steps)) and path[common] == steps[common]:
+            common += 1
+        for _ in range(len(path) - common):
+            ctx.undo()
+        for word, pos in steps[common:]:
+            ctx.place(word, pos)
     
     def _select_seed_word(self, words: List[str], 
                           grid_size: Tuple[int, int]) -> Optional[str]:
         """选择种子词"""
         max_length = min(grid_size[0], grid_size[1]) - 2
-        suitable_words = [w for w in words if 4 <= len(w) <= max_length]
-        
-        if not suitable_words:
-            return None
         
-        # 优先选择中等长度的词
+        # 优先选择中等长度的词（同样接近时取打乱顺序中靠前的）
         target_length = max_length // 2 + 2
-        suitable_words.sort(key=lambda w: abs(len(w) - target_length))
+        best_word, best_distance = None, None
+        for word in words:
+            if 4 <= len(word) <= max_length:
+                distance = abs(len(word) - target_length)
+                if best_word is None or distance < best_distance:
+                    best_word, best_distance = word, distance
         
-        return suitable_words[0]
+        return best_word
     
     def _get_center_position(self, word: str, grid_size: Tuple[int, int], 
                              direction: str) -> Position:
@@ -298,93 +1230,96 @@ class PuzzleGenerator:
         
         return Position(row, col, direction)
     
-    def _find_best_placement(self, grid: Grid, placed_words: List[PlacedWord],
-                             available_words: List[str], 
-                             used_words: Set[str]) -> Optional[Tuple[str, Position]]:
+    def _find_best_placement(self, pool: 'CandidatePool') -> Optional[Tuple[str, Position]]:
         """找到最佳放置方案"""
-        candidates = []
-        
-        # 遍历已放置的单词，寻找交叉点
-        for placed in placed_words:
-            for i, char in enumerate(placed.word):
-                # 计算交叉点坐标
-                if placed.direction == 'H':
-                    cross_row = placed.row
-                    cross_col = placed.col + i
-                    new_direction = 'V'
-                else:
-                    cross_row = placed.row + i
-                    cross_col = placed.col
-                    new_direction = 'H'
-                
-                # 寻找能在此位置交叉的单词
-                for word in available_words:
-                    if word in used_words:
-                        continue
-                    
-                    # 检查单词中是否有匹配的字母
-                    for j, word_char in enumerate(word):
-                        if word_char != char:
-                            continue
-                        
-                        # 计算新单词的起始位置
-                        if new_direction == 'H':
-                            new_row = cross_row
-                            new_col = cross_col - j
-                        else:
-                            new_row = cross_row - j
-                            new_col = cross_col
-                        
-                        pos = Position(new_row, new_col, new_direction)
-                        
-                        # 验证放置有效性
-                        if self._is_valid_placement(grid, word, pos, placed_words):
-                            score = self._calculate_score(grid, word, pos)
-                            candidates.append((word, pos, score))
+        candidates = pool.top(5)
         
         if not candidates:
             return None
         
-        # 按得分排序，返回最佳方案
-        candidates.sort(key=lambda x: x[2], reverse=True)
-        
         # 添加一些随机性，从前几个候选中随机选择
-        top_n = min(5, len(candidates))
-        selected = random.choice(candidates[:top_n])
+        return self.rng.choice(candidates)
+    
+    def _scan_anchor(self, grid: Grid, anchor: Tuple[int, int],
+                     cross_row: int, cross_col: int, char: str, new_direction: str,
+                     word_rank: Dict[str, int],
+                     char_index: Dict[str, List[Tuple[str, int]]],
+                     used_words: Set[str]) -> List[Tuple[tuple, str, Position]]:
+        """扫描单个交叉锚点上的所有有效放置
+        
+        通过倒排索引只查找包含交叉字母的单词；word_rank 为可用单词的打乱顺序。
+        返回 (排序键, 单词, 位置) 列表，排序键越小越优。
+        """
+        candidates = []
+        
+        # 寻找能在此位置交叉的单词
+        for word, j in char_index.get(char, ()):
+            if word in used_words:
+                continue
+            rank = word_rank.get(word)
+            if rank is None:
+                continue
+            
+            # 计算新单词的起始位置
+            if new_direction == 'H':
+                new_row = cross_row
+                new_col = cross_col - j
+            else:
+                new_row = cross_row - j
+                new_col = cross_col
+            
+            pos = Position(new_row, new_col, new_direction)
+            
+            # 验证放置有效性
+            if self._is_valid_placement(grid, word, pos):
+                score = self._calculate_score(grid, word, pos)
+                # 得分高者优先；同分时按 锚点 -> 单词打乱顺序 -> 单词内位置
+                order = (-score, anchor[0], anchor[1], rank, j)
+                candidates.append((order, word, pos))
         
-        return (selected[0], selected[1])
+        return candidates
     
-    def _is_valid_placement(self, grid: Grid, word: str, 
-                           pos: Position, placed_words: List[PlacedWord]) -> bool:
+    def _is_valid_placement(self, grid: Grid, word: str, pos: Position) -> bool:
         """验证放置是否有效"""
+        if isinstance(grid, CompactGrid):
+            return grid.is_valid_span(word, pos)
+        return self._placement_rejection(grid, word, pos) is None
+    
+    def _placement_rejection(self, grid: Grid, word: str, pos: Position) -> Optional[str]:
+        """检查放置，返回拒绝原因；有效时返回 None
+        
+        原因: out_of_bounds / start_adjacent / end_adjacent /
+        parallel_neighbour / touches_word_end / letter_mismatch /
+        same_direction_overlap / no_intersection
+        """
         rows, cols = grid.rows, grid.cols
         word_len = len(word)
         
         # 检查边界
         if pos.row < 0 or pos.col < 0:
-            return False
+            return 'out_of_bounds'
         
         if pos.direction == 'H':
             if pos.col + word_len > cols or pos.row >= rows:
-                return False
+                return 'out_of_bounds'
         else:
             if pos.row + word_len > rows or pos.col >= cols:
-                return False
+                return 'out_of_bounds'
         
         # 检查起始位置前是否有字母（不能紧贴其他单词）
         if pos.direction == 'H':
             if pos.col > 0 and grid.get(pos.row, pos.col - 1) != '':
-                return False
+                return 'start_adjacent'
             # 检查结束位置后是否有字母
             end_col = pos.col + word_len
             if end_col < cols and grid.get(pos.row, end_col) != '':
-                return False
+                return 'end_adjacent'
         else:
             if pos.row > 0 and grid.get(pos.row - 1, pos.col) != '':
-                return False
+                return 'start_adjacent'
             end_row = pos.row + word_len
             if end_row < rows and grid.get(end_row, pos.col) != '':
-                return False
+                return 'end_adjacent'
         
         # 检查每个字母位置
         has_intersection = False
@@ -397,43 +1332,35 @@ class PuzzleGenerator:
             existing = grid.get(r, c)
             
             if existing == '':
-                # 空格子：检查平行相邻是否有字母
+                # 空格子：两侧不能有字母。相邻字母不属于交叉方向的单词时是平行单词；
+                # 属于交叉方向的单词时，该单词在此处结束，新字母会紧贴其首尾
                 if pos.direction == 'H':
-                    # 检查上下
-                    if (r > 0 and grid.get(r - 1, c) != '' and 
-                        not self._is_part_of_crossing_word(r - 1, c, 'V', placed_words)):
-                        return False
-                    if (r < rows - 1 and grid.get(r + 1, c) != '' and
-                        not self._is_part_of_crossing_word(r + 1, c, 'V', placed_words)):
-                        return False
+                    neighbours = [(n, c) for n in (r - 1, r + 1) if 0 <= n < rows]
+                    cross = 'V'
                 else:
-                    # 检查左右
-                    if (c > 0 and grid.get(r, c - 1) != '' and
-                        not self._is_part_of_crossing_word(r, c - 1, 'H', placed_words)):
-                        return False
-                    if (c < cols - 1 and grid.get(r, c + 1) != '' and
-                        not self._is_part_of_crossing_word(r, c + 1, 'H', placed_words)):
-                        return False
+                    neighbours = [(r, n) for n in (c - 1, c + 1) if 0 <= n < cols]
+                    cross = 'H'
+                for nr, nc in neighbours:
+                    if grid.get(nr, nc) != '':
+                        if self._is_part_of_crossing_word(grid, nr, nc, cross):
+                            return 'touches_word_end'
+                        return 'parallel_neighbour'
             
             elif existing == char:
-                # 交叉点：字母匹配
+                # 交叉点：字母匹配，且不能已属于同方向的单词
+                if grid.get_owner(r, c, pos.direction) is not None:
+                    return 'same_direction_overlap'
                 has_intersection = True
             else:
                 # 字母不匹配
-                return False
+                return 'letter_mismatch'
         
-        return has_intersection
+        return None if has_intersection else 'no_intersection'
     
-    def _is_part_of_crossing_word(self, row: int, col: int, 
-                                   direction: str, placed_words: List[PlacedWord]) -> bool:
+    def _is_part_of_crossing_word(self, grid: Grid, row: int, col: int,
+                                   direction: str) -> bool:
         """检查位置是否属于指定方向的单词"""
-        for pw in placed_words:
-            if pw.direction != direction:
-                continue
-            cells = pw.get_cells()
-            if (row, col) in cells:
-                return True
-        return False
+        return grid.get_owner(row, col, direction) is not None
     
     def _calculate_score(self, grid: Grid, word: str, pos: Position) -> float:
         """计算放置得分"""
@@ -441,14 +1368,17 @@ class PuzzleGenerator:
         
         # 交叉数量得分
         intersections = 0
-        for i in range(len(word)):
-            if pos.direction == 'H':
-                r, c = pos.row, pos.col + i
-            else:
-                r, c = pos.row + i, pos.col
-            
-            if grid.get(r, c) != '':
-                intersections += 1
+        if isinstance(grid, CompactGrid):
+            intersections = bin(grid.span_occupancy(len(word), pos)[1]).count('1')
+        else:
+            for i in range(len(word)):
+                if pos.direction == 'H':
+                    r, c = pos.row, pos.col + i
+                else:
+                    r, c = pos.row + i, pos.col
+                
+                if grid.get(r, c) != '':
+                    intersections += 1
         
         score += intersections * 15
         
@@ -475,13 +1405,26 @@ class PuzzleGenerator:
         
         return score
     
-    def _place_word(self, grid: Grid, word: str, pos: Position):
-        """将单词放置到网格"""
+    def _place_word(self, grid: Grid, word: str,
+                    pos: Position) -> List[Tuple[int, int, str, Optional[str]]]:
+        """将单词放置到网格，返回被覆盖格子的原状态 (行, 列, 字母, 同向单词)"""
+        previous = []
         for i, char in enumerate(word):
             if pos.direction == 'H':
-                grid.set(pos.row, pos.col + i, char)
+                r, c = pos.row, pos.col + i
             else:
-                grid.set(pos.row + i, pos.col, char)
+                r, c = pos.row + i, pos.col
+            previous.append((r, c, grid.get(r, c), grid.get_owner(r, c, pos.direction)))
+            grid.set(r, c, char)
+            grid.set_owner(r, c, pos.direction, word)
+        return previous
+    
+    def _unplace_word(self, grid: Grid, direction: str,
+                      previous: List[Tuple[int, int, str, Optional[str]]]):
+        """按 _place_word 返回的原状态恢复格子"""
+        for r, c, char, owner in reversed(previous):
+            grid.set(r, c, char)
+            grid.set_owner(r, c, direction, owner)
     
     def _assign_numbers(self, puzzle: Puzzle):
         """分配单词编号"""
@@ -510,43 +1453,1212 @@ class PuzzleGenerator:
         for word in puzzle.words:
             word.hint = self.word_bank.get_hint(word.word)
 
-# ==================== 提示提取器 ====================
-
-class HintExtractor:
-    """从HTML文件提取提示"""
+class CandidatePool:
+    """跨迭代维护的交叉锚点与候选方案
     
-    @staticmethod
-    def extract_from_html(html_path: str) -> Dict[str, str]:
-        """从HTML文件提取KNOWN_HINTS"""
-        hints = {}
+    每个已放置单词的每个字母是一个锚点。放置新单词后，只重新扫描
+    影响范围与新单词相交的锚点，并为新单词的字母添加锚点；
+    每次登记都记下被重扫锚点原来的候选，撤销时直接恢复，不必重扫。
+    候选保存在堆中，失效项在取出时丢弃；失效项超过有效项的
+    COMPACT_RATIO 倍时整体压缩一次，堆的大小不随尝试变长而增长。
+    """
+    
+    COMPACT_RATIO = 4
+    # 堆小于此大小时不压缩
+    COMPACT_MIN = 1024
+    
+    def __init__(self, generator: PuzzleGenerator, grid: Grid,
+                 word_rank: Dict[str, int],
+                 char_index: Dict[str, List[Tuple[str, int]]],
+                 used_words: Set[str], max_word_len: int,
+                 scanner: Optional[Union['BatchScanner', 'PatternScanner']] = None):
+        self.generator = generator
+        self.grid = grid
+        # 锚点扫描：默认逐个检查候选，给出 scanner 时由其批量检查或按槽位查询
+        self.scanner = scanner
+        self.scan_anchor = scanner.scan if scanner else generator._scan_anchor
+        self.word_rank = word_rank
+        self.char_index = char_index
+        self.used_words = used_words
+        self.max_word_len = max_word_len
+        # 锚点 (单词序号, 字母序号) -> (行, 列, 字母, 新单词方向)
+        self.anchors: Dict[Tuple[int, int], Tuple[int, int, str, str]] = {}
+        # 锚点 -> 最近一次扫描编号，用于识别堆中的过期候选
+        self.scan_ids: Dict[Tuple[int, int], int] = {}
+        # 锚点 -> 最近一次扫描仍在堆中的候选数；live 为其总和
+        self.scan_sizes: Dict[Tuple[int, int], int] = {}
+        self.live = 0
+        self.heap: List[tuple] = []
+        # 锚点 -> 最近一次扫描的候选 (排序键, 单词, 位置)，供前向检查
+        self.candidates: Dict[Tuple[int, int], List[Tuple[tuple, str, Position]]] = {}
+        # 最近一次扫描有候选的锚点（束搜索的前瞻项）
+        self.open_anchors: Set[Tuple[int, int]] = set()
+        # 每次 add_word 的撤销信息: (新锚点数, [(被重扫的锚点, 原来的候选)])
+        self.history: List[Tuple[int, List[Tuple[Tuple[int, int], list]]]] = []
+        self.placed_count = 0
+        self._next_scan_id = 0
+    
+    def reset(self):
+        """清空所有锚点与候选"""
+        self.anchors.clear()
+        self.scan_ids.clear()
+        self.scan_sizes.clear()
+        self.live = 0
+        self.heap.clear()
+        self.candidates.clear()
+        self.open_anchors.clear()
+        self.history.clear()
+        self.placed_count = 0
+        self._next_scan_id = 0
+    
+    def add_word(self, placed: PlacedWord):
+        """登记新放置的单词：重扫受影响锚点并添加新锚点"""
+        if self.scanner:
+            self.scanner.refresh(self.placed_count == 0, placed)
+        cells = placed.get_cells()
+        rescanned = []
+        for anchor, (row, col, _, direction) in self.anchors.items():
+            if self._reaches(row, col, direction, cells):
+                rescanned.append((anchor, self.candidates[anchor]))
+                self._scan(anchor)
         
-        if not os.path.exists(html_path):
-            print(f"警告: HTML文件不存在 {html_path}")
-            return hints
+        new_direction = 'V' if placed.direction == 'H' else 'H'
+        for i, (row, col) in enumerate(cells):
+            anchor = (self.placed_count, i)
+            self.anchors[anchor] = (row, col, placed.word[i], new_direction)
+            self._scan(anchor)
+        self.history.append((len(cells), rescanned))
+        self.placed_count += 1
+    
+    def undo(self):
+        """撤销最近一次 add_word（网格和已用单词需已回滚）：删除它带来的锚点，
+        被重扫的锚点恢复原来的候选"""
+        new_count, rescanned = self.history.pop()
+        self.placed_count -= 1
+        for i in range(new_count):
+            anchor = (self.placed_count, i)
+            del self.anchors[anchor]
+            del self.candidates[anchor]
+            # 堆中该锚点的候选全部过期（锚点编号之后可能被新单词复用）
+            self.scan_ids[anchor] = -1
+            self.live -= self.scan_sizes.pop(anchor)
+            self.open_anchors.discard(anchor)
+        for anchor, candidates in rescanned:
+            self._set_candidates(anchor, candidates)
+        if self.scanner:
+            self.scanner.refresh(False)
+    
+    def forward_check(self, word: str, pos: Position) -> bool:
+        """前向检查：试放单词后是否还有锚点留有有效候选（网格和已用单词随后恢复原状）
+        
+        锚点不必全部用上，因此只有全部锚点同时失去候选才是死局：
+        不受影响的锚点保留原有候选，可直接判定；受影响的锚点先逐个检查原有候选，
+        再按试放后的网格重扫，最后扫描新单词带来的锚点。
+        """
+        generator, grid, used_words = self.generator, self.grid, self.used_words
+        cells = PlacedWord(word=word, row=pos.row, col=pos.col,
+                           direction=pos.direction).get_cells()
+        covered = set(cells)
+        affected = []
+        for anchor in self.open_anchors:
+            row, col, _, direction = self.anchors[anchor]
+            if (row, col) in covered:
+                continue
+            if not self._reaches(row, col, direction, cells):
+                if any(other != word and other not in used_words
+                       for _, other, _ in self.candidates[anchor]):
+                    return True
+            else:
+                affected.append(anchor)
         
+        previous = generator._place_word(grid, word, pos)
+        used_words.add(word)
         try:
-            with open(html_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 查找 KNOWN_HINTS 对象
-            pattern = r'const\s+KNOWN_HINTS\s*=\s*\{([^}]+)\}'
-            match = re.search(pattern, content, re.DOTALL)
-            
-            if match:
-                hints_content = match.group(1)
-                # 解析每个条目
-                entry_pattern = r'"([^"]+)"\s*:\s*"([^"]*)"'
-                for entry_match in re.finditer(entry_pattern, hints_content):
-                    word = entry_match.group(1).upper()
-                    hint = entry_match.group(2)
-                    hints[word] = hint
-            
-            print(f"从HTML提取了 {len(hints)} 个提示")
-            
-        except Exception as e:
+            for anchor in affected:
+                if any(other not in used_words and generator._is_valid_placement(grid, other, p)
+                       for _, other, p in self.candidates[anchor]):
+                    return True
+            scans = [(anchor,) + self.anchors[anchor] for anchor in affected]
+            new_direction = 'V' if pos.direction == 'H' else 'H'
+            scans += [((self.placed_count, i), row, col, word[i], new_direction)
+                      for i, (row, col) in enumerate(cells)]
+            return any(generator._scan_anchor(grid, anchor, row, col, char, direction,
+                                              self.word_rank, self.char_index, used_words)
+                       for anchor, row, col, char, direction in scans)
+        finally:
+            used_words.discard(word)
+            generator._unplace_word(grid, pos.direction, previous)
+    
+    def top(self, k: int) -> List[Tuple[str, Position]]:
+        """按得分取前 k 个有效候选"""
+        return [(entry[3], entry[4]) for entry in self._top_entries(k)]
+    
+    def top_scored(self, k: int) -> List[Tuple[float, str, Position]]:
+        """按得分取前 k 个有效候选及其放置得分"""
+        return [(-entry[0][0], entry[3], entry[4]) for entry in self._top_entries(k)]
+    
+    def _top_entries(self, k: int) -> List[tuple]:
+        """弹出失效项，取得分最高的 k 个有效堆项（取出后放回）"""
+        best = []
+        while self.heap and len(best) < k:
+            entry = heapq.heappop(self.heap)
+            _, scan_id, anchor, word, _ = entry
+            if self.scan_ids[anchor] != scan_id:
+                continue
+            if word in self.used_words:
+                self.scan_sizes[anchor] -= 1
+                self.live -= 1
+                continue
+            best.append(entry)
+        for entry in best:
+            heapq.heappush(self.heap, entry)
+        return best
+    
+    def _reaches(self, row: int, col: int, direction: str,
+                 cells: List[Tuple[int, int]]) -> bool:
+        """锚点上任一候选的检查范围（单词段、首尾及两侧）是否包含这些格子"""
+        reach = self.max_word_len
+        for r, c in cells:
+            if direction == 'H':
+                if abs(r - row) <= 1 and abs(c - col) <= reach:
+                    return True
+            elif abs(c - col) <= 1 and abs(r - row) <= reach:
+                return True
+        return False
+    
+    def _scan(self, anchor: Tuple[int, int]):
+        """重新扫描锚点，之前的候选随之过期"""
+        row, col, char, direction = self.anchors[anchor]
+        self._set_candidates(anchor, self.scan_anchor(
+            self.grid, anchor, row, col, char, direction,
+            self.word_rank, self.char_index, self.used_words))
+    
+    def _set_candidates(self, anchor: Tuple[int, int],
+                        candidates: List[Tuple[tuple, str, Position]]):
+        """以新的扫描编号登记锚点的候选，之前的候选随之过期"""
+        scan_id = self._next_scan_id
+        self._next_scan_id += 1
+        self.scan_ids[anchor] = scan_id
+        for order, word, pos in candidates:
+            heapq.heappush(self.heap, (order, scan_id, anchor, word, pos))
+        self.live += len(candidates) - self.scan_sizes.get(anchor, 0)
+        self.scan_sizes[anchor] = len(candidates)
+        self.candidates[anchor] = candidates
+        if candidates:
+            self.open_anchors.add(anchor)
+        else:
+            self.open_anchors.discard(anchor)
+        if len(self.heap) > self.COMPACT_MIN and \
+                len(self.heap) - self.live > self.COMPACT_RATIO * self.live:
+            self._compact()
+    
+    def _compact(self):
+        """丢弃堆中所有过期扫描的候选并重新建堆（不改变取出顺序）"""
+        scan_ids = self.scan_ids
+        self.heap = [entry for entry in self.heap if scan_ids[entry[2]] == entry[1]]
+        heapq.heapify(self.heap)
+
+class BatchScanner:
+    """批量锚点扫描（需要 NumPy）
+    
+    把候选单词编码为字母矩阵，锚点上的所有候选按起点、长度和
+    字母编码组成数组，与网格的字母/覆盖快照一起做向量化检查和打分。
+    规则与 _is_valid_placement、_calculate_score 完全一致，
+    返回值与 PuzzleGenerator._scan_anchor 相同。
+    """
+    
+    def __init__(self, grid: Grid, words: List[str], word_rank: Dict[str, int],
+                 char_index: Dict[str, List[Tuple[str, int]]], used_words: Set[str]):
+        self.grid = grid
+        self.words = words
+        self.word_rank = word_rank
+        self.used_words = used_words
+        
+        # 单词编号为其在 words 中首次出现的下标
+        self.word_ids: Dict[str, int] = {}
+        for i, word in enumerate(words):
+            self.word_ids.setdefault(word, i)
+        max_len = max((len(w) for w in words), default=0)
+        self.lengths = np.array([len(w) for w in words], dtype=np.int64)
+        self.letters = np.zeros((len(words), max_len), dtype=np.int32)
+        for i, word in enumerate(words):
+            self.letters[i, :len(word)] = [ord(c) for c in word]
+        self.steps = np.arange(max_len)
+        
+        # 字母 -> (单词编号数组, 字母在单词中的位置数组)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for char, entries in char_index.items():
+            ids, offsets = [], []
+            for word, j in entries:
+                word_id = self.word_ids.get(word)
+                if word_id is not None:
+                    ids.append(word_id)
+                    offsets.append(j)
+            self.postings[char] = (np.array(ids, dtype=np.int64),
+                                   np.array(offsets, dtype=np.int64))
+        
+        self.ranks = np.zeros(len(words), dtype=np.int64)
+        self.used = np.zeros(len(words), dtype=bool)
+        self.codes = np.zeros((grid.rows, grid.cols), dtype=np.int32)
+        self.cover = {d: np.zeros((grid.rows, grid.cols), dtype=bool) for d in ('H', 'V')}
+    
+    def refresh(self, new_attempt: bool, placed: Optional[PlacedWord] = None):
+        """网格变化后更新快照；新一轮尝试时同时更新单词打乱顺序
+        
+        给出新放置的单词（且不是新一轮尝试）时只更新它覆盖的格子，
+        否则从网格重建整个快照。
+        """
+        grid = self.grid
+        if placed is not None and not new_attempt:
+            word_id = self.word_ids.get(placed.word)
+            if word_id is not None:
+                self.used[word_id] = True
+            cover = self.cover[placed.direction]
+            # CompactGrid 的字母快照是其数组的视图，已随网格更新
+            update_codes = not isinstance(grid, CompactGrid)
+            for (r, c), char in zip(placed.get_cells(), placed.word):
+                if update_codes:
+                    self.codes[r, c] = ord(char)
+                cover[r, c] = True
+            return
+        if new_attempt:
+            word_rank = self.word_rank
+            self.ranks[:] = [word_rank[w] for w in self.words]
+        self.used[:] = False
+        self.used[[self.word_ids[w] for w in self.used_words if w in self.word_ids]] = True
+        
+        shape = (grid.rows, grid.cols)
+        if isinstance(grid, CompactGrid):
+            self.codes = np.frombuffer(grid.codes, dtype=np.uint16).reshape(shape)
+            for d in ('H', 'V'):
+                self.cover[d] = np.fromiter((o is not None for o in grid.owners[d]),
+                                            dtype=bool, count=grid.rows * grid.cols).reshape(shape)
+        else:
+            self.codes = np.array([[ord(ch) if ch else 0 for ch in row] for row in grid.cells],
+                                  dtype=np.int32).reshape(shape)
+            for d in ('H', 'V'):
+                self.cover[d] = np.array([[o is not None for o in row]
+                                          for row in grid.owners[d]], dtype=bool).reshape(shape)
+    
+    def scan(self, grid: Grid, anchor: Tuple[int, int],
+             cross_row: int, cross_col: int, char: str, new_direction: str,
+             *_) -> List[Tuple[tuple, str, Position]]:
+        """扫描单个交叉锚点上的所有有效放置（参数与 _scan_anchor 相同）"""
+        entry = self.postings.get(char)
+        if entry is None:
+            return []
+        ids, offsets = entry
+        
+        # 统一按“行”处理：纵向放置时转置网格
+        if new_direction == 'H':
+            codes, cover, line, along = self.codes, self.cover['H'], cross_row, cross_col
+        else:
+            codes, cover, line, along = self.codes.T, self.cover['V'].T, cross_col, cross_row
+        lines, limit = codes.shape
+        
+        # 未使用且不越界
+        lengths = self.lengths[ids]
+        start = along - offsets
+        end = start + lengths
+        keep = ~self.used[ids] & (start >= 0) & (end <= limit)
+        if not keep.any():
+            return []
+        ids, offsets, lengths, start, end = (a[keep] for a in (ids, offsets, lengths, start, end))
+        
+        # 首尾不能紧贴其他字母
+        row = codes[line]
+        keep = ~((start > 0) & (row[np.maximum(start - 1, 0)] != 0))
+        keep &= ~((end < limit) & (row[np.minimum(end, limit - 1)] != 0))
+        
+        # 交叉点字母一致，且至少有一个交叉
+        in_word = self.steps < lengths[:, None]
+        cells = np.minimum(start[:, None] + self.steps, limit - 1)
+        existing = row[cells]
+        occupied = in_word & (existing != 0)
+        keep &= ~(occupied & (existing != self.letters[ids])).any(axis=1)
+        intersections = occupied.sum(axis=1)
+        keep &= intersections > 0
+        # 交叉点不能已属于同方向的单词
+        keep &= ~(occupied & cover[line][cells]).any(axis=1)
+        
+        # 空格子两侧不能有字母
+        empty = in_word & (existing == 0)
+        for neighbour in (line - 1, line + 1):
+            if 0 <= neighbour < lines:
+                keep &= ~(empty & (codes[neighbour] != 0)[cells]).any(axis=1)
+        
+        selected = np.flatnonzero(keep)
+        if not len(selected):
+            return []
+        ids, offsets, lengths, start, intersections = (
+            a[selected] for a in (ids, offsets, lengths, start, intersections))
+        
+        # 打分（与 _calculate_score 的运算顺序相同，结果逐位一致）
+        center_row = grid.rows // 2
+        center_col = grid.cols // 2
+        middle = start + lengths // 2
+        if new_direction == 'H':
+            distance = abs(line - center_row) + np.abs(middle - center_col)
+        else:
+            distance = np.abs(middle - center_row) + abs(line - center_col)
+        score = intersections * 15.0
+        score = score + 10 * (1 - distance / (center_row + center_col))
+        score = score + np.where((lengths >= 5) & (lengths <= 8), 5,
+                                 np.where((lengths >= 4) & (lengths <= 9), 3, 0))
+        
+        words = self.words
+        candidates = []
+        for word_id, j, first, value, rank in zip(ids.tolist(), offsets.tolist(),
+                                                  start.tolist(), score.tolist(),
+                                                  self.ranks[ids].tolist()):
+            if new_direction == 'H':
+                pos = Position(line, first, 'H')
+            else:
+                pos = Position(first, line, 'V')
+            candidates.append(((-value, anchor[0], anchor[1], rank, j), words[word_id], pos))
+        return candidates
+
+class PatternScanner:
+    """按槽位的锚点扫描
+    
+    包含锚点的每个槽位（起点、长度）能否放置只取决于网格：越界、首尾紧贴、
+    空格子两侧的字母、已属于同方向单词的交叉点都按槽位检查一次，槽位中已有的字母组成模式，
+    由 WordBank.match_constraints 直接给出字母全部一致的单词，得分也只需算一次。
+    多个交叉的放置因此不必先枚举所有含锚点字母的单词再逐个排除；
+    返回值与 PuzzleGenerator._scan_anchor 相同。
+    """
+    
+    def __init__(self, generator: PuzzleGenerator, grid: Grid, min_len: int, max_len: int,
+                 word_rank: Dict[str, int], used_words: Set[str]):
+        self.generator = generator
+        self.grid = grid
+        self.word_bank = generator.word_bank
+        self.lengths = range(min_len, max_len + 1)
+        self.word_rank = word_rank
+        self.used_words = used_words
+        # (方向, 行/列号) -> 该行/列的字母、受阻格子与已有字母的前缀和
+        self._lines: Dict[Tuple[str, int], Tuple[List[str], List[int], List[int]]] = {}
+    
+    def refresh(self, new_attempt: bool, placed: Optional[PlacedWord] = None):
+        """网格变化后丢弃缓存的行/列信息"""
+        self._lines.clear()
+    
+    def _line(self, direction: str, line: int) -> Tuple[List[str], List[int], List[int]]:
+        """新单词所在行/列的字母，以及受阻格子（两侧有字母的空格、已属于同方向单词的字母）
+        和已有字母的前缀和"""
+        key = (direction, line)
+        entry = self._lines.get(key)
+        if entry is None:
+            grid = self.grid
+            if direction == 'H':
+                cells = [(line, c) for c in range(grid.cols)]
+                sides = (line - 1, line + 1)
+                neighbours = lambda r, c: [(n, c) for n in sides if 0 <= n < grid.rows]
+            else:
+                cells = [(r, line) for r in range(grid.rows)]
+                sides = (line - 1, line + 1)
+                neighbours = lambda r, c: [(r, n) for n in sides if 0 <= n < grid.cols]
+            letters = [grid.get(r, c) for r, c in cells]
+            blocked, filled = [0], [0]
+            for (r, c), char in zip(cells, letters):
+                if char:
+                    stray = grid.get_owner(r, c, direction) is not None
+                else:
+                    stray = any(grid.get(nr, nc) != '' for nr, nc in neighbours(r, c))
+                blocked.append(blocked[-1] + stray)
+                filled.append(filled[-1] + (char != ''))
+            entry = self._lines[key] = (letters, blocked, filled)
+        return entry
+    
+    def scan(self, grid: Grid, anchor: Tuple[int, int],
+             cross_row: int, cross_col: int, char: str, new_direction: str,
+             *_) -> List[Tuple[tuple, str, Position]]:
+        """扫描单个交叉锚点上的所有有效放置（参数与 _scan_anchor 相同）"""
+        if new_direction == 'H':
+            line, along, limit = cross_row, cross_col, grid.cols
+        else:
+            line, along, limit = cross_col, cross_row, grid.rows
+        letters, blocked, filled = self._line(new_direction, line)
+        match_constraints = self.word_bank.match_constraints
+        word_rank, used_words = self.word_rank, self.used_words
+        
+        candidates = []
+        for length in self.lengths:
+            for j in range(length):
+                start = along - j
+                end = start + length
+                # 越界、首尾紧贴或包含受阻格子时整个槽位无效
+                if start < 0 or end > limit:
+                    continue
+                if (start > 0 and letters[start - 1]) or (end < limit and letters[end]):
+                    continue
+                if blocked[end] != blocked[start]:
+                    continue
+                
+                if filled[end] - filled[start] == 1:
+                    constraints = [(j, char)]
+                else:
+                    constraints = [(k - start, letters[k]) for k in range(start, end)
+                                   if letters[k]]
+                if new_direction == 'H':
+                    pos = Position(line, start, 'H')
+                else:
+                    pos = Position(start, line, 'V')
+                score = None
+                for word in match_constraints(length, constraints):
+                    if word in used_words:
+                        continue
+                    rank = word_rank.get(word)
+                    if rank is None:
+                        continue
+                    if score is None:
+                        score = self.generator._calculate_score(grid, word, pos)
+                    candidates.append(((-score, anchor[0], anchor[1], rank, j), word, pos))
+        return candidates
+
+class GenerationContext:
+    """单个难度的可复用生成上下文
+    
+    预先筛选好的单词池、网格、已放置单词和候选池在各次尝试间复用；
+    每次放置都记入撤销日志（网格的格子原状态与候选池的原扫描结果），
+    回溯和束搜索切换分支时按日志原地回退；新一轮尝试前清空候选池并回滚网格。
+    """
+    
+    def __init__(self, generator: PuzzleGenerator, difficulty: Difficulty):
+        config = DIFFICULTY_CONFIG[difficulty]
+        self.grid_size: Tuple[int, int] = config['grid_size']
+        self.word_count_range: Tuple[int, int] = config['word_count_range']
+        min_len, max_len = config['word_length_range']
+        
+        self.generator = generator
+        # 符合长度要求的单词（原始顺序）及每次尝试打乱用的工作副本
+        self.base_words = generator.word_bank.get_words_by_length(min_len, max_len)
+        self.words = list(self.base_words)
+        self.word_rank: Dict[str, int] = {}
+        char_index = generator.word_bank.get_char_index(min_len, max_len)
+        
+        self.grid = generator.grid_class(self.grid_size[0], self.grid_size[1])
+        self.placed_words: List[PlacedWord] = []
+        self.used_words: Set[str] = set()
+        # 每次放置覆盖的格子原状态 (行, 列, 字母, 同向单词)
+        self.undo_log: List[List[Tuple[int, int, str, Optional[str]]]] = []
+        scanner = None
+        if generator.batch:
+            scanner = BatchScanner(self.grid, self.base_words, self.word_rank,
+                                   char_index, self.used_words)
+        elif generator.pattern_scan:
+            scanner = PatternScanner(generator, self.grid, min_len, max_len,
+                                     self.word_rank, self.used_words)
+        self.pool = CandidatePool(generator, self.grid, self.word_rank, char_index,
+                                  self.used_words, max_len, scanner)
+    
+    def reset(self):
+        """回滚上一次尝试的全部放置，恢复单词初始顺序"""
+        self.pool.reset()
+        while self.placed_words:
+            self._unplace()
+        self.words[:] = self.base_words
+    
+    def place(self, word: str, pos: Position):
+        """放置单词并记录撤销信息"""
+        self.undo_log.append(self.generator._place_word(self.grid, word, pos))
+        self.placed_words.append(PlacedWord(
+            word=word,
+            row=pos.row,
+            col=pos.col,
+            direction=pos.direction
+        ))
+        self.used_words.add(word)
+        self.pool.add_word(self.placed_words[-1])
+    
+    def undo(self):
+        """撤销最近一次放置，恢复格子原状态和候选池"""
+        self._unplace()
+        self.pool.undo()
+    
+    def _unplace(self):
+        """撤销最近一次放置的网格和已用单词"""
+        placed = self.placed_words.pop()
+        self.used_words.discard(placed.word)
+        self.generator._unplace_word(self.grid, placed.direction, self.undo_log.pop())
+
+# ==================== 模板填充 ====================
+
+@dataclass
+class GridTemplate:
+    """网格模板：每行一个字符串，'#' 为黑格，'.' 为白格"""
+    cells: List[str]
+    
+    LATTICE_RETRIES = 1000
+    # 格栅中相邻单词行（列）的间隔
+    LATTICE_GAPS = (2, 3, 4)
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (len(self.cells), len(self.cells[0]))
+    
+    @classmethod
+    def parse(cls, text: str) -> 'GridTemplate':
+        """解析模板文本"""
+        cells = [line.strip() for line in text.strip().splitlines() if line.strip()]
+        if not cells:
+            raise ValueError("模板为空")
+        if any(len(row) != len(cells[0]) for row in cells):
+            raise ValueError("模板各行长度不一致")
+        if any(ch not in '#.' for row in cells for ch in row):
+            raise ValueError("模板只能包含 '#'（黑格）和 '.'（白格）")
+        return cls(cells)
+    
+    @classmethod
+    def load(cls, filepath: str) -> List['GridTemplate']:
+        """从文件加载模板，模板之间以空行分隔"""
+        with open(filepath, 'r', encoding='utf-8') as f:
+            blocks = re.split(r'\n\s*\n', f.read())
+        return [cls.parse(block) for block in blocks if block.strip()]
+    
+    @classmethod
+    def lattice(cls, rows: int, cols: int, lengths: Set[int], word_counts: Tuple[int, int],
+                rng: random.Random) -> Optional['GridTemplate']:
+        """随机生成格栅模板，单词数在 word_counts 范围内
+        
+        在网格中随机取一块区域，区域内每隔 LATTICE_GAPS 格取一行（列）作为单词行（列），
+        首尾两行（列）就是区域边界，每个单词行与全部单词列相交；其余格子都是黑格。
+        再在单词行（列）上随机加入黑格，把它们切成长度都在 lengths 内的单词。
+        切分点只选在不与另一方向相交的格子上，因此切分互不影响。
+        单词数不在范围内或白格不连通时重新生成，
+        LATTICE_RETRIES 次都不满足时返回 None。
+        """
+        min_count, max_count = word_counts
+        shortest = min(lengths)
+        for _ in range(cls.LATTICE_RETRIES):
+            across = cls._lines(rng.randint(shortest, rows), rng)
+            down = cls._lines(rng.randint(shortest, cols), rng)
+            height, width = across[-1] + 1, down[-1] + 1
+            if height < shortest or width < shortest:
+                continue
+            across_cuts = [cls._cuts(width, lengths, set(down), rng) for _ in across]
+            down_cuts = [cls._cuts(height, lengths, set(across), rng) for _ in down]
+            if None in across_cuts or None in down_cuts:
+                continue
+            if not min_count <= (sum(len(c) + 1 for c in across_cuts) +
+                                 sum(len(c) + 1 for c in down_cuts)) <= max_count:
+                continue
+            
+            # 区域在网格中的位置随机
+            top, left = rng.randint(0, rows - height), rng.randint(0, cols - width)
+            cells = [['#'] * cols for _ in range(rows)]
+            for r, cuts in zip(across, across_cuts):
+                for c in range(width):
+                    if c not in cuts:
+                        cells[top + r][left + c] = '.'
+            for c, cuts in zip(down, down_cuts):
+                for r in range(height):
+                    if r not in cuts:
+                        cells[top + r][left + c] = '.'
+            template = cls([''.join(row) for row in cells])
+            if template.is_connected():
+                return template
+        return None
+    
+    @classmethod
+    def _lines(cls, n: int, rng: random.Random) -> List[int]:
+        """在长度 n 的区域内随机选单词行（列）的下标，从 0 开始、间隔取自 LATTICE_GAPS"""
+        lines = [0]
+        while True:
+            line = lines[-1] + rng.choice(cls.LATTICE_GAPS)
+            if line >= n:
+                return lines
+            lines.append(line)
+    
+    @staticmethod
+    def _cuts(n: int, lengths: Set[int], crossings: Set[int],
+              rng: random.Random) -> Optional[List[int]]:
+        """在长度 n 的单词行中随机选切分点（不在 crossings 中的下标），使每段长度都在 lengths 内
+        
+        先从行尾倒推每个起点能否切分成功，再从行首随机选择可行的切法；
+        无法切分时返回 None。
+        """
+        feasible = [False] * (n + 2)
+        for start in range(n - 1, -1, -1):
+            feasible[start] = (n - start in lengths or
+                               any(feasible[p + 1] for p in range(start + 1, n - 1)
+                                   if p not in crossings and p - start in lengths))
+        if not feasible[0]:
+            return None
+        cuts = []
+        start = 0
+        while True:
+            choices = [p for p in range(start + 1, n - 1)
+                       if p not in crossings and p - start in lengths and feasible[p + 1]]
+            if n - start in lengths:
+                choices.append(None)
+            cut = rng.choice(choices)
+            if cut is None:
+                return cuts
+            cuts.append(cut)
+            start = cut + 1
+    
+    def is_connected(self) -> bool:
+        """白格是否连成一片"""
+        rows, cols = self.size
+        white = {(r, c) for r in range(rows) for c in range(cols) if self.cells[r][c] == '.'}
+        if not white:
+            return False
+        stack = [next(iter(white))]
+        seen = set(stack)
+        while stack:
+            r, c = stack.pop()
+            for cell in ((r - 1, c), (r + 1, c), (r, c - 1), (r, c + 1)):
+                if cell in white and cell not in seen:
+                    seen.add(cell)
+                    stack.append(cell)
+        return len(seen) == len(white)
+    
+    def slots(self) -> List[Tuple[Position, int]]:
+        """所有单词槽位 (起点, 长度)：横向/纵向连续两个及以上的白格"""
+        rows, cols = self.size
+        slots = []
+        for direction in ('H', 'V'):
+            outer, inner = (rows, cols) if direction == 'H' else (cols, rows)
+            for line in range(outer):
+                start = 0
+                for i in range(inner + 1):
+                    r, c = (line, i) if direction == 'H' else (i, line)
+                    if i < inner and self.cells[r][c] == '.':
+                        continue
+                    if i - start >= 2:
+                        if direction == 'H':
+                            slots.append((Position(line, start, 'H'), i - start))
+                        else:
+                            slots.append((Position(start, line, 'V'), i - start))
+                    start = i + 1
+        return slots
+
+class TemplateFiller(PuzzleGenerator):
+    """模板填充引擎
+    
+    按给定的网格模板（或随机格栅模板）填满每个槽位，输出与 PuzzleGenerator 相同的 Puzzle；
+    模板的槽位数即单词数，只使用槽位数在该难度 word_count_range 内的模板。
+    每个槽位的候选集合是 WordBank 模式索引上的位图：放置单词后沿交叉格做
+    弧相容传播（某位置上可能的字母集合约束交叉槽位的候选），
+    每次选候选最少的槽位（同数时选交叉最多的），候选按随机顺序尝试，失败时回溯；
+    一次尝试的搜索节点数超过 max_nodes 时放弃，换新的随机顺序（和模板）重试。
+    词库填不满某难度的模板时，该难度改用默认的生成引擎，改用的尝试计入 AttemptStats.fallbacks。
+    """
+    
+    DEFAULT_MAX_NODES = 200
+    # 用固定种子试填的次数：全部失败时该难度改用默认生成引擎
+    PROBE_ATTEMPTS = 50
+    
+    def __init__(self, word_bank: WordBank, seed: Optional[int] = None,
+                 templates: Optional[List[GridTemplate]] = None,
+                 max_nodes: int = DEFAULT_MAX_NODES, **options):
+        super().__init__(word_bank, seed, **options)
+        # 按尺寸匹配难度的模板；某难度没有匹配模板时使用随机格栅模板
+        self.templates = templates or []
+        self.max_nodes = max_nodes
+        # 长度 -> (单词列表, 各位置上的 [(字母, 位图)])
+        self._tables: Dict[int, Tuple[List[str], List[List[Tuple[str, int]]]]] = {}
+        self._nodes = 0
+    
+    def output_options(self) -> dict:
+        """影响生成结果的选项"""
+        return {'template_fill': True, 'templates': [t.cells for t in self.templates],
+                'max_nodes': self.max_nodes}
+    
+    def _get_context(self, difficulty: Difficulty):
+        """获取（必要时创建）指定难度的上下文：模板填不满时返回默认引擎的 GenerationContext"""
+        ctx = self._contexts.get(difficulty)
+        if ctx is None:
+            ctx = TemplateContext(self, difficulty)
+            if not self._fillable(ctx):
+                print(f"  {difficulty.value}: 试填 {self.PROBE_ATTEMPTS} 次都没有填满模板，"
+                      f"改用默认生成引擎")
+                ctx = GenerationContext(self, difficulty)
+            self._contexts[difficulty] = ctx
+        return ctx
+    
+    def _fillable(self, ctx: 'TemplateContext') -> bool:
+        """用固定种子试填，判断词库能否填满该难度的模板
+        
+        结果只取决于词库、模板与 max_nodes，各工作进程的判断一致；
+        不影响生成器自身的随机序列和统计。
+        """
+        rng, stats = self.rng, self.stats
+        self.rng, self.stats = random.Random(0), AttemptStats()
+        try:
+            return any(self._fill(ctx) for _ in range(self.PROBE_ATTEMPTS))
+        finally:
+            self.rng, self.stats = rng, stats
+    
+    def _table(self, length: int) -> Tuple[List[str], List[List[Tuple[str, int]]]]:
+        """该长度的单词列表，及每个位置上出现的字母与对应位图"""
+        table = self._tables.get(length)
+        if table is None:
+            words, bitsets = self.word_bank._pattern_index(length)
+            columns: List[List[Tuple[str, int]]] = [[] for _ in range(length)]
+            for (position, char), bits in sorted(bitsets.items()):
+                columns[position].append((char, bits))
+            table = self._tables[length] = (words, columns)
+        return table
+    
+    def _try_generate(self, ctx) -> Optional[List[PlacedWord]]:
+        """模板上下文填模板，回退的难度走默认引擎"""
+        if not isinstance(ctx, TemplateContext):
+            self.stats.fallbacks += 1
+            return super()._try_generate(ctx)
+        return self._fill(ctx)
+    
+    def _fill(self, ctx: 'TemplateContext') -> Optional[List[PlacedWord]]:
+        """选一个模板并尝试填满"""
+        if ctx.templates:
+            template = self.rng.choice(ctx.templates)
+        else:
+            template = GridTemplate.lattice(*ctx.grid_size, ctx.lengths, ctx.word_count_range,
+                                            self.rng)
+            if template is None:
+                self.stats.dead_ends += 1
+                return None
+        slots = template.slots()
+        
+        # 交叉关系: 槽位 -> [(本槽位内位置, 交叉槽位, 交叉槽位内位置)]
+        owners: Dict[Tuple[int, int], List[Tuple[int, int]]] = defaultdict(list)
+        for s, (pos, length) in enumerate(slots):
+            for i in range(length):
+                cell = (pos.row, pos.col + i) if pos.direction == 'H' else (pos.row + i, pos.col)
+                owners[cell].append((s, i))
+        crossings: List[List[Tuple[int, int, int]]] = [[] for _ in slots]
+        for shared in owners.values():
+            if len(shared) == 2:
+                (s, i), (t, k) = shared
+                crossings[s].append((i, t, k))
+                crossings[t].append((k, s, i))
+        
+        lengths = [length for _, length in slots]
+        domains = []
+        for length in lengths:
+            words, _ = self._table(length)
+            domains.append((1 << len(words)) - 1)
+        self._nodes = 0
+        if not self._propagate(lengths, crossings, domains, list(range(len(slots)))):
+            self.stats.dead_ends += 1
+            return None
+        
+        assigned: List[Optional[str]] = [None] * len(slots)
+        if not self._search(lengths, crossings, domains, assigned, set()):
+            self.stats.dead_ends += 1
+            return None
+        return [PlacedWord(word=word, row=pos.row, col=pos.col, direction=pos.direction)
+                for (pos, _), word in zip(slots, assigned)]
+    
+    def _propagate(self, lengths: List[int], crossings: List[List[Tuple[int, int, int]]],
+                   domains: List[int], queue: List[int]) -> bool:
+        """沿交叉格传播候选约束，某槽位候选为空时返回 False"""
+        while queue:
+            s = queue.pop()
+            domain = domains[s]
+            _, columns = self._table(lengths[s])
+            for i, t, k in crossings[s]:
+                _, other = self._table(lengths[t])
+                letters = {char for char, bits in columns[i] if domain & bits}
+                allowed = 0
+                for char, bits in other[k]:
+                    if char in letters:
+                        allowed |= bits
+                narrowed = domains[t] & allowed
+                if narrowed != domains[t]:
+                    if not narrowed:
+                        return False
+                    domains[t] = narrowed
+                    queue.append(t)
+        return True
+    
+    def _search(self, lengths: List[int], crossings: List[List[Tuple[int, int, int]]],
+                domains: List[int], assigned: List[Optional[str]], used: Set[str]) -> bool:
+        """回溯搜索：每次填候选最少的槽位"""
+        best, best_key = None, None
+        for s, domain in enumerate(domains):
+            if assigned[s] is None:
+                key = (bin(domain).count('1'), -len(crossings[s]))
+                if best_key is None or key < best_key:
+                    best, best_key = s, key
+        if best is None:
+            return True
+        
+        words, _ = self._table(lengths[best])
+        candidates = []
+        bits = domains[best]
+        while bits:
+            lowest = bits & -bits
+            candidates.append(lowest.bit_length() - 1)
+            bits ^= lowest
+        self.rng.shuffle(candidates)
+        
+        for i in candidates:
+            word = words[i]
+            if word in used:
+                continue
+            if self._nodes >= self.max_nodes:
+                return False
+            self._nodes += 1
+            self.stats.iterations += 1
+            trial = list(domains)
+            trial[best] = 1 << i
+            if not self._propagate(lengths, crossings, trial, [best]):
+                continue
+            assigned[best] = word
+            used.add(word)
+            if self._search(lengths, crossings, trial, assigned, used):
+                return True
+            assigned[best] = None
+            used.discard(word)
+            self.stats.backtracks += 1
+        return False
+
+class TemplateContext:
+    """模板填充引擎单个难度的上下文
+    
+    填满的模板每个槽位一个单词，因此只使用尺寸与难度网格相同、槽位数在
+    DIFFICULTY_CONFIG 的 word_count_range 内的模板；没有这样的模板时
+    每次尝试随机生成单词数在该范围内的格栅模板。
+    """
+    
+    # 随机格栅模板只使用词库中至少有这么多单词的长度（单词太少的长度几乎填不上）
+    MIN_WORDS_PER_LENGTH = 50
+    
+    def __init__(self, filler: TemplateFiller, difficulty: Difficulty):
+        config = DIFFICULTY_CONFIG[difficulty]
+        self.grid_size: Tuple[int, int] = config['grid_size']
+        self.word_count_range: Tuple[int, int] = config['word_count_range']
+        min_len, max_len = config['word_length_range']
+        min_count, max_count = self.word_count_range
+        sized = [t for t in filler.templates if t.size == self.grid_size]
+        # 每个槽位需要一个不同的单词：槽位数即单词数
+        self.templates = [t for t in sized if min_count <= len(t.slots()) <= max_count]
+        if len(self.templates) < len(sized):
+            print(f"  {difficulty.value}: 忽略 {len(sized) - len(self.templates)} 个槽位数"
+                  f"不在 {min_count}-{max_count} 内的模板")
+        
+        if self.templates:
+            self.lengths = {length for t in self.templates for _, length in t.slots()}
+        else:
+            bank = filler.word_bank
+            self.lengths = {length for length in range(min_len, max_len + 1)
+                            if len(bank.get_words_by_length(length, length))
+                            >= self.MIN_WORDS_PER_LENGTH}
+            if not self.lengths:
+                self.lengths = set(range(min_len, max_len + 1))
+        self.base_words = [w for length in sorted(self.lengths)
+                           for w in filler.word_bank.get_words_by_length(length, length)]
+
+def create_generator(word_bank: WordBank, options: Optional[dict] = None) -> PuzzleGenerator:
+    """按生成选项创建生成器：template_fill 为真时使用模板填充引擎"""
+    options = dict(options or {})
+    if options.pop('template_fill', False):
+        templates = [GridTemplate(cells) for cells in options.pop('templates', None) or []]
+        return TemplateFiller(word_bank, templates=templates, **options)
+    options.pop('templates', None)
+    return PuzzleGenerator(word_bank, **options)
+
+# ==================== 提示提取器 ====================
+
+class HintExtractor:
+    """从HTML文件和词典文件提取提示"""
+    
+    # 词典 JSONL 中依次尝试的释义字段
+    JSONL_FIELDS = ('hint', 'definition', 'gloss')
+    
+    @staticmethod
+    def extract_from_html(html_path: str) -> Dict[str, str]:
+        """从HTML文件提取KNOWN_HINTS
+        
+        逐行读取，找到 KNOWN_HINTS 后按括号配对（跳过字符串中的括号）截取整个对象，
+        再按 JS 字面量解析，提示中含有花括号或引号也能完整提取。
+        """
+        hints = {}
+        
+        if not os.path.exists(html_path):
+            print(f"警告: HTML文件不存在 {html_path}")
+            return hints
+        
+        try:
+            with open(html_path, 'r', encoding='utf-8') as f:
+                literal = HintExtractor._read_object(f, 'KNOWN_HINTS')
+            
+            if literal:
+                for word, hint in parse_js_literal(literal).items():
+                    if isinstance(hint, str):
+                        hints[word.upper()] = hint
+            
+            print(f"从HTML提取了 {len(hints)} 个提示")
+            
+        except Exception as e:
             print(f"提取提示时出错: {e}")
         
         return hints
+    
+    @staticmethod
+    def _read_object(lines: Iterator[str], name: str) -> Optional[str]:
+        """从逐行输入中截取 `const <name> = {...}` 的对象字面量，找不到时返回 None"""
+        start_pattern = re.compile(r'\b(?:const|let|var)\s+' + re.escape(name) + r'\s*=\s*\{')
+        parts: List[str] = []
+        started = False
+        depth = 0
+        quote = None
+        for line in lines:
+            i = 0
+            if not started:
+                match = start_pattern.search(line)
+                if not match:
+                    continue
+                started = True
+                i = match.end() - 1
+            begin = i
+            while i < len(line):
+                ch = line[i]
+                if quote:
+                    if ch == '\\':
+                        i += 1
+                    elif ch == quote:
+                        quote = None
+                elif ch in '"\'`':
+                    quote = ch
+                elif line.startswith('//', i):
+                    break  # 行注释中的引号和括号不计入配对
+                elif ch == '{':
+                    depth += 1
+                elif ch == '}':
+                    depth -= 1
+                    if depth == 0:
+                        parts.append(line[begin:i + 1])
+                        return ''.join(parts)
+                i += 1
+            parts.append(line[begin:])
+        return None
+    
+    @classmethod
+    def iter_dictionary(cls, path: str) -> Iterator[Tuple[str, str]]:
+        """流式读取词典文件，逐条产出 (单词, 提示)
+        
+        按扩展名识别格式（可再加 .gz 压缩）：.jsonl/.ndjson 每行一个对象，单词取 word 字段，
+        提示取 hint/definition/gloss 字段，或 senses[].glosses[] 中的第一条；
+        其余按 TSV 处理，每行 `单词<TAB>提示`（多于两列时取最后一列），# 开头的行为注释。
+        只产出纯字母的单词，提示中的连续空白合并为一个空格。
+        """
+        compressed = path.lower().endswith('.gz')
+        name = path[:-3] if compressed else path
+        is_jsonl = name.lower().endswith(('.jsonl', '.ndjson'))
+        opener = gzip.open if compressed else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                if is_jsonl:
+                    entry = cls._jsonl_entry(line)
+                    if entry is None:
+                        continue
+                    word, hint = entry
+                else:
+                    if line.startswith('#'):
+                        continue
+                    parts = line.rstrip('\r\n').split('\t')
+                    if len(parts) < 2:
+                        continue
+                    word, hint = parts[0], parts[-1]
+                word = word.strip().upper()
+                hint = ' '.join(hint.split())
+                if word.isalpha() and hint:
+                    yield word, hint
+    
+    @classmethod
+    def _jsonl_entry(cls, line: str) -> Optional[Tuple[str, str]]:
+        """解析 JSONL 词典的一行，无法识别时返回 None"""
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(entry, dict) or not isinstance(entry.get('word'), str):
+            return None
+        for key in cls.JSONL_FIELDS:
+            if isinstance(entry.get(key), str):
+                return entry['word'], entry[key]
+        for sense in entry.get('senses') or []:
+            glosses = sense.get('glosses') if isinstance(sense, dict) else None
+            if glosses and isinstance(glosses[0], str):
+                return entry['word'], glosses[0]
+        return None
+
+class HintStore:
+    """词典提示库：按单词排序、内存映射查找的磁盘索引
+    
+    由一个或多个词典文件流式构建：释义边读边写入临时文件，内存中只保留
+    单词和释义的位置，同一单词以先出现的释义为准。查找时在映射内存中的
+    有序单词表上二分查找，只解码被查询的释义，各进程共享同一份页面缓存，
+    因此只有真正放进谜题的单词才会读取提示。
+    
+    文件结构: MAGIC | 头部长度(u32) | JSON头部 | 对齐填充 | 单词偏移(u32) | 释义区间(u64) | 单词 | 释义
+    """
+    
+    VERSION = 1
+    MAGIC = b'HNT1'
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:4] != self.MAGIC:
+            raise ValueError(f"不是提示库文件: {path}")
+        header_size = int.from_bytes(self._data[4:8], 'little')
+        header = json.loads(self._data[8:8 + header_size])
+        if header['version'] != self.VERSION:
+            raise ValueError(f"提示库版本不匹配: {path}")
+        self._fingerprint: str = header['source']
+        self.count: int = header['count']
+        
+        base = (8 + header_size + 7) & ~7
+        view = memoryview(self._data)
+        start, size = header['word_offsets']
+        self._word_offsets = view[base + start:base + start + size].cast('I')
+        start, size = header['hint_spans']
+        self._hint_spans = view[base + start:base + start + size].cast('Q')
+        self._words_base = base + header['words'][0]
+        self._hints_base = base + header['hints'][0]
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def fingerprint(self) -> str:
+        """词典内容的哈希（参与词库指纹）"""
+        return self._fingerprint
+    
+    def __contains__(self, word: str) -> bool:
+        return self._find(word.upper()) >= 0
+    
+    def _word_at(self, index: int) -> bytes:
+        start = self._words_base + self._word_offsets[index]
+        return self._data[start:self._words_base + self._word_offsets[index + 1]]
+    
+    def _find(self, word: str) -> int:
+        """二分查找单词的编号，不存在时返回 -1"""
+        key = word.encode('utf-8')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._word_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self.count and self._word_at(lo) == key:
+            return lo
+        return -1
+    
+    def get(self, word: str) -> Optional[str]:
+        """查找单词的释义"""
+        index = self._find(word.upper())
+        if index < 0:
+            return None
+        start = self._hints_base + self._hint_spans[2 * index]
+        return self._data[start:self._hints_base + self._hint_spans[2 * index + 1]].decode('utf-8')
+    
+    @classmethod
+    def input_key(cls, sources: List[str]) -> str:
+        """词典文件内容（及顺序）的哈希"""
+        digest = hashlib.sha256(f"{cls.VERSION}:{sys.byteorder}".encode('utf-8'))
+        for path in sources:
+            digest.update(b'\0')
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()[:16]
+    
+    @classmethod
+    def ensure(cls, sources: List[str], cache_dir: str = ".cache") -> str:
+        """确保词典文件对应的提示库存在，返回其路径；词典内容变化时重新构建"""
+        key = cls.input_key(sources)
+        path = os.path.join(cache_dir, f"hints-{key}.bin")
+        if os.path.exists(path):
+            print(f"词典提示库命中: {path}")
+            return path
+        
+        os.makedirs(cache_dir, exist_ok=True)
+        count = cls.build(sources, path, key)
+        for name in os.listdir(cache_dir):
+            stale = os.path.join(cache_dir, name)
+            if name.startswith('hints-') and name.endswith('.bin') and \
+                    os.path.abspath(stale) != os.path.abspath(path):
+                try:
+                    os.remove(stale)
+                except OSError:
+                    pass
+        print(f"词典提示库已更新: {path} ({count} 个单词)")
+        return path
+    
+    @classmethod
+    def build(cls, sources: List[str], path: str, fingerprint: str) -> int:
+        """流式读取词典文件并写入提示库（先写临时文件再原子替换），返回收录的单词数"""
+        # 单词 -> 释义在临时文件中的 偏移 << 32 | 长度
+        spans: Dict[bytes, int] = {}
+        hints_path = path + '.hints.tmp'
+        hints_size = 0
+        with open(hints_path, 'wb') as out:
+            for source in sources:
+                for word, hint in HintExtractor.iter_dictionary(source):
+                    key = word.encode('utf-8')
+                    if key in spans:
+                        continue
+                    data = hint.encode('utf-8')[:0xFFFFFFFF]
+                    out.write(data)
+                    spans[key] = hints_size << 32 | len(data)
+                    hints_size += len(data)
+        
+        keys = sorted(spans)
+        word_offsets = array('I', [0])
+        hint_spans = array('Q')
+        words_size = 0
+        for key in keys:
+            words_size += len(key)
+            word_offsets.append(words_size)
+            start, size = spans[key] >> 32, spans[key] & 0xFFFFFFFF
+            hint_spans.append(start)
+            hint_spans.append(start + size)
+        del spans
+        
+        offsets_size = len(word_offsets) * word_offsets.itemsize
+        spans_offset = (offsets_size + 7) & ~7
+        spans_size = len(hint_spans) * hint_spans.itemsize
+        words_offset = spans_offset + spans_size
+        header = json.dumps({
+            'version': cls.VERSION,
+            'source': fingerprint,
+            'count': len(keys),
+            'word_offsets': [0, offsets_size],
+            'hint_spans': [spans_offset, spans_size],
+            'words': [words_offset, words_size],
+            'hints': [words_offset + words_size, hints_size],
+        }, separators=(',', ':')).encode('utf-8')
+        data_start = (8 + len(header) + 7) & ~7
+        
+        temp_path = path + '.tmp'
+        try:
+            with open(temp_path, 'wb') as f:
+                f.write(cls.MAGIC)
+                f.write(len(header).to_bytes(4, 'little'))
+                f.write(header)
+                f.write(b'\0' * (data_start - 8 - len(header)))
+                word_offsets.tofile(f)
+                f.write(b'\0' * (spans_offset - offsets_size))
+                hint_spans.tofile(f)
+                f.write(b''.join(keys))
+                with open(hints_path, 'rb') as hints_file:
+                    shutil.copyfileobj(hints_file, f, 1 << 20)
+            os.replace(temp_path, path)
+        finally:
+            os.remove(hints_path)
+        return len(keys)
+
+def words_with_hints(words: List[str], hints: Dict[str, str],
+                     hint_store: Optional[HintStore] = None) -> List[str]:
+    """只保留有提示（提示表或词典提示库中）的单词"""
+    return [w for w in words
+            if hints.get(w) or (hint_store is not None and w in hint_store)]
 
 # ==================== 文件IO ====================
 
@@ -575,41 +2687,1348 @@ class FileIO:
             print(f"加载词库时出错: {e}")
         
         return words
+
+def pack_puzzle(puzzle: dict, word_ids: Dict[Tuple[str, str], int],
+                new_words: List[str], new_hints: List[str]) -> List[int]:
+    """把谜题编码为紧凑整数数组 [行数, 列数, 单词编号, 位置, ...]
+    
+    位置 = 行 << 9 | 列 << 1 | 方向位 (H=0, V=1)。词表中没有的 (单词, 提示)
+    会分配新编号，并追加到 new_words/new_hints。
+    """
+    packed = [puzzle['gridSize']['rows'], puzzle['gridSize']['cols']]
+    for w in puzzle['words']:
+        key = (w['w'], w['h'])
+        word_id = word_ids.get(key)
+        if word_id is None:
+            word_id = len(word_ids)
+            word_ids[key] = word_id
+            new_words.append(w['w'])
+            new_hints.append(w['h'])
+        direction = 1 if w['d'] == 'V' else 0
+        packed.extend((word_id, w['r'] << 9 | w['c'] << 1 | direction))
+    return packed
+
+def unpack_puzzle(packed: List[int], words: List[str], hints: List[str]) -> dict:
+    """把紧凑整数数组解码为谜题字典（编号由起点位置推导）"""
+    puzzle_words = []
+    for i in range(2, len(packed), 2):
+        word_id, pos = packed[i], packed[i + 1]
+        puzzle_words.append({
+            'w': words[word_id],
+            'r': pos >> 9,
+            'c': (pos >> 1) & 0xFF,
+            'd': 'V' if pos & 1 else 'H',
+            'h': hints[word_id],
+            'n': 0
+        })
+    
+    # 起点按从上到下、从左到右排序，同一起点共用编号
+    starts = sorted({(w['r'], w['c']) for w in puzzle_words})
+    numbers = {start: number for number, start in enumerate(starts, 1)}
+    for w in puzzle_words:
+        w['n'] = numbers[(w['r'], w['c'])]
+    
+    return {'gridSize': {'rows': packed[0], 'cols': packed[1]}, 'words': puzzle_words}
+
+def parse_js_literal(text: str):
+    """解析手写的 JS 对象字面量（键不加引号、单引号字符串、注释、尾随逗号）
+    
+    逐个字符转换为 JSON 后交给 json.loads，只支持题库中用到的字面量语法。
+    """
+    out: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in '"\'':
+            # 字符串：统一转为双引号
+            j = i + 1
+            chars = []
+            while j < n and text[j] != ch:
+                if text[j] == '\\':
+                    chars.append(text[j:j + 2])
+                    j += 2
+                    continue
+                chars.append('\\"' if text[j] == '"' else text[j])
+                j += 1
+            value = ''.join(chars)
+            if ch == "'":
+                value = value.replace("\\'", "'")
+            out.append(f'"{value}"')
+            i = j + 1
+        elif text.startswith('//', i):
+            i = text.find('\n', i)
+            i = n if i < 0 else i
+        elif text.startswith('/*', i):
+            i = text.find('*/', i + 2)
+            i = n if i < 0 else i + 2
+        elif ch.isalpha() or ch in '_$':
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in '_$'):
+                j += 1
+            name = text[i:j]
+            k = j
+            while k < n and text[k].isspace():
+                k += 1
+            out.append(f'"{name}"' if k < n and text[k] == ':' else name)
+            i = j
+        elif ch in ']}':
+            # 去掉尾随逗号
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            out.append(ch)
+            i += 1
+        else:
+            out.append(ch)
+            i += 1
+    return json.loads(''.join(out))
+
+class PuzzleDBReader:
+    """题库读取器
+    
+    逐行流式解析 PuzzleDBWriter/CompactPuzzleDBWriter/SeedPuzzleDBWriter 写出的题库，
+    并兼容旧版整体写出的格式（format 为 'legacy'，需整体读入）。
+    迭代产出 (难度, 谜题字典)，种子格式产出 (难度, 种子)，其生成器信息见 generator；
+    读完后 counts 为各难度题数，end_offset 为最后一条完整记录之后的字节位置（用于续写时截断）。
+    """
+    
+    PUSH_PATTERN = re.compile(r'^PUZZLE_DB\.(?:puzzles\.(\w+)|(words|hints))\.push\((.*)\);$')
+    GENERATOR_PATTERN = re.compile(r'^PUZZLE_DB\.generator = (.*);$')
+    
+    def __init__(self, filepath: str, limit: Optional[int] = None):
+        self.filepath = filepath
+        self.limit = limit  # 只读取该字节位置之前的内容
+        self.format: Optional[str] = None
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.words: List[str] = []
+        self.hints: List[str] = []
+        self.generator: Optional[dict] = None
+        self.end_offset = 0
+    
+    def __iter__(self) -> Iterator[Tuple[str, dict]]:
+        with open(self.filepath, 'rb') as f:
+            offset = 0
+            for raw in f:
+                if not raw.endswith(b'\n'):
+                    break  # 中途退出留下的不完整行
+                if self.limit is not None and offset + len(raw) > self.limit:
+                    break
+                offset += len(raw)
+                line = raw.decode('utf-8').strip()
+                
+                if line == 'const PUZZLE_DB = {':
+                    f.seek(0)
+                    yield from self._iter_legacy(f.read().decode('utf-8'))
+                    return
+                if line.startswith('const PUZZLE_DB'):
+                    match = re.search(r'format: "(\w+)"', line)
+                    self.format = match.group(1) if match else 'full'
+                    self.end_offset = offset
+                    continue
+                match = self.GENERATOR_PATTERN.match(line)
+                if match:
+                    self.generator = json.loads(match.group(1))
+                    self.end_offset = offset
+                    continue
+                
+                match = self.PUSH_PATTERN.match(line)
+                if not match:
+                    continue
+                difficulty, table, payload = match.groups()
+                if table:
+                    getattr(self, table).extend(json.loads(f'[{payload}]'))
+                else:
+                    puzzle = json.loads(payload)
+                    if isinstance(puzzle, list):
+                        puzzle = unpack_puzzle(puzzle, self.words, self.hints)
+                    self.counts[difficulty] += 1
+                    yield difficulty, puzzle
+                self.end_offset = offset
+    
+    def _iter_legacy(self, content: str) -> Iterator[Tuple[str, dict]]:
+        """解析旧版格式: puzzles 字段为一整段JSON（手写题库为 JS 字面量）"""
+        self.format = 'legacy'
+        match = re.search(r'puzzles:\s*(\{.*\})\s*\};?\s*$', content, re.DOTALL)
+        if not match:
+            raise ValueError(f"无法识别的题库格式: {self.filepath}")
+        try:
+            puzzles_by_difficulty = json.loads(match.group(1))
+        except ValueError:
+            puzzles_by_difficulty = parse_js_literal(match.group(1))
+        for difficulty, puzzles in puzzles_by_difficulty.items():
+            for puzzle in puzzles:
+                self.counts[difficulty] += 1
+                yield difficulty, puzzle
+
+class PuzzleDBWriter:
+    """流式题库写入器
+    
+    文件头先声明空的 PUZZLE_DB，之后每个谜题写成一行独立的
+    push 语句并立即刷新到磁盘，内存占用与题库规模无关；
+    中途退出时已写入的谜题依然是可加载的合法JS。
+    """
+    
+    FORMAT = 'full'
+    
+    def __init__(self, filepath: str, difficulties: Optional[List[str]] = None,
+                 append: bool = False, timestamp: bool = True):
+        self.filepath = filepath
+        self.difficulties = difficulties or [d.value for d in Difficulty]
+        self.counts = {d: 0 for d in self.difficulties}
+        # 续写模式：保留已有题库，在其末尾继续追加
+        self.append = append
+        # 文件头是否写生成时间（固定种子时关闭，相同输入的输出逐字节相同）
+        self.timestamp = timestamp
+        self._file = None
+    
+    def __enter__(self) -> 'PuzzleDBWriter':
+        self.open()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    def open(self):
+        """创建文件并写入文件头"""
+        directory = os.path.dirname(self.filepath)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if self.append and os.path.exists(self.filepath):
+            self._open_existing()
+            return
+        self._file = open(self.filepath, 'w', encoding='utf-8')
+        self._file.write(self._header())
+        self._file.flush()
+    
+    def _open_existing(self):
+        """续写已有题库：读入已有记录，截掉文件尾的总数行和不完整行"""
+        reader = PuzzleDBReader(self.filepath)
+        legacy = [record for record in reader if reader.format == 'legacy']
+        
+        if reader.format == 'legacy':
+            # 旧版整体格式无法追加，先按当前格式重写一遍
+            self._file = open(self.filepath, 'w', encoding='utf-8')
+            self._file.write(self._header())
+            for difficulty, puzzle in legacy:
+                self.write(difficulty, puzzle)
+            return
+        if reader.format != self.FORMAT:
+            raise ValueError(f"已有题库为 {reader.format} 格式，无法以 {self.FORMAT} 格式续写")
+        
+        for difficulty, count in reader.counts.items():
+            if difficulty not in self.counts:
+                raise ValueError(f"已有题库包含未知难度: {difficulty}")
+            self.counts[difficulty] = count
+        self._load_tables(reader)
+        with open(self.filepath, 'r+b') as f:
+            f.truncate(reader.end_offset)
+        self._file = open(self.filepath, 'a', encoding='utf-8')
+    
+    def _load_tables(self, reader: 'PuzzleDBReader'):
+        """从已有题库恢复写入器状态（完整格式无需恢复）"""
+    
+    def position(self) -> int:
+        """已写入内容的字节数（用于记录断点）"""
+        self._file.flush()
+        return os.fstat(self._file.fileno()).st_size
+    
+    def _timestamp_line(self) -> str:
+        """文件头中的生成时间注释（timestamp 为假时省略）"""
+        return f"// 生成时间: {datetime.now().isoformat()}\n" if self.timestamp else ""
+    
+    def _header(self) -> str:
+        """文件头：声明空的 PUZZLE_DB"""
+        buckets = ', '.join(f'{d}: []' for d in self.difficulties)
+        return (
+            f"// 自动生成的填字游戏题库\n"
+            f"{self._timestamp_line()}"
+            f"\n"
+            f'const PUZZLE_DB = {{ version: "1.1.0", totalCount: 0, puzzles: {{ {buckets} }} }};\n'
+        )
     
     @staticmethod
-    def save_puzzle_db(puzzles: Dict[str, List[dict]], filepath: str):
-        """保存题库到JS文件"""
+    def _dumps(value) -> str:
+        """紧凑JSON序列化"""
+        return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    
+    def write(self, difficulty: str, puzzle: dict):
+        """写入一个谜题（单行，立即刷新）"""
+        if difficulty not in self.counts:
+            raise ValueError(f"未知难度: {difficulty}")
+        self._file.write(f"PUZZLE_DB.puzzles.{difficulty}.push({self._dumps(puzzle)});\n")
+        self._file.flush()
+        self.counts[difficulty] += 1
+    
+    def close(self):
+        """写入总数并关闭文件"""
+        if self._file is None:
+            return
+        total = sum(self.counts.values())
+        self._file.write(f"PUZZLE_DB.totalCount = {total};\n")
+        self._file.close()
+        self._file = None
+        
+        print(f"题库已保存到 {self.filepath}")
+        for difficulty, count in self.counts.items():
+            print(f"  - {difficulty}: {count} 题")
+
+class CompactPuzzleDBWriter(PuzzleDBWriter):
+    """紧凑格式题库写入器
+    
+    单词与提示只在共享词表中出现一次（words/hints 按编号对应），
+    每个谜题是 pack_puzzle 编码的整数数组，编号由起点位置推导，不再存储。
+    首次出现的单词在所属谜题之前以 push 语句追加到词表。
+    """
+    
+    FORMAT = 'compact'
+    
+    def __init__(self, filepath: str, difficulties: Optional[List[str]] = None,
+                 append: bool = False, timestamp: bool = True):
+        super().__init__(filepath, difficulties, append, timestamp)
+        self.word_ids: Dict[Tuple[str, str], int] = {}
+    
+    def _load_tables(self, reader: 'PuzzleDBReader'):
+        """从已有题库恢复共享词表"""
+        self.word_ids = {key: i for i, key in enumerate(zip(reader.words, reader.hints))}
+    
+    def _header(self) -> str:
+        """文件头：声明空的 PUZZLE_DB 与共享词表"""
+        buckets = ', '.join(f'{d}: []' for d in self.difficulties)
+        return (
+            f"// 自动生成的填字游戏题库（紧凑格式）\n"
+            f"{self._timestamp_line()}"
+            f"\n"
+            f'const PUZZLE_DB = {{ version: "2.0.0", format: "compact", totalCount: 0, '
+            f'words: [], hints: [], puzzles: {{ {buckets} }} }};\n'
+        )
+    
+    def write(self, difficulty: str, puzzle: dict):
+        """写入一个谜题（新单词先追加到词表）"""
+        if difficulty not in self.counts:
+            raise ValueError(f"未知难度: {difficulty}")
+        
+        new_words, new_hints = [], []
+        packed = pack_puzzle(puzzle, self.word_ids, new_words, new_hints)
+        
+        lines = []
+        if new_words:
+            lines.append(f"PUZZLE_DB.words.push({self._dumps(new_words)[1:-1]});\n")
+            lines.append(f"PUZZLE_DB.hints.push({self._dumps(new_hints)[1:-1]});\n")
+        lines.append(f"PUZZLE_DB.puzzles.{difficulty}.push({self._dumps(packed)});\n")
+        self._file.write(''.join(lines))
+        self._file.flush()
+        self.counts[difficulty] += 1
+
+class ShardedPuzzleDBWriter(PuzzleDBWriter):
+    """分片题库写入器
+    
+    每个难度按固定大小切分为独立的分片文件，另写一个小的清单
+    manifest.js（各难度数量、分片范围与校验和），页面只需加载清单，
+    再由 PuzzleLoader 按需加载所需分片。每写完一个分片就更新清单。
+    """
+    
+    def __init__(self, directory: str, difficulties: Optional[List[str]] = None,
+                 shard_size: int = 500, compact: bool = False,
+                 base_url: str = "data/shards/", timestamp: bool = True):
+        super().__init__(os.path.join(directory, 'manifest.js'), difficulties,
+                         timestamp=timestamp)
+        self.directory = directory
+        self.shard_size = shard_size
+        self.compact = compact
+        self.base_url = base_url
+        self.buffers: Dict[str, List[dict]] = {d: [] for d in self.difficulties}
+        self.shards: Dict[str, List[dict]] = {d: [] for d in self.difficulties}
+    
+    def open(self):
+        """创建目录并写入空清单"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._write_manifest()
+    
+    def write(self, difficulty: str, puzzle: dict):
+        """缓存谜题，凑满一个分片时写出"""
+        if difficulty not in self.counts:
+            raise ValueError(f"未知难度: {difficulty}")
+        self.buffers[difficulty].append(puzzle)
+        self.counts[difficulty] += 1
+        if len(self.buffers[difficulty]) >= self.shard_size:
+            self._flush_shard(difficulty)
+    
+    def close(self):
+        """写出剩余不满的分片并更新清单"""
+        for difficulty in self.difficulties:
+            if self.buffers[difficulty]:
+                self._flush_shard(difficulty)
+        
+        print(f"分片题库已保存到 {self.directory}")
+        for difficulty, count in self.counts.items():
+            print(f"  - {difficulty}: {count} 题, {len(self.shards[difficulty])} 个分片")
+    
+    def _flush_shard(self, difficulty: str):
+        """写出一个分片文件并记录到清单"""
+        puzzles = self.buffers[difficulty]
+        number = len(self.shards[difficulty])
+        start = sum(shard['end'] - shard['start'] for shard in self.shards[difficulty])
+        key = f"{difficulty}/{number}"
+        filename = f"{difficulty}_{number:04d}.js"
+        
+        if self.compact:
+            word_ids: Dict[Tuple[str, str], int] = {}
+            words, hints = [], []
+            packed = [pack_puzzle(p, word_ids, words, hints) for p in puzzles]
+            payload = {'words': words, 'hints': hints, 'puzzles': packed}
+        else:
+            payload = {'puzzles': puzzles}
+        content = (
+            f"(window.PUZZLE_SHARDS = window.PUZZLE_SHARDS || {{}})"
+            f"[{json.dumps(key)}] = {self._dumps(payload)};\n"
+        ).encode('utf-8')
+        with open(os.path.join(self.directory, filename), 'wb') as f:
+            f.write(content)
+        
+        self.shards[difficulty].append({
+            'key': key,
+            'file': filename,
+            'start': start,
+            'end': start + len(puzzles),
+            'sha256': hashlib.sha256(content).hexdigest()
+        })
+        self.buffers[difficulty] = []
+        self._write_manifest()
+    
+    def _write_manifest(self):
+        """原子地重写清单文件（只包含已写出的分片）"""
+        difficulties = {}
+        for difficulty in self.difficulties:
+            shards = self.shards[difficulty]
+            difficulties[difficulty] = {
+                'count': shards[-1]['end'] if shards else 0,
+                'shards': shards
+            }
+        manifest = {
+            'version': "2.1.0",
+            'format': 'compact' if self.compact else 'full',
+            'baseUrl': self.base_url,
+            'shardSize': self.shard_size,
+            'totalCount': sum(d['count'] for d in difficulties.values()),
+            'difficulties': difficulties
+        }
+        temp_path = self.filepath + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(
+                f"// 自动生成的分片题库清单\n"
+                f"{self._timestamp_line()}"
+                f"\n"
+                f"const PUZZLE_DB_MANIFEST = {self._dumps(manifest)};\n"
+            )
+        os.replace(temp_path, self.filepath)
+
+class SeedPuzzleDBWriter(PuzzleDBWriter):
+    """种子格式题库写入器
+    
+    每个谜题只记录生成它的种子，文件头记录生成器信息（指纹、影响结果的选项、
+    每题尝试次数上限），由 SeedPuzzleDB 按需重新生成；每题约占几十字节。
+    该格式供 Python 工具使用，页面无法直接加载。
+    """
+    
+    FORMAT = 'seeds'
+    
+    def __init__(self, filepath: str, difficulties: Optional[List[str]] = None,
+                 append: bool = False, generator_info: Optional[dict] = None,
+                 timestamp: bool = True):
+        super().__init__(filepath, difficulties, append, timestamp)
+        self.generator_info = generator_info or {}
+    
+    def _load_tables(self, reader: 'PuzzleDBReader'):
+        """续写前确认已有题库与当前词库、生成选项一致"""
+        fingerprint = (reader.generator or {}).get('fingerprint')
+        if fingerprint != self.generator_info.get('fingerprint'):
+            raise ValueError(f"已有种子题库的指纹 {fingerprint} 与当前词库或生成选项不一致")
+    
+    def _header(self) -> str:
+        """文件头：声明空的 PUZZLE_DB 与生成器信息"""
+        buckets = ', '.join(f'{d}: []' for d in self.difficulties)
+        return (
+            f"// 自动生成的填字游戏题库（种子格式，需用 SeedPuzzleDB 重新生成谜题）\n"
+            f"{self._timestamp_line()}"
+            f"\n"
+            f'const PUZZLE_DB = {{ version: "3.0.0", format: "seeds", totalCount: 0, '
+            f'puzzles: {{ {buckets} }} }};\n'
+            f"PUZZLE_DB.generator = {self._dumps(self.generator_info)};\n"
+        )
+    
+    def write(self, difficulty: str, seed: int):
+        """写入一个谜题的种子"""
+        if difficulty not in self.counts:
+            raise ValueError(f"未知难度: {difficulty}")
+        self._file.write(f"PUZZLE_DB.puzzles.{difficulty}.push({int(seed)});\n")
+        self._file.flush()
+        self.counts[difficulty] += 1
+
+class SeedPuzzleDB:
+    """种子格式题库的查询接口
+    
+    按文件头中的选项重建生成器，并核对词库指纹；get 按需用种子重新生成谜题，
+    结果放入容量为 cache_size 的 LRU 缓存。迭代按文件顺序产出 (难度, 谜题字典)。
+    """
+    
+    def __init__(self, filepath: str, word_bank: WordBank, cache_size: int = 256):
+        reader = PuzzleDBReader(filepath)
+        self.seeds: Dict[str, List[int]] = defaultdict(list)
+        self.order: List[Tuple[str, int]] = []
+        for difficulty, seed in reader:
+            self.order.append((difficulty, len(self.seeds[difficulty])))
+            self.seeds[difficulty].append(seed)
+        if reader.format != 'seeds':
+            raise ValueError(f"不是种子格式的题库: {filepath}")
+        info = reader.generator or {}
+        self.counts = reader.counts
+        
+        self.generator = create_generator(word_bank, info.get('options'))
+        self.generator.max_attempts = info.get('maxAttempts', ParallelGenerator.MAX_ATTEMPTS)
+        fingerprint = self.generator.fingerprint()
+        if fingerprint != info.get('fingerprint'):
+            raise ValueError(f"词库指纹 {fingerprint} 与题库记录的 {info.get('fingerprint')} 不一致，"
+                             f"无法复现谜题")
+        
+        self.cache_size = cache_size
+        self._cache: 'OrderedDict[Tuple[str, int], dict]' = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    
+    def __len__(self) -> int:
+        return len(self.order)
+    
+    def __iter__(self) -> Iterator[Tuple[str, dict]]:
+        for difficulty, index in self.order:
+            yield difficulty, self.get(difficulty, index)
+    
+    def seed(self, difficulty: str, index: int) -> int:
+        """指定难度第 index 题的种子"""
+        return self.seeds[difficulty][index]
+    
+    def get(self, difficulty: str, index: int) -> dict:
+        """指定难度第 index 题（缓存未命中时重新生成）"""
+        key = (difficulty, index)
+        puzzle = self._cache.get(key)
+        if puzzle is not None:
+            self.hits += 1
+            self._cache.move_to_end(key)
+            return puzzle
+        
+        self.misses += 1
+        seed = self.seed(difficulty, index)
+        result = self.generator.generate(Difficulty(difficulty), seed)
+        if result is None:
+            raise ValueError(f"种子 {seed} 无法复现 {difficulty} 难度第 {index} 题")
+        puzzle = result.to_dict()
+        self._cache[key] = puzzle
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return puzzle
+
+@dataclass
+class Checkpoint:
+    """断点信息：续写题库时从这里继续生成"""
+    master_seed: int
+    offset: int  # 题库文件中已记录部分的结束位置（字节）
+    # {难度: {'count': 已写入题数, 'next_slot': 下一个槽位, 'target': 目标题数}}
+    difficulties: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    
+    # 没有可用断点时，已有 n 题的难度从槽位 n × APPEND_SLOT_BLOCK 开始补题：
+    # 生成已有题目的运行从槽位 0 开始，即使沿用同一个 --seed 也不会重复生成它们
+    APPEND_SLOT_BLOCK = 1 << 32
+    
+    @staticmethod
+    def path_for(output_file: str) -> str:
+        """题库文件对应的断点文件路径"""
+        return output_file + '.checkpoint.json'
+    
+    @classmethod
+    def load(cls, path: str) -> Optional['Checkpoint']:
+        """读取断点文件，不存在或损坏时返回 None"""
+        if not os.path.exists(path):
+            return None
         try:
-            # 统计信息
-            total = sum(len(p) for p in puzzles.values())
-            
-            # 生成JS内容
-            js_content = f'''// 自动生成的填字游戏题库
-// 生成时间: {__import__('datetime').datetime.now().isoformat()}
-// 总题目数: {total}
-
-const PUZZLE_DB = {{
-    version: "1.0.0",
-    totalCount: {total},
-    puzzles: {json.dumps(puzzles, ensure_ascii=False, indent=2)}
-}};
-'''
+            with open(path, 'r', encoding='utf-8') as f:
+                return cls(**json.load(f))
+        except (OSError, ValueError, TypeError) as e:
+            print(f"警告: 断点文件无效 {path}: {e}")
+            return None
+    
+    def save(self, path: str):
+        """原子地写入断点文件"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'master_seed': self.master_seed, 'offset': self.offset,
+                       'difficulties': self.difficulties}, f, indent=2)
+        os.replace(temp_path, path)
+    
+    def matches(self, filepath: str) -> bool:
+        """题库文件在断点位置之前的内容是否与断点记录一致"""
+        reader = PuzzleDBReader(filepath, limit=self.offset)
+        for _ in reader:
+            pass
+        if reader.end_offset != self.offset:
+            return False
+        return all(reader.counts.get(d, 0) == info['count']
+                   for d, info in self.difficulties.items())
+
+# ==================== 去重索引 ====================
+
+class PuzzleDedupIndex:
+    """谜题去重索引
+    
+    完全重复：对布局做规范化（平移到左上角、转置取较小者）后取哈希，
+    集合查找即可判定。
+    近似重复：对单词集合计算 MinHash 签名，按 LSH 分段分桶；
+    只有落入同一桶的候选才计算精确 Jaccard 相似度，
+    因此每道题的检查耗时与已收录题数基本无关。
+    """
+    
+    NUM_PERM = 64   # MinHash 签名长度
+    BANDS = 16      # LSH 分段数（每段 NUM_PERM // BANDS 行）
+    _PRIME = (1 << 61) - 1
+    
+    def __init__(self, threshold: float = 0.7, seed: int = 1):
+        self.threshold = threshold  # 单词集合 Jaccard 相似度达到该值即视为近似重复
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, self._PRIME), rng.randrange(self._PRIME))
+                       for _ in range(self.NUM_PERM)]
+        self._rows = self.NUM_PERM // self.BANDS
+        self._word_hashes: Dict[str, int] = {}  # 词库规模有限，单词哈希可以缓存
+        self._layouts: Set[bytes] = set()
+        self._word_sets: List[frozenset] = []
+        self._buckets: List[Dict[Tuple[int, ...], List[int]]] = [
+            defaultdict(list) for _ in range(self.BANDS)
+        ]
+        self.rejected = {'duplicate': 0, 'similar': 0}
+    
+    def __len__(self) -> int:
+        return len(self._word_sets)
+    
+    @staticmethod
+    def layout_key(puzzle: dict) -> bytes:
+        """布局的规范化哈希：与平移和转置无关"""
+        words = puzzle['words']
+        min_r = min(w['r'] for w in words)
+        min_c = min(w['c'] for w in words)
+        layout = sorted((w['w'], w['r'] - min_r, w['c'] - min_c, w['d']) for w in words)
+        transposed = sorted((word, c, r, 'V' if d == 'H' else 'H')
+                            for word, r, c, d in layout)
+        canonical = min(layout, transposed)
+        return hashlib.blake2b(repr(canonical).encode('utf-8'), digest_size=16).digest()
+    
+    def signature(self, word_set: frozenset) -> List[int]:
+        """单词集合的 MinHash 签名"""
+        hashes = []
+        for w in word_set:
+            h = self._word_hashes.get(w)
+            if h is None:
+                h = int.from_bytes(hashlib.blake2b(w.encode('utf-8'), digest_size=8).digest(), 'big')
+                self._word_hashes[w] = h
+            hashes.append(h)
+        prime = self._PRIME
+        return [min((a * h + b) % prime for h in hashes) for a, b in self._perms]
+    
+    def check(self, puzzle: dict) -> Optional[str]:
+        """检查谜题是否重复，返回 'duplicate'/'similar'，不重复时返回 None"""
+        reason, _, _ = self._lookup(puzzle)
+        return reason
+    
+    def add(self, puzzle: dict) -> bool:
+        """收录谜题；重复或近似重复时拒绝并返回 False"""
+        reason, layout, bands = self._lookup(puzzle)
+        if reason:
+            self.rejected[reason] += 1
+            return False
+        puzzle_id = len(self._word_sets)
+        self._layouts.add(layout)
+        self._word_sets.append(frozenset(w['w'] for w in puzzle['words']))
+        for buckets, band in zip(self._buckets, bands):
+            buckets[band].append(puzzle_id)
+        return True
+    
+    def _lookup(self, puzzle: dict) -> Tuple[Optional[str], bytes, List[Tuple[int, ...]]]:
+        layout = self.layout_key(puzzle)
+        if layout in self._layouts:
+            return 'duplicate', layout, []
+        
+        word_set = frozenset(w['w'] for w in puzzle['words'])
+        signature = self.signature(word_set)
+        rows = self._rows
+        bands = [tuple(signature[i:i + rows]) for i in range(0, self.NUM_PERM, rows)]
+        checked = set()
+        for buckets, band in zip(self._buckets, bands):
+            for candidate in buckets.get(band, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                other = self._word_sets[candidate]
+                if len(word_set & other) >= self.threshold * len(word_set | other):
+                    return 'similar', layout, bands
+        return None, layout, bands
+
+# ==================== 并行生成 ====================
+
+def derive_seed(master_seed: int, difficulty: Difficulty, slot: int) -> int:
+    """由主种子派生指定难度、指定槽位的谜题种子"""
+    key = f"{master_seed}:{difficulty.value}:{slot}".encode('utf-8')
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], 'big')
+
+def load_word_bank(words: Optional[List[str]], hints: Optional[Dict[str, str]],
+                   word_bank_cache: Optional[str] = None, compact_bank: bool = False,
+                   hint_store: Optional[str] = None) -> WordBank:
+    """创建词库：给出缓存文件时直接映射缓存，否则由单词和提示构建
+    
+    hint_store 为词典提示库文件，各进程各自映射，只在放置单词时按需查找提示。
+    """
+    if word_bank_cache:
+        word_bank = WordBankCache.load(word_bank_cache, compact_bank)
+    elif compact_bank:
+        word_bank = CompactWordBank(words, hints)
+    else:
+        word_bank = WordBank(words, hints)
+    if hint_store:
+        word_bank.set_hint_store(HintStore(hint_store))
+    return word_bank
+
+# 工作进程接口（ParallelGenerator 与 puzzle_service.py 共用）：
+# 进程池以 init_worker 为初始化函数，每个槽位交给 generate_slot 生成
+# 工作进程内的生成器实例（由 init_worker 初始化）
+_worker_generator: Optional[PuzzleGenerator] = None
+
+def init_worker(words: Optional[List[str]], hints: Optional[Dict[str, str]],
+                generator_options: Optional[dict] = None,
+                word_bank_cache: Optional[str] = None, compact_bank: bool = False,
+                hint_store: Optional[str] = None):
+    """工作进程初始化：每个进程构建（或从缓存映射）一份自己的词库"""
+    global _worker_generator
+    word_bank = load_word_bank(words, hints, word_bank_cache, compact_bank, hint_store)
+    _worker_generator = create_generator(word_bank, generator_options)
+
+def generate_slot(task: Tuple[str, int, int]
+                  ) -> Tuple[Optional[dict], AttemptStats, Optional[GenerationProfile]]:
+    """生成单个槽位的谜题，结果只取决于槽位种子和尝试次数上限"""
+    difficulty_value, seed, max_attempts = task
+    _worker_generator.max_attempts = max_attempts
+    _worker_generator.stats = AttemptStats()
+    if _worker_generator.profile is not None:
+        _worker_generator.profile = GenerationProfile()
+    puzzle = _worker_generator.generate(Difficulty(difficulty_value), seed)
+    profile = _worker_generator.profile
+    if puzzle is None:
+        return None, _worker_generator.stats, profile
+    
+    started = time.perf_counter()
+    data = puzzle.to_dict()
+    if profile is not None:
+        profile.add_time('serialization', time.perf_counter() - started)
+    return data, _worker_generator.stats, profile
+
+class ParallelGenerator:
+    """多进程并行生成器
+    
+    每个难度的第 k 次尝试（槽位）使用由主种子派生的独立种子，
+    结果按槽位顺序收集，因此输出与工作进程数量无关。
+    """
+    
+    # 每轮每个难度提交的槽位数范围（与进程数无关，保证输出顺序固定）
+    BATCH_MIN = 16
+    BATCH_MAX = 1024
+    # 预算模式下每轮的目标时长（秒）与每题尝试次数上限的范围
+    ROUND_SECONDS = 5.0
+    MIN_ATTEMPTS = 10
+    MAX_ATTEMPTS = 500
+    # 预算模式下连续这么多槽位没有产出即放弃该难度
+    GIVE_UP_SLOTS = 256
+    
+    def __init__(self, words: Optional[List[str]], hints: Optional[Dict[str, str]],
+                 workers: int = 1, master_seed: int = 0,
+                 generator_options: Optional[dict] = None,
+                 dedup_threshold: Optional[float] = 0.7,
+                 word_bank_cache: Optional[str] = None, compact_bank: bool = False,
+                 time_budget: Optional[float] = None, hint_store: Optional[str] = None):
+        self.words = words
+        self.hints = hints
+        # 词典提示库文件：各进程各自映射，按需查找放置单词的提示
+        self.hint_store = hint_store
+        # 词库索引缓存文件：给出时各进程直接映射缓存，无需传入 words/hints
+        self.word_bank_cache = word_bank_cache
+        # 使用内存紧凑的 CompactWordBank（适合超大词库，每个进程一份）
+        self.compact_bank = compact_bank
+        # 墙钟时间预算（秒）：给出时按预算调度，见 _plan_round
+        self.time_budget = time_budget
+        # 未达到目标题数的难度 -> 原因说明
+        self.shortfalls: Dict[str, str] = {}
+        # 模板填充引擎改用默认引擎的难度 -> 改用的尝试次数
+        self.fallbacks: Dict[str, int] = {}
+        # 传给每个 PuzzleGenerator 的参数（如 compact_grid、backtrack）
+        self.generator_options = generator_options or {}
+        self.workers = max(1, workers)
+        self.master_seed = master_seed
+        # 各难度的去重索引（在主进程中按槽位顺序检查，结果与进程数无关）
+        self.dedup: Optional[Dict[str, PuzzleDedupIndex]] = None
+        if dedup_threshold is not None:
+            self.dedup = {d.value: PuzzleDedupIndex(dedup_threshold) for d in Difficulty}
+        # 各难度汇总的性能剖析数据（generator_options 中开启 profile 时）
+        self.profiles: Optional[Dict[str, GenerationProfile]] = None
+        if self.generator_options.get('profile'):
+            self.profiles = {d.value: GenerationProfile() for d in Difficulty}
+    
+    def slot_seed(self, difficulty_value: str, slot: int) -> int:
+        """槽位对应的谜题种子"""
+        return derive_seed(self.master_seed, Difficulty(difficulty_value), slot)
+    
+    def main_word_bank(self) -> WordBank:
+        """在主进程中创建与工作进程相同的词库"""
+        return load_word_bank(self.words, self.hints, self.word_bank_cache, self.compact_bank,
+                              self.hint_store)
+    
+    def seed_info(self) -> dict:
+        """种子格式题库的生成器信息：指纹、影响结果的选项和每题尝试次数上限"""
+        generator = create_generator(self.main_word_bank(), self.generator_options)
+        # 任何槽位的尝试次数都不超过 MAX_ATTEMPTS，按此上限重新生成即可得到相同结果
+        return {'fingerprint': generator.fingerprint(), 'options': generator.output_options(),
+                'maxAttempts': self.MAX_ATTEMPTS}
+    
+    def remember(self, difficulty_value: str, puzzle: dict):
+        """把已有题库中的谜题加入去重索引（续写、重新生成时使用）"""
+        if self.dedup is not None:
+            self.dedup[difficulty_value].add(puzzle)
+    
+    def generate_all(self, difficulties: List[Difficulty]) -> Dict[str, List[dict]]:
+        """生成所有难度的题库"""
+        all_puzzles = {difficulty.value: [] for difficulty in difficulties}
+        for difficulty_value, puzzle, _ in self.iter_puzzles(difficulties):
+            all_puzzles[difficulty_value].append(puzzle)
+        return all_puzzles
+    
+    def iter_puzzles(self, difficulties: List[Difficulty],
+                     targets: Optional[Dict[Difficulty, int]] = None,
+                     start: Optional[Dict[Difficulty, Tuple[int, int]]] = None
+                     ) -> Iterator[Tuple[str, dict, int]]:
+        """逐个产出 (难度, 谜题字典, 槽位)，内存占用与题库规模无关
+        
+        targets 覆盖各难度的目标题数（默认取 DIFFICULTY_CONFIG）；
+        start 为各难度已完成的 (题数, 下一个槽位)，用于断点续跑。
+        """
+        if self.workers == 1:
+            init_worker(self.words, self.hints, self.generator_options,
+                         self.word_bank_cache, self.compact_bank, self.hint_store)
+            yield from self._run(difficulties, None, targets or {}, start or {})
+            return
+        
+        with multiprocessing.Pool(self.workers, initializer=init_worker,
+                                  initargs=(self.words, self.hints, self.generator_options,
+                                            self.word_bank_cache, self.compact_bank,
+                                            self.hint_store)) as pool:
+            yield from self._run(difficulties, pool, targets or {}, start or {})
+    
+    def _run(self, difficulties: List[Difficulty],
+             pool: Optional[multiprocessing.pool.Pool],
+             targets: Dict[Difficulty, int],
+             start: Dict[Difficulty, Tuple[int, int]]) -> Iterator[Tuple[str, dict, int]]:
+        """按轮次分批提交槽位，各难度的任务在同一进程池中并行执行
+        
+        未设时间预算时每个难度最多使用 目标题数×3 个槽位，每题最多尝试
+        DEFAULT_MAX_ATTEMPTS 次，输出只取决于主种子。设了预算时由 _plan_round
+        按实测的单槽位耗时和成功率分配各难度的槽位，使各难度尽量同时在预算内完成；
+        每题尝试次数上限只在固定的槽位边界（_epoch_end）按此前全部槽位的尝试次数
+        调整，每轮不跨越边界，因此各槽位的结果与耗时无关，预算只决定生成到哪个槽位为止。
+        """
+        started = time.monotonic()
+        deadline = started + self.time_budget if self.time_budget else None
+        state = {}
+        for difficulty in difficulties:
+            target_count = targets.get(difficulty,
+                                       DIFFICULTY_CONFIG[difficulty]['puzzles_to_generate'])
+            count, next_slot = start.get(difficulty, (0, 0))
+            # 无断点续写时槽位从 APPEND_SLOT_BLOCK 的整数倍开始，槽位上限与成功率都相对区块起点计算
+            slot_base = next_slot - next_slot % Checkpoint.APPEND_SLOT_BLOCK
+            state[difficulty] = {
+                'target': target_count,
+                'slot_base': slot_base,
+                'max_slots': slot_base + target_count * 3 if deadline is None else None,
+                'next_slot': next_slot,
+                'first_slot': next_slot,
+                'count': count,
+                'slots': 0,       # 本次运行已完成的槽位数
+                'produced': 0,    # 本次运行被采用的谜题数
+                'idle_slots': 0,  # 连续没有产出的槽位数
+                'attempts': PuzzleGenerator.DEFAULT_MAX_ATTEMPTS,
+                'stats': AttemptStats()
+            }
+            print(f"\n  生成 {difficulty.value} 难度 ({count}/{target_count} 题)...")
+        if deadline is not None:
+            print(f"  时间预算 {self.time_budget:.0f} 秒")
+        
+        self.shortfalls = {}
+        self.fallbacks = {}
+        warned = False
+        pending = [d for d in difficulties if self._is_pending(state[d], deadline)]
+        while pending:
+            if deadline is None:
+                plan = {d: self._batch_size(state[d]) for d in pending}
+            else:
+                plan, projected = self._plan_round(state, pending, deadline - time.monotonic())
+                # 本轮不跨越尝试次数上限的调整边界
+                for difficulty in pending:
+                    st = state[difficulty]
+                    boundary = st['first_slot'] + self._epoch_end(st['next_slot'] -
+                                                                  st['first_slot'])
+                    plan[difficulty] = min(plan[difficulty], boundary - st['next_slot'])
+                if projected and not warned:
+                    print(f"  警告: 按当前速率完成全部目标约需 {projected:.0f} 秒，"
+                          f"超出剩余预算 {deadline - time.monotonic():.0f} 秒，"
+                          f"将按比例分配剩余时间")
+                    warned = True
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(js_content)
+            # 提交本轮所有难度的任务
+            batches = []
+            for difficulty in pending:
+                st = state[difficulty]
+                slots = range(st['next_slot'], st['next_slot'] + plan[difficulty])
+                st['next_slot'] = slots.stop
+                tasks = [(difficulty.value, derive_seed(self.master_seed, difficulty, slot),
+                          st['attempts']) for slot in slots]
+                if pool is None:
+                    batches.append((difficulty, slots.start, map(generate_slot, tasks)))
+                else:
+                    chunksize = max(1, len(tasks) // (self.workers * 4))
+                    batches.append((difficulty, slots.start,
+                                    pool.map_async(generate_slot, tasks, chunksize)))
             
-            print(f"题库已保存到 {filepath}")
-            print(f"  - easy: {len(puzzles.get('easy', []))} 题")
-            print(f"  - medium: {len(puzzles.get('medium', []))} 题")
-            print(f"  - hard: {len(puzzles.get('hard', []))} 题")
+            # 按槽位顺序产出结果
+            for difficulty, batch_start, batch in batches:
+                st = state[difficulty]
+                results = batch if pool is None else batch.get()
+                round_stats = AttemptStats()
+                for slot, (puzzle, stats, profile) in enumerate(results, batch_start):
+                    round_stats.merge(stats)
+                    st['slots'] += 1
+                    st['idle_slots'] += 1
+                    if profile is not None:
+                        self.profiles[difficulty.value].merge(profile)
+                    if puzzle and st['count'] < st['target']:
+                        if self.dedup is not None and not self.dedup[difficulty.value].add(puzzle):
+                            continue
+                        st['count'] += 1
+                        st['produced'] += 1
+                        st['idle_slots'] = 0
+                        yield difficulty.value, puzzle, slot
+                st['stats'].merge(round_stats)
+                done = st['next_slot'] - st['first_slot']
+                if deadline is not None and self._epoch_end(done - 1) == done:
+                    st['attempts'] = self._attempt_budget(st['stats'])
+                print(f"    {difficulty.value}: 已生成 {st['count']}/{st['target']}")
             
-        except Exception as e:
-            print(f"保存题库时出错: {e}")
+            pending = [d for d in pending if self._is_pending(state[d], deadline)]
+        
+        elapsed = time.monotonic() - started
+        for difficulty in difficulties:
+            st = state[difficulty]
+            stats = st['stats']
+            print(f"    完成 {difficulty.value}: {st['count']} 题 "
+                  f"(尝试 {stats.attempts} 次, 失败率 {stats.failure_rate:.1%}, "
+                  f"平均失败耗时 {stats.mean_time_to_failure * 1000:.1f} ms, "
+                  f"死局 {stats.dead_ends} 次, 回溯 {stats.backtracks} 次)")
+            if stats.fallbacks:
+                self.fallbacks[difficulty.value] = stats.fallbacks
+                print(f"      模板填不满: {stats.fallbacks} 次尝试改用默认生成引擎")
+            if self.dedup is not None:
+                rejected = self.dedup[difficulty.value].rejected
+                print(f"      去重: 拒绝完全重复 {rejected['duplicate']} 题, "
+                      f"近似重复 {rejected['similar']} 题")
+            if st['count'] < st['target']:
+                self.shortfalls[difficulty.value] = self._shortfall_reason(st, deadline)
+        
+        if self.shortfalls:
+            print(f"\n  未达到目标题数 (用时 {elapsed:.0f} 秒):")
+            for difficulty in difficulties:
+                if difficulty.value in self.shortfalls:
+                    st = state[difficulty]
+                    print(f"    {difficulty.value}: {st['count']}/{st['target']} 题 - "
+                          f"{self.shortfalls[difficulty.value]}")
+    
+    def _is_pending(self, st: dict, deadline: Optional[float]) -> bool:
+        """该难度是否还需要继续提交槽位"""
+        if st['count'] >= st['target']:
+            return False
+        if deadline is None:
+            return st['next_slot'] < st['max_slots']
+        return time.monotonic() < deadline and st['idle_slots'] < self.GIVE_UP_SLOTS
+    
+    def _plan_round(self, state: Dict[Difficulty, dict], pending: List[Difficulty],
+                    remaining: float) -> Tuple[Dict[Difficulty, int], Optional[float]]:
+        """预算模式下分配本轮各难度的槽位数
+        
+        按实测的单槽位耗时（进程·秒）和每槽位产出率估计各难度完成剩余
+        题目所需的工作量，本轮按相同比例推进各难度，使它们同时完成；
+        本轮总工作量不超过 min(剩余时间, ROUND_SECONDS) × 进程数。
+        返回 (分配方案, 预计超出预算时完成全部目标所需的秒数)。
+        """
+        round_capacity = max(min(remaining, self.ROUND_SECONDS), 0.0) * self.workers
+        needed, work = {}, {}
+        for difficulty in pending:
+            st = state[difficulty]
+            remaining_count = st['target'] - st['count']
+            if not st['slots']:
+                continue  # 还没有数据，先试探
+            success_rate = max(st['produced'], 1) / st['slots']
+            slot_cost = max(st['stats'].time / st['slots'], 1e-4)
+            needed[difficulty] = math.ceil(remaining_count / success_rate)
+            work[difficulty] = needed[difficulty] * slot_cost
+        
+        total_work = sum(work.values())
+        scale = min(1.0, round_capacity / total_work) if total_work else 1.0
+        plan = {}
+        for difficulty in pending:
+            if difficulty not in needed:
+                plan[difficulty] = min(self.BATCH_MIN,
+                                       state[difficulty]['target'] - state[difficulty]['count'])
+            else:
+                plan[difficulty] = min(max(1, math.ceil(needed[difficulty] * scale)),
+                                       self.BATCH_MAX)
+        
+        projected = None
+        if total_work > remaining * self.workers:
+            projected = total_work / self.workers
+        return plan, projected
+    
+    def _epoch_end(self, slot: int) -> int:
+        """槽位（从本次运行的第一个槽位起计）所在调整周期的结束位置
+        
+        周期长度从 BATCH_MIN 起倍增，最长 BATCH_MAX：16, 32, 64, ..., 1024, 2048, 3072, ...
+        """
+        end = 0
+        while end <= slot:
+            end += min(max(end, self.BATCH_MIN), self.BATCH_MAX)
+        return end
+    
+    def _attempt_budget(self, stats: AttemptStats) -> int:
+        """按实测单次尝试成功率设置每题尝试次数上限（单题成功概率约 99%）"""
+        if not stats.attempts:
+            return PuzzleGenerator.DEFAULT_MAX_ATTEMPTS
+        success = (stats.attempts - stats.failures) / stats.attempts
+        if success >= 1.0:
+            return self.MIN_ATTEMPTS
+        if success <= 0.0:
+            return self.MAX_ATTEMPTS
+        attempts = math.ceil(math.log(0.01) / math.log(1 - success))
+        return min(max(attempts, self.MIN_ATTEMPTS), self.MAX_ATTEMPTS)
+    
+    def _shortfall_reason(self, st: dict, deadline: Optional[float]) -> str:
+        """说明某难度未达到目标的原因"""
+        if st['produced'] == 0 and st['slots'] > 0:
+            return f"{st['slots']} 个槽位没有产出任何谜题，请检查词库或难度配置"
+        if deadline is None:
+            rate = st['produced'] / st['slots'] if st['slots'] else 0.0
+            return (f"槽位上限 ({st['max_slots'] - st['slot_base']}) 已用完，"
+                    f"每槽位产出率 {rate:.1%}；可设置 --budget 按时间预算继续生成")
+        if st['idle_slots'] >= self.GIVE_UP_SLOTS:
+            return f"连续 {st['idle_slots']} 个槽位没有产出新题（可能全部与已有题目重复）"
+        rate = st['produced'] / st['slots'] if st['slots'] else 0.0
+        slot_cost = st['stats'].time / st['slots'] if st['slots'] else 0.0
+        estimate = (st['target'] - st['count']) / rate * slot_cost / self.workers if rate else 0.0
+        return f"时间预算用尽，按当前速率还需约 {estimate:.0f} 秒"
+    
+    def save_stats(self, filepath: str, extra: Optional[dict] = None):
+        """把性能剖析与去重统计导出为 JSON 报告"""
+        report = {
+            'generated_at': datetime.now().isoformat(),
+            'master_seed': self.master_seed,
+            'workers': self.workers,
+            'options': self.generator_options,
+        }
+        report.update(extra or {})
+        difficulties = {}
+        for difficulty in Difficulty:
+            entry = {}
+            if self.profiles is not None:
+                entry = self.profiles[difficulty.value].to_dict()
+            if self.dedup is not None:
+                entry['dedup_rejected'] = dict(self.dedup[difficulty.value].rejected)
+            difficulties[difficulty.value] = entry
+        report['difficulties'] = difficulties
+        report['shortfalls'] = self.shortfalls
+        report['fallbacks'] = self.fallbacks
+        
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"统计报告已保存到 {filepath}")
+    
+    def _batch_size(self, st: dict) -> int:
+        """根据已观察到的成功率估计本轮需要提交的槽位数"""
+        need = st['target'] - st['count']
+        done = st['next_slot'] - st['slot_base']
+        if done > 0:
+            success_rate = min(max(st['count'] / done, 0.1), 1.0)
+            need = int(need / success_rate) + 1
+        size = min(max(need, self.BATCH_MIN), self.BATCH_MAX)
+        return min(size, st['max_slots'] - st['next_slot'])
 
 # ==================== 主程序 ====================
 
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="填字游戏题库生成器")
+    parser.add_argument('-j', '--workers', type=int, default=1,
+                        help="并行工作进程数 (0 表示使用全部CPU核心，默认 1)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="主随机种子，相同种子生成完全相同的题库 (默认随机)")
+    parser.add_argument('--compact-grid', action='store_true',
+                        help="使用位掩码紧凑网格 (CompactGrid)")
+    parser.add_argument('--backtrack', action='store_true',
+                        help="按得分顺序试放候选并做前向检查，遇到死局时回溯撤销最近的放置，"
+                             "而不是放弃整次尝试")
+    parser.add_argument('--max-backtracks', type=int,
+                        default=PuzzleGenerator.DEFAULT_MAX_BACKTRACKS,
+                        help=f"回溯模式下每次尝试最多回溯的次数，束搜索中为切换分支的次数 "
+                             f"(默认 {PuzzleGenerator.DEFAULT_MAX_BACKTRACKS})")
+    parser.add_argument('--batch', action='store_true',
+                        help="用 NumPy 批量检查和打分候选（需要安装 numpy，适合大词库）")
+    parser.add_argument('--pattern-scan', action='store_true',
+                        help="按槽位查询词库模式索引来扫描候选（适合大词库，与 --batch 同时给出时使用 --batch）")
+    parser.add_argument('--template-fill', action='store_true',
+                        help="使用模板填充引擎：按网格模板填满每个槽位，生成密集的填字游戏")
+    parser.add_argument('--templates', default=None, metavar='FILE',
+                        help="模板文件（'#' 黑格 '.' 白格，模板间空行分隔，隐含 --template-fill）；"
+                             "尺寸与难度网格相同的模板用于该难度，其余难度使用随机格栅模板")
+    parser.add_argument('--beam', type=int, default=0, metavar='WIDTH',
+                        help="束搜索：每层保留排名最高的 WIDTH 个分支，0 为贪心 (默认 0)")
+    parser.add_argument('--beam-branch', type=int, default=5, metavar='K',
+                        help="束搜索中每个状态展开的候选数 (默认 5)")
+    parser.add_argument('--format', choices=['full', 'compact', 'seeds'], default='full',
+                        help="题库格式: full=完整对象, compact=共享词表+整数数组, "
+                             "seeds=只记录种子和词库指纹、由 SeedPuzzleDB 按需重新生成 (默认 full)")
+    parser.add_argument('--shard-size', type=int, default=0,
+                        help="按此大小输出分片题库和清单到 data/shards (默认 0 = 单个文件)")
+    parser.add_argument('--shard-url', default="data/shards/",
+                        help="页面加载分片时使用的URL前缀 (默认 data/shards/)")
+    parser.add_argument('-o', '--output', default="../data/puzzle_db_aa.js",
+                        help="题库输出文件 (默认 ../data/puzzle_db_aa.js)")
+    parser.add_argument('--difficulty', action='append',
+                        choices=[d.value for d in Difficulty],
+                        help="只生成指定难度，可重复指定 (默认全部难度)")
+    parser.add_argument('--count', type=int, default=None,
+                        help="每个难度的目标题数 (默认取难度配置)")
+    parser.add_argument('--budget', type=float, default=None, metavar='SECONDS',
+                        help="墙钟时间预算（秒）：按实测速率分配各难度的工作量并调整重试次数")
+    parser.add_argument('--append', action='store_true',
+                        help="续写已有题库: 有断点时从断点继续，否则补足到目标题数")
+    parser.add_argument('--checkpoint-every', type=int, default=100,
+                        help="每写入多少题保存一次断点 (默认 100)")
+    parser.add_argument('--compact-bank', action='store_true',
+                        help="使用内存紧凑的词库 (CompactWordBank)，适合超大词库")
+    parser.add_argument('--cache-dir', default=".cache",
+                        help="词库索引缓存目录 (默认 .cache)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="不使用词库索引缓存，每次重新加载词库和提示")
+    parser.add_argument('--hints-dict', action='append', default=[], metavar='FILE',
+                        help="词典提示文件 (TSV/JSONL，可为 .gz)，可重复指定，靠前的优先；"
+                             "建成的提示库保存在 --cache-dir 中")
+    parser.add_argument('--require-hints', action='store_true',
+                        help="只使用有提示的单词（不再出现 Definition of <单词> 占位提示）")
+    parser.add_argument('--stats', action='store_true',
+                        help="开启性能剖析，在题库旁输出 <输出文件>.stats.json 报告")
+    parser.add_argument('--dedup-threshold', type=float, default=0.7,
+                        help="单词集合相似度达到该值即视为近似重复并拒绝 (默认 0.7)")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="关闭重复/近似重复谜题检查")
+    parser.add_argument('--range', default=None, metavar='START:END',
+                        help="重新生成指定难度第 START 到 END-1 题并原位替换 (需配合单个 --difficulty)")
+    return parser.parse_args()
+
+def _parse_range(value: str) -> Tuple[int, int]:
+    """解析 START:END 形式的题目区间"""
+    try:
+        start, end = (int(part) for part in value.split(':'))
+    except ValueError:
+        raise ValueError(f"无效的区间: {value}，应为 START:END")
+    if start < 0 or end <= start:
+        raise ValueError(f"无效的区间: {value}")
+    return start, end
+
+def _write_puzzle(generator: ParallelGenerator, writer: PuzzleDBWriter,
+                  difficulty_value: str, puzzle: dict):
+    """写入一题；开启性能剖析时把写入耗时计入序列化阶段"""
+    if generator.profiles is None:
+        writer.write(difficulty_value, puzzle)
+        return
+    started = time.perf_counter()
+    writer.write(difficulty_value, puzzle)
+    generator.profiles[difficulty_value].add_time('serialization', time.perf_counter() - started)
+
+def _remember_existing(generator: ParallelGenerator, filepath: str,
+                       skip: Optional[Callable[[str, int], bool]] = None) -> PuzzleDBReader:
+    """把已有题库中的谜题加入去重索引（skip(难度, 序号) 为真的除外），返回读完的读取器
+    
+    种子格式的题库按种子重新生成谜题后再加入；未开启去重时只统计题数。
+    """
+    reader = PuzzleDBReader(filepath)
+    seeds_db = None
+    indexes: Dict[str, int] = defaultdict(int)
+    for difficulty_value, record in reader:
+        index = indexes[difficulty_value]
+        indexes[difficulty_value] += 1
+        if generator.dedup is None or (skip and skip(difficulty_value, index)):
+            continue
+        if reader.format == 'seeds':
+            if seeds_db is None:
+                seeds_db = SeedPuzzleDB(filepath, generator.main_word_bank(), cache_size=0)
+            record = seeds_db.get(difficulty_value, index)
+        generator.remember(difficulty_value, record)
+    return reader
+
+def _generate_to_file(args: argparse.Namespace, generator: ParallelGenerator,
+                      output_file: str, difficulties: List[Difficulty],
+                      targets: Dict[Difficulty, int]):
+    """生成题库并流式写入文件，定期保存断点以便中断后续跑"""
+    difficulty_values = [d.value for d in Difficulty]
+    if args.shard_size > 0:
+        writer = ShardedPuzzleDBWriter(
+            os.path.join(os.path.dirname(output_file), 'shards'), difficulty_values,
+            shard_size=args.shard_size, compact=args.format == 'compact',
+            base_url=args.shard_url, timestamp=args.seed is None
+        )
+        with writer:
+            for difficulty_value, puzzle, _ in generator.iter_puzzles(difficulties, targets):
+                _write_puzzle(generator, writer, difficulty_value, puzzle)
+            print("\n[4/4] 保存题库...")
+        return
+    
+    writer_class = CompactPuzzleDBWriter if args.format == 'compact' else PuzzleDBWriter
+    # 指定 --seed 时省略生成时间，重复运行得到逐字节相同的文件
+    writer_options = {'timestamp': args.seed is None}
+    if args.format == 'seeds':
+        writer_class = SeedPuzzleDBWriter
+        writer_options['generator_info'] = generator.seed_info()
+    checkpoint_path = Checkpoint.path_for(output_file)
+    previous = None
+    start = {}
+    if args.append and os.path.exists(output_file):
+        previous = Checkpoint.load(checkpoint_path)
+        if previous and args.seed not in (None, previous.master_seed):
+            print(f"  断点种子 {previous.master_seed} 与 --seed 不一致，忽略断点")
+            previous = None
+        if previous and not previous.matches(output_file):
+            print("  题库文件与断点不一致，忽略断点")
+            previous = None
+        
+        if previous:
+            # 从断点继续：截掉断点之后写入的内容，沿用主种子和槽位
+            with open(output_file, 'r+b') as f:
+                f.truncate(previous.offset)
+        
+        # 已有谜题加入去重索引，新生成的题目不会与之重复
+        reader = _remember_existing(generator, output_file)
+        
+        if previous:
+            generator.master_seed = previous.master_seed
+            for difficulty in difficulties:
+                info = previous.difficulties.get(difficulty.value)
+                if info:
+                    start[difficulty] = (info['count'], info['next_slot'])
+                    if args.count is None and 'target' in info:
+                        targets[difficulty] = info['target']
+            print(f"  从断点继续 (种子 {previous.master_seed})")
+        else:
+            # 没有可用断点：从已有题数对应的槽位区块补足到目标题数
+            start = {}
+            for difficulty in difficulties:
+                count = reader.counts.get(difficulty.value, 0)
+                start[difficulty] = (count, count * Checkpoint.APPEND_SLOT_BLOCK)
+            print("  在已有题库上补题: " +
+                  ", ".join(f"{d}={n}" for d, n in reader.counts.items()))
+    elif os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    
+    next_slots = {d: start.get(d, (0, 0))[1] for d in difficulties}
+    
+    def save_checkpoint():
+        checkpoint = Checkpoint(generator.master_seed, writer.position(),
+                                dict(previous.difficulties) if previous else {})
+        for value, count in writer.counts.items():
+            checkpoint.difficulties.setdefault(value, {'next_slot': 0})['count'] = count
+        for difficulty in difficulties:
+            checkpoint.difficulties[difficulty.value].update(
+                next_slot=next_slots[difficulty],
+                target=targets.get(difficulty,
+                                   DIFFICULTY_CONFIG[difficulty]['puzzles_to_generate'])
+            )
+        checkpoint.save(checkpoint_path)
+    
+    with writer_class(output_file, difficulty_values, append=args.append,
+                      **writer_options) as writer:
+        written = 0
+        for difficulty_value, puzzle, slot in generator.iter_puzzles(difficulties, targets, start):
+            if writer_class is SeedPuzzleDBWriter:
+                puzzle = generator.slot_seed(difficulty_value, slot)
+            _write_puzzle(generator, writer, difficulty_value, puzzle)
+            next_slots[Difficulty(difficulty_value)] = slot + 1
+            written += 1
+            if args.checkpoint_every > 0 and written % args.checkpoint_every == 0:
+                save_checkpoint()
+        
+        print("\n[4/4] 保存题库...")
+        # 全部写完后记录一次断点，之后可用 --append --count 继续扩充
+        save_checkpoint()
+
+def _regenerate_range(generator: ParallelGenerator, output_file: str,
+                      difficulty: Difficulty, start: int, end: int, timestamp: bool = True):
+    """重新生成某一难度的一段题目，原位替换后保持其余题目不变"""
+    if not os.path.exists(output_file):
+        print(f"错误: 题库文件不存在 {output_file}")
+        return
+    
+    # 区间外的谜题加入去重索引，替换后的题目不会与其余题目重复
+    reader = _remember_existing(generator, output_file,
+                                lambda value, index: value == difficulty.value and
+                                start <= index < end)
+    # 旧版整体格式按完整格式重写
+    writer_class = CompactPuzzleDBWriter if reader.format == 'compact' else PuzzleDBWriter
+    writer_options = {'timestamp': timestamp}
+    if reader.format == 'seeds':
+        writer_class = SeedPuzzleDBWriter
+        info = generator.seed_info()
+        if info['fingerprint'] != (reader.generator or {}).get('fingerprint'):
+            print("错误: 种子题库的指纹与当前词库或生成选项不一致，无法替换")
+            return
+        writer_options['generator_info'] = info
+    existing = reader.counts.get(difficulty.value, 0)
+    end = min(end, existing)
+    if start >= end:
+        print(f"错误: {difficulty.value} 难度只有 {existing} 题，区间为空")
+        return
+    
+    replacements = [generator.slot_seed(value, slot) if writer_class is SeedPuzzleDBWriter
+                    else puzzle for value, puzzle, slot in
+                    generator.iter_puzzles([difficulty], {difficulty: end - start})]
+    if len(replacements) < end - start:
+        print(f"警告: 只生成了 {len(replacements)}/{end - start} 题，其余题目保持不变")
+    
+    temp_path = output_file + '.tmp'
+    index = 0
+    with writer_class(temp_path, [d.value for d in Difficulty], **writer_options) as writer:
+        for difficulty_value, puzzle in PuzzleDBReader(output_file):
+            if difficulty_value == difficulty.value:
+                if start <= index < start + len(replacements):
+                    puzzle = replacements[index - start]
+                index += 1
+            writer.write(difficulty_value, puzzle)
+    os.replace(temp_path, output_file)
+    
+    # 文件内容已变化，旧断点的偏移量不再有效
+    checkpoint_path = Checkpoint.path_for(output_file)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    print(f"  已替换 {difficulty.value} 难度第 {start} 到 {start + len(replacements) - 1} 题")
+
 def main():
     """主函数"""
+    args = parse_args()
+    
     print("=" * 50)
     print("填字游戏题库生成器")
     print("=" * 50)
@@ -617,58 +4036,137 @@ def main():
     # 配置文件路径
     words_file = "words.txt"
     html_file = "../aa-秒开版.html"
-    output_file = "../data/puzzle_db_aa.js"
+    output_file = args.output
     
-    # 加载词库
-    print("\n[1/4] 加载词库...")
-    words = FileIO.load_words(words_file)
-    if not words:
-        print("错误: 无法加载词库")
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    master_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    difficulties = [Difficulty(v) for v in args.difficulty] if args.difficulty else list(Difficulty)
+    targets = {d: args.count for d in difficulties} if args.count is not None else {}
+    
+    regenerate = None
+    if args.range:
+        if len(difficulties) != 1:
+            print("错误: --range 需要且只能指定一个 --difficulty")
+            return
+        try:
+            regenerate = _parse_range(args.range)
+        except ValueError as e:
+            print(f"错误: {e}")
+            return
+    if args.format == 'seeds' and args.shard_size > 0:
+        print("错误: 种子格式不支持分片输出")
+        return
+    if args.append and args.shard_size > 0:
+        print("错误: 分片输出暂不支持 --append 续写")
         return
     
-    # 提取提示
-    print("\n[2/4] 提取单词提示...")
-    hints = HintExtractor.extract_from_html(html_file)
+    hint_store = None
+    if args.hints_dict:
+        # 词典提示库只需在词典变化时构建一次，各进程映射同一个文件
+        try:
+            hint_store = HintStore.ensure(args.hints_dict, args.cache_dir)
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法建立词典提示库: {e}")
+            return
     
-    # 创建词库和生成器
-    word_bank = WordBank(words, hints)
-    generator = PuzzleGenerator(word_bank)
+    words, hints, word_bank_cache = None, None, None
+    if args.no_cache:
+        # 加载词库
+        print("\n[1/4] 加载词库...")
+        words = FileIO.load_words(words_file)
+        if not words:
+            print("错误: 无法加载词库")
+            return
+        
+        # 提取提示
+        print("\n[2/4] 提取单词提示...")
+        hints = HintExtractor.extract_from_html(html_file)
+        if args.require_hints:
+            words = words_with_hints(words, hints, HintStore(hint_store) if hint_store else None)
+            if not words:
+                print("错误: 没有任何单词有提示")
+                return
+    else:
+        # 输入未变化时直接使用缓存的词库索引
+        print("\n[1/4] 加载词库...")
+        try:
+            word_bank_cache = WordBankCache(args.cache_dir).ensure(words_file, html_file,
+                                                                   hint_store, args.require_hints)
+        except OSError as e:
+            print(f"错误: 无法写入词库缓存: {e}")
+            return
+        if not word_bank_cache:
+            print("错误: 无法加载词库" + ("（没有任何单词有提示）" if args.require_hints else ""))
+            return
+        print("\n[2/4] 提取单词提示... (已包含在缓存中)")
     
-    # 生成各难度题库
-    print("\n[3/4] 生成谜题...")
-    all_puzzles = {}
+    # 没有提示的单词会得到占位提示，明确告知数量
+    word_bank = load_word_bank(words, hints, word_bank_cache, args.compact_bank, hint_store)
+    missing = sum(1 for word in word_bank.words if not word_bank.has_hint(word))
+    if missing:
+        print(f"  警告: {len(word_bank.words)} 个单词中有 {missing} 个没有提示，"
+              f"放入谜题时使用占位提示 \"Definition of <单词>\"")
+        print("  (--hints-dict 添加词典提示，--require-hints 只使用有提示的单词)")
     
-    for difficulty in Difficulty:
-        config = DIFFICULTY_CONFIG[difficulty]
-        target_count = config['puzzles_to_generate']
-        
-        print(f"\n  生成 {difficulty.value} 难度 ({target_count} 题)...")
-        
-        puzzles = []
-        attempts = 0
-        max_attempts = target_count * 3
-        
-        while len(puzzles) < target_count and attempts < max_attempts:
-            attempts += 1
-            puzzle = generator.generate(difficulty)
-            
-            if puzzle:
-                puzzles.append(puzzle.to_dict())
-                
-                # 进度显示
-                if len(puzzles) % 100 == 0:
-                    print(f"    已生成 {len(puzzles)}/{target_count}")
-        
-        all_puzzles[difficulty.value] = puzzles
-        print(f"    完成: {len(puzzles)} 题")
+    # 生成各难度题库，边生成边写入
+    print(f"\n[3/4] 生成谜题 (种子 {master_seed}, {workers} 个进程)...")
+    generator_options = {'compact_grid': args.compact_grid, 'backtrack': args.backtrack}
+    if args.backtrack or args.beam > 0:
+        generator_options['max_backtracks'] = args.max_backtracks
+    if args.stats:
+        generator_options['profile'] = True
+    if args.batch:
+        if np is None:
+            print("警告: 未安装 NumPy，批量模式不可用，改为逐个检查")
+        elif args.stats:
+            print("警告: 性能剖析需要逐个检查候选，已关闭批量模式")
+        else:
+            generator_options['batch'] = True
+    if args.pattern_scan:
+        if args.stats:
+            print("警告: 性能剖析需要逐个检查候选，已关闭模式扫描")
+        else:
+            generator_options['pattern_scan'] = True
+    if args.beam > 0:
+        generator_options.update(beam_width=args.beam, beam_branch=args.beam_branch)
+    if args.template_fill or args.templates:
+        generator_options['template_fill'] = True
+        if args.templates:
+            try:
+                templates = GridTemplate.load(args.templates)
+            except (OSError, ValueError) as e:
+                print(f"错误: 无法加载模板: {e}")
+                return
+            generator_options['templates'] = [t.cells for t in templates]
+    generator = ParallelGenerator(words, hints, workers=workers, master_seed=master_seed,
+                                  generator_options=generator_options,
+                                  dedup_threshold=None if args.no_dedup else args.dedup_threshold,
+                                  word_bank_cache=word_bank_cache,
+                                  compact_bank=args.compact_bank,
+                                  time_budget=args.budget, hint_store=hint_store)
+    try:
+        if regenerate:
+            _regenerate_range(generator, output_file, difficulties[0], *regenerate,
+                              timestamp=args.seed is None)
+            print("\n[4/4] 保存题库...")
+        else:
+            _generate_to_file(args, generator, output_file, difficulties, targets)
+    except ValueError as e:
+        print(f"错误: {e}")
+        return
     
-    # 保存题库
-    print("\n[4/4] 保存题库...")
-    FileIO.save_puzzle_db(all_puzzles, output_file)
+    if args.stats:
+        generator.save_stats(output_file + '.stats.json', {'output': output_file})
+    if generator.shortfalls:
+        # 未达到目标时以非零状态退出，便于定时任务发现
+        print("\n" + "=" * 50)
+        print("生成结束，但部分难度未达到目标题数")
+        print("=" * 50)
+        return 1
     
     print("\n" + "=" * 50)
     print("生成完成!")
     print("=" * 50)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
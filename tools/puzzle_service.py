@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地填字游戏谜题服务
+后台工作进程持续生成谜题，放入各难度的环形缓冲区；
+GET /puzzle?difficulty=hard 直接从缓冲区取出一题（格式与 Puzzle.to_dict 相同），
+GET /metrics 返回缓冲区深度、补充速率等指标
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_db_aa import (
+    Difficulty, FileIO, GridTemplate, HintExtractor, HintStore, PuzzleGenerator, WordBankCache,
+    derive_seed, generate_slot, init_worker, words_with_hints
+)
+
+# ==================== 缓冲池 ====================
+
+class ServiceBusy(Exception):
+    """缓冲区已空且等待的请求过多或等待超时"""
+
+class PuzzlePool:
+    """单个难度的谜题环形缓冲区
+    
+    补充任务始终保持“缓冲区 + 生成中”不超过容量，缓冲区满时暂停，
+    有谜题被取走后继续；各难度共享工作进程名额，生成中的槽位总数不超过工作进程数。
+    缓冲区为空时请求排队等待下一道生成完成的谜题，
+    排队数达到上限或等待超时即拒绝（背压）。
+    每道谜题由派生自服务主种子的槽位种子生成，可按种子复现。
+    """
+    
+    # 补充速率的统计窗口（秒）
+    RATE_WINDOW = 60.0
+    
+    def __init__(self, difficulty: Difficulty, capacity: int, master_seed: int,
+                 max_waiters: int, max_attempts: int = PuzzleGenerator.DEFAULT_MAX_ATTEMPTS):
+        self.difficulty = difficulty
+        self.capacity = capacity
+        self.master_seed = master_seed
+        self.max_waiters = max_waiters
+        self.max_attempts = max_attempts
+        # (谜题, 槽位种子)
+        self.buffer: Deque[Tuple[dict, int]] = deque()
+        self.waiters: Deque[asyncio.Future] = deque()
+        self.inflight = 0
+        self.next_slot = 0
+        self._space = asyncio.Event()
+        self._produced: Deque[float] = deque()
+        self.started = time.monotonic()
+        self.metrics = {
+            'served': 0, 'buffer_hits': 0, 'waited': 0, 'rejected': 0,
+            'generated': 0, 'failed_slots': 0, 'worker_errors': 0, 'generate_seconds': 0.0,
+        }
+    
+    def _deliver(self, item: Tuple[dict, int]):
+        """交给最早排队的请求，没有排队时放入缓冲区"""
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(item)
+                return
+        self.buffer.append(item)
+    
+    async def get(self, timeout: float) -> Tuple[dict, int]:
+        """取出一道谜题；缓冲区为空时等待至多 timeout 秒"""
+        self.metrics['served'] += 1
+        if self.buffer:
+            self.metrics['buffer_hits'] += 1
+            item = self.buffer.popleft()
+            self._space.set()
+            return item
+        
+        if len(self.waiters) >= self.max_waiters:
+            self.metrics['served'] -= 1
+            self.metrics['rejected'] += 1
+            raise ServiceBusy(f"{self.difficulty.value} 缓冲区已空，等待的请求已达上限")
+        self.metrics['waited'] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self._space.set()
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            self.metrics['served'] -= 1
+            self.metrics['rejected'] += 1
+            raise ServiceBusy(f"{self.difficulty.value} 等待生成超时")
+        finally:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+    
+    def _wants_more(self, pending: int) -> bool:
+        """缓冲区、生成中的槽位与排队请求相比是否还需要补充"""
+        return len(self.buffer) + pending < self.capacity + len(self.waiters)
+    
+    async def refill(self, executor: ProcessPoolExecutor, slots: asyncio.Semaphore):
+        """后台补充任务：每个生成中的槽位占用 slots 的一个名额（各难度共享同一个 slots）"""
+        loop = asyncio.get_running_loop()
+        # 生成中的槽位 -> (槽位种子, 开始时间)
+        pending: Dict[asyncio.Future, Tuple[int, float]] = {}
+        # 正在申请的名额；一次只申请一个，申请到后若已不需要补充则归还
+        acquire: Optional[asyncio.Future] = None
+        try:
+            while True:
+                self._space.clear()
+                if acquire is None and self._wants_more(len(pending)):
+                    acquire = asyncio.ensure_future(slots.acquire())
+                self.inflight = len(pending)
+                
+                # 等待申请到名额、任一槽位完成，或有谜题被取走/有请求开始排队
+                space = asyncio.ensure_future(self._space.wait())
+                waits = [space, *pending] + ([acquire] if acquire is not None else [])
+                done, _ = await asyncio.wait(waits, return_when=asyncio.FIRST_COMPLETED)
+                space.cancel()
+                if acquire is not None and acquire.done():
+                    acquire = None
+                    if self._wants_more(len(pending)):
+                        seed = derive_seed(self.master_seed, self.difficulty, self.next_slot)
+                        self.next_slot += 1
+                        task = (self.difficulty.value, seed, self.max_attempts)
+                        future = loop.run_in_executor(executor, generate_slot, task)
+                        pending[future] = (seed, time.perf_counter())
+                    else:
+                        slots.release()
+                for future in done:
+                    if future not in pending:
+                        continue
+                    seed, started = pending.pop(future)
+                    slots.release()
+                    try:
+                        puzzle, _, _ = future.result()
+                    except Exception as e:
+                        # 工作进程出错只丢弃这个槽位，补充任务继续
+                        self.metrics['worker_errors'] += 1
+                        print(f"警告: {self.difficulty.value} 槽位 (种子 {seed}) 生成出错: {e!r}")
+                        continue
+                    self.metrics['generate_seconds'] += time.perf_counter() - started
+                    if puzzle is None:
+                        self.metrics['failed_slots'] += 1
+                        continue
+                    self.metrics['generated'] += 1
+                    self._produced.append(time.monotonic())
+                    self._deliver((puzzle, seed))
+                self.inflight = len(pending)
+        finally:
+            # 已申请到但还没用上的名额要归还，否则其他难度永远少一个名额
+            if acquire is not None:
+                if acquire.done() and not acquire.cancelled():
+                    slots.release()
+                else:
+                    acquire.cancel()
+    
+    def refill_rate(self) -> float:
+        """最近 RATE_WINDOW 秒内每秒补充的谜题数"""
+        now = time.monotonic()
+        while self._produced and self._produced[0] < now - self.RATE_WINDOW:
+            self._produced.popleft()
+        return len(self._produced) / max(min(self.RATE_WINDOW, now - self.started), 1e-9)
+    
+    def snapshot(self) -> dict:
+        """当前指标"""
+        metrics = self.metrics
+        finished = metrics['generated'] + metrics['failed_slots']
+        return {
+            'depth': len(self.buffer),
+            'capacity': self.capacity,
+            'inflight': self.inflight,
+            'waiting': len(self.waiters),
+            'served': metrics['served'],
+            'buffer_hits': metrics['buffer_hits'],
+            'waited': metrics['waited'],
+            'rejected': metrics['rejected'],
+            'generated': metrics['generated'],
+            'failed_slots': metrics['failed_slots'],
+            'worker_errors': metrics['worker_errors'],
+            'refill_per_sec': round(self.refill_rate(), 3),
+            'avg_generate_ms': round(metrics['generate_seconds'] / finished * 1000, 2)
+            if finished else None,
+        }
+
+# ==================== HTTP 服务 ====================
+
+class PuzzleService:
+    """基于 asyncio 的最小 HTTP/1.1 服务（支持 keep-alive，仅 GET）"""
+    
+    IDLE_TIMEOUT = 30.0
+    REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found',
+               405: 'Method Not Allowed', 503: 'Service Unavailable'}
+    
+    def __init__(self, pools: Dict[str, PuzzlePool], wait_timeout: float, info: dict):
+        self.pools = pools
+        self.wait_timeout = wait_timeout
+        self.info = info
+        self.started = time.monotonic()
+        self.requests = 0
+    
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """处理一个连接上的所有请求"""
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.IDLE_TIMEOUT)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line.strip():
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if not line.strip():
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                
+                parts = request_line.decode('latin-1').split()
+                if len(parts) != 3:
+                    break
+                method, target, version = parts
+                keep_alive = (version == 'HTTP/1.1' and
+                              headers.get('connection', '').lower() != 'close')
+                status, body, extra = await self.route(method, target)
+                self._respond(writer, status, body, extra, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+    
+    async def route(self, method: str, target: str) -> Tuple[int, dict, Dict[str, str]]:
+        """分发请求，返回 (状态码, JSON 内容, 额外响应头)"""
+        self.requests += 1
+        if method != 'GET':
+            return 405, {'error': "只支持 GET"}, {'Allow': 'GET'}
+        url = urlsplit(target)
+        if url.path == '/puzzle':
+            query = parse_qs(url.query)
+            difficulty = query.get('difficulty', [Difficulty.MEDIUM.value])[0]
+            pool = self.pools.get(difficulty)
+            if pool is None:
+                return 400, {'error': f"未知或未启用的难度: {difficulty}",
+                             'difficulties': list(self.pools)}, {}
+            try:
+                puzzle, seed = await pool.get(self.wait_timeout)
+            except ServiceBusy as e:
+                return 503, {'error': str(e)}, {'Retry-After': '1'}
+            return 200, puzzle, {'X-Puzzle-Seed': str(seed)}
+        if url.path == '/metrics':
+            return 200, self.metrics(), {}
+        if url.path == '/healthz':
+            return 200, {'status': 'ok'}, {}
+        return 404, {'error': f"未知路径: {url.path}"}, {}
+    
+    def metrics(self) -> dict:
+        """服务与各难度缓冲池的指标"""
+        return {
+            'uptime_sec': round(time.monotonic() - self.started, 1),
+            'requests': self.requests,
+            **self.info,
+            'pools': {name: pool.snapshot() for name, pool in self.pools.items()},
+        }
+    
+    def _respond(self, writer: asyncio.StreamWriter, status: int, body: dict,
+                 extra: Dict[str, str], keep_alive: bool):
+        """写出 JSON 响应"""
+        payload = json.dumps(body, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        headers = {
+            'Content-Type': 'application/json; charset=utf-8',
+            'Content-Length': str(len(payload)),
+            'Cache-Control': 'no-store',
+            'Access-Control-Allow-Origin': '*',
+            'Connection': 'keep-alive' if keep_alive else 'close',
+            **extra,
+        }
+        head = f"HTTP/1.1 {status} {self.REASONS[status]}\r\n" + \
+               ''.join(f"{name}: {value}\r\n" for name, value in headers.items()) + "\r\n"
+        writer.write(head.encode('latin-1') + payload)
+
+# ==================== 主程序 ====================
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="本地填字游戏谜题服务")
+    parser.add_argument('--host', default="127.0.0.1",
+                        help="监听地址 (默认 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765,
+                        help="监听端口 (默认 8765)")
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help="生成进程数 (默认 0 = CPU 核心数)")
+    parser.add_argument('--difficulty', action='append',
+                        choices=[d.value for d in Difficulty],
+                        help="只提供指定难度，可重复指定 (默认全部难度)")
+    parser.add_argument('--buffer', type=int, default=32,
+                        help="每个难度缓冲的谜题数 (默认 32)")
+    parser.add_argument('--max-waiters', type=int, default=64,
+                        help="缓冲区为空时每个难度最多排队的请求数，超出返回 503 (默认 64)")
+    parser.add_argument('--wait-timeout', type=float, default=10.0,
+                        help="缓冲区为空时请求最长等待秒数，超时返回 503 (默认 10)")
+    parser.add_argument('--seed', type=int, default=None,
+                        help="主随机种子 (默认随机)")
+    parser.add_argument('--compact-grid', action='store_true',
+                        help="使用位掩码紧凑网格 (CompactGrid)")
+    parser.add_argument('--backtrack', action='store_true',
+                        help="遇到死局时回溯")
+    parser.add_argument('--max-backtracks', type=int,
+                        default=PuzzleGenerator.DEFAULT_MAX_BACKTRACKS,
+                        help=f"回溯模式下每次尝试最多回溯的次数，束搜索中为切换分支的次数 "
+                             f"(默认 {PuzzleGenerator.DEFAULT_MAX_BACKTRACKS})")
+    parser.add_argument('--pattern-scan', action='store_true',
+                        help="按槽位查询词库模式索引来扫描候选")
+    parser.add_argument('--template-fill', action='store_true',
+                        help="使用模板填充引擎生成密集的填字游戏")
+    parser.add_argument('--templates', default=None, metavar='FILE',
+                        help="模板文件（隐含 --template-fill）")
+    parser.add_argument('--beam', type=int, default=0, metavar='WIDTH',
+                        help="束搜索：每层保留排名最高的 WIDTH 个分支，0 为贪心 (默认 0)")
+    parser.add_argument('--beam-branch', type=int, default=5, metavar='K',
+                        help="束搜索中每个状态展开的候选数 (默认 5)")
+    parser.add_argument('--compact-bank', action='store_true',
+                        help="使用内存紧凑的词库 (CompactWordBank)")
+    parser.add_argument('--cache-dir', default=".cache",
+                        help="词库索引缓存目录 (默认 .cache)")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="不使用词库索引缓存")
+    parser.add_argument('--hints-dict', action='append', default=[], metavar='FILE',
+                        help="词典提示文件 (TSV/JSONL，可为 .gz)，可重复指定，靠前的优先")
+    parser.add_argument('--require-hints', action='store_true',
+                        help="只使用有提示的单词")
+    return parser.parse_args()
+
+async def serve(args: argparse.Namespace, initargs: tuple, workers: int, master_seed: int,
+                difficulties: List[Difficulty]):
+    """启动工作进程、补充任务和 HTTP 服务"""
+    pools = {d.value: PuzzlePool(d, args.buffer, master_seed, args.max_waiters)
+             for d in difficulties}
+    info = {'seed': master_seed, 'workers': workers}
+    service = PuzzleService(pools, args.wait_timeout, info)
+    
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=initargs) as executor:
+        # 各难度共享工作进程名额，生成中的槽位总数不超过 workers
+        slots = asyncio.Semaphore(workers)
+        refills = [asyncio.create_task(pool.refill(executor, slots)) for pool in pools.values()]
+        server = await asyncio.start_server(service.handle, args.host, args.port)
+        print(f"服务已启动: http://{args.host}:{args.port}/puzzle?difficulty=medium "
+              f"(种子 {master_seed}, {workers} 个进程)")
+        print(f"指标: http://{args.host}:{args.port}/metrics")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in refills:
+                task.cancel()
+            executor.shutdown(wait=False, cancel_futures=True)
+
+def main() -> int:
+    """主函数"""
+    args = parse_args()
+    if args.buffer < 1 or args.max_waiters < 0:
+        print("错误: --buffer 至少为 1，--max-waiters 不能为负数")
+        return 1
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    words_file = os.path.join(base_dir, "words.txt")
+    html_file = os.path.join(base_dir, "..", "aa-秒开版.html")
+    
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    master_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+    difficulties = [Difficulty(v) for v in args.difficulty] if args.difficulty else list(Difficulty)
+    
+    generator_options = {'compact_grid': args.compact_grid, 'backtrack': args.backtrack,
+                         'pattern_scan': args.pattern_scan}
+    if args.backtrack or args.beam > 0:
+        generator_options['max_backtracks'] = args.max_backtracks
+    if args.beam > 0:
+        generator_options.update(beam_width=args.beam, beam_branch=args.beam_branch)
+    if args.template_fill or args.templates:
+        generator_options['template_fill'] = True
+        if args.templates:
+            try:
+                generator_options['templates'] = [t.cells for t in GridTemplate.load(args.templates)]
+            except (OSError, ValueError) as e:
+                print(f"错误: 无法加载模板: {e}")
+                return 1
+    
+    cache_dir = os.path.join(base_dir, args.cache_dir)
+    hint_store = None
+    if args.hints_dict:
+        try:
+            hint_store = HintStore.ensure(args.hints_dict, cache_dir)
+        except (OSError, ValueError) as e:
+            print(f"错误: 无法建立词典提示库: {e}")
+            return 1
+    
+    words, hints, word_bank_cache = None, None, None
+    if args.no_cache:
+        words = FileIO.load_words(words_file)
+        hints = HintExtractor.extract_from_html(html_file)
+        if args.require_hints:
+            words = words_with_hints(words, hints, HintStore(hint_store) if hint_store else None)
+    else:
+        try:
+            word_bank_cache = WordBankCache(cache_dir).ensure(
+                words_file, html_file, hint_store, args.require_hints)
+        except OSError as e:
+            print(f"错误: 无法写入词库缓存: {e}")
+            return 1
+    if not words and not word_bank_cache:
+        print("错误: 无法加载词库")
+        return 1
+    
+    initargs = (words, hints, generator_options, word_bank_cache, args.compact_bank, hint_store)
+    try:
+        asyncio.run(serve(args, initargs, workers, master_seed, difficulties))
+    except KeyboardInterrupt:
+        print("\n服务已停止")
+    except OSError as e:
+        print(f"错误: 无法启动服务: {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共配置：把 tools 目录加入模块搜索路径，提供自带词库
+"""
+
+import os
+import sys
+
+import pytest
+
+TOOLS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, TOOLS_DIR)
+
+from generate_db_aa import FileIO
+
+@pytest.fixture(scope='session')
+def words():
+    """自带词库 words.txt 的单词"""
+    return FileIO.load_words(os.path.join(TOOLS_DIR, 'words.txt'))
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+时间预算调度测试：调整周期、尝试次数上限、按比例分配槽位，以及输出与每轮划分无关
+"""
+
+import pytest
+
+import generate_db_aa
+from generate_db_aa import AttemptStats, Difficulty, ParallelGenerator, PuzzleGenerator
+
+def test_epoch_end():
+    """调整周期从 BATCH_MIN 起倍增，到 BATCH_MAX 后等长"""
+    generator = ParallelGenerator([], {})
+    ends = sorted({generator._epoch_end(slot) for slot in range(5000)})
+    assert ends == [16, 32, 64, 128, 256, 512, 1024, 2048, 3072, 4096, 5120]
+    assert generator._epoch_end(15) == 16 and generator._epoch_end(16) == 32
+
+@pytest.mark.parametrize('attempts, failures, expected', [
+    (0, 0, PuzzleGenerator.DEFAULT_MAX_ATTEMPTS),
+    (10, 0, ParallelGenerator.MIN_ATTEMPTS),
+    (10, 10, ParallelGenerator.MAX_ATTEMPTS),
+    # 单次成功率 10%：ceil(log 0.01 / log 0.9) = 44
+    (100, 90, 44),
+    # 单次成功率 50% 只需 7 次，不低于 MIN_ATTEMPTS
+    (100, 50, ParallelGenerator.MIN_ATTEMPTS),
+])
+def test_attempt_budget(attempts, failures, expected):
+    """尝试次数上限使单题成功概率约 99%，限制在 [MIN_ATTEMPTS, MAX_ATTEMPTS] 内"""
+    stats = AttemptStats(attempts=attempts, failures=failures)
+    assert ParallelGenerator([], {})._attempt_budget(stats) == expected
+
+def slot_state(target: int, slots: int, produced: int, seconds: float) -> dict:
+    """_plan_round 用到的难度状态"""
+    return {'target': target, 'count': produced, 'slots': slots, 'produced': produced,
+            'stats': AttemptStats(time=seconds)}
+
+def test_plan_round_proportional():
+    """按各难度剩余工作量等比例推进；超出预算时给出预计所需时间"""
+    generator = ParallelGenerator([], {}, workers=2)
+    state = {
+        Difficulty.EASY: slot_state(100, 10, 10, 1.0),    # 每槽位 0.1 秒，全部成功
+        Difficulty.HARD: slot_state(100, 10, 5, 2.0),     # 每槽位 0.2 秒，一半成功
+        Difficulty.MEDIUM: slot_state(100, 0, 0, 0.0),    # 还没有数据
+    }
+    plan, projected = generator._plan_round(state, list(state), 100.0)
+    # 剩余工作量 90×0.1 + 190×0.2 = 47 进程·秒，本轮容量 5 秒 × 2 进程
+    assert plan == {Difficulty.EASY: 20, Difficulty.HARD: 41,
+                    Difficulty.MEDIUM: ParallelGenerator.BATCH_MIN}
+    assert projected is None
+    
+    _, projected = generator._plan_round(state, list(state), 20.0)
+    assert projected == pytest.approx(23.5)
+
+def run_budget(words, monkeypatch, round_seconds: float):
+    """按预算生成 easy/medium 各 24 题，返回各难度的 (槽位, 谜题)、各种子的尝试次数上限与轮数"""
+    tasks = {}
+    generate_slot = generate_db_aa.generate_slot
+    
+    def recording_slot(task):
+        tasks[task[1]] = task[2]
+        return generate_slot(task)
+    
+    monkeypatch.setattr(generate_db_aa, 'generate_slot', recording_slot)
+    generator = ParallelGenerator(words, {}, master_seed=2, time_budget=600)
+    generator.ROUND_SECONDS = round_seconds
+    rounds = []
+    plan_round = generator._plan_round
+    monkeypatch.setattr(generator, '_plan_round',
+                        lambda *args: rounds.append(1) or plan_round(*args))
+    difficulties = [Difficulty.EASY, Difficulty.MEDIUM]
+    puzzles = {d.value: [] for d in difficulties}
+    for difficulty_value, puzzle, slot in generator.iter_puzzles(difficulties,
+                                                                 {d: 24 for d in difficulties}):
+        puzzles[difficulty_value].append((slot, puzzle))
+    assert not generator.shortfalls
+    return puzzles, tasks, len(rounds)
+
+def test_budget_output_independent_of_rounds(words, monkeypatch):
+    """每轮划分的槽位数随耗时变化，但各槽位的结果与尝试次数上限不变"""
+    puzzles, tasks, rounds = run_budget(words, monkeypatch, ParallelGenerator.ROUND_SECONDS)
+    small_puzzles, small_tasks, small_rounds = run_budget(words, monkeypatch, 0.001)
+    # 各难度在同一轮中交替产出，只比较每个难度自己的顺序
+    assert small_rounds > rounds
+    assert small_puzzles == puzzles
+    
+    shared = tasks.keys() & small_tasks.keys()
+    assert {seed: tasks[seed] for seed in shared} == {seed: small_tasks[seed] for seed in shared}
+    # 越过第一个调整周期后尝试次数上限已按实测成功率调整
+    assert set(tasks.values()) - {PuzzleGenerator.DEFAULT_MAX_ATTEMPTS}
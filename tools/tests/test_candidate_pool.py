@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+候选池测试：重复单词、堆压缩与撤销
+"""
+
+import pytest
+
+from generate_db_aa import CandidatePool, Difficulty, WordBank, create_generator, derive_seed
+
+def check_pool(pool: CandidatePool):
+    """live 与各锚点计数一致，且等于堆中当前扫描的候选数"""
+    current = sum(1 for entry in pool.heap if pool.scan_ids[entry[2]] == entry[1])
+    assert pool.live == sum(pool.scan_sizes.values()) == current
+
+def generate(generator, difficulty: Difficulty, count: int) -> list:
+    """生成 count 题，每题后检查候选池计数"""
+    puzzles = []
+    for i in range(count):
+        puzzle = generator.generate(difficulty, derive_seed(9, difficulty, i))
+        check_pool(generator._get_context(difficulty).pool)
+        puzzles.append(puzzle.to_dict())
+    return puzzles
+
+@pytest.mark.parametrize('options', [{}, {'backtrack': True}, {'beam_width': 3}],
+                         ids=['greedy', 'backtrack', 'beam'])
+def test_duplicate_words_used_once(words, options):
+    """词库中重复出现的单词在一道谜题中只放置一次，计数不因重复项失衡"""
+    generator = create_generator(WordBank(words + words[::2], {}), options)
+    for puzzle in generate(generator, Difficulty.MEDIUM, 4):
+        placed = [w['w'] for w in puzzle['words']]
+        assert len(placed) == len(set(placed))
+
+def test_compaction_keeps_output(words, monkeypatch):
+    """每次扫描后都压缩堆时，生成结果与不压缩时相同"""
+    bank_words = words + words[::2]
+    expected = generate(create_generator(WordBank(bank_words, {})), Difficulty.HARD, 3)
+    monkeypatch.setattr(CandidatePool, 'COMPACT_MIN', 0)
+    monkeypatch.setattr(CandidatePool, 'COMPACT_RATIO', 0)
+    assert generate(create_generator(WordBank(bank_words, {})), Difficulty.HARD, 3) == expected
+
+def test_undo_restores_candidates(words):
+    """撤销放置后候选池恢复到放置前：相同的最佳候选与开放锚点"""
+    generator = create_generator(WordBank(words, {}))
+    ctx = generator._get_context(Difficulty.HARD)
+    generator.rng.seed(4)
+    generator._start_attempt(ctx)
+    ctx.place(*ctx.pool.top(1)[0])
+    before = (ctx.pool.top(20), set(ctx.pool.open_anchors), ctx.pool.placed_count)
+    
+    for _ in range(3):
+        ctx.place(*ctx.pool.top(1)[0])
+    for _ in range(3):
+        ctx.undo()
+    check_pool(ctx.pool)
+    assert (ctx.pool.top(20), set(ctx.pool.open_anchors), ctx.pool.placed_count) == before
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+去重索引测试：完全重复（平移、转置）、近似重复与相似度阈值、拒绝计数、生成时跳过已有题目
+"""
+
+import pytest
+
+from generate_db_aa import Difficulty, ParallelGenerator, PuzzleDedupIndex
+
+WORDS = ['APPLE', 'BREAD', 'CHAIR', 'DANCE', 'EAGLE', 'FLAME', 'GRAPE', 'HOUSE', 'IVORY', 'JELLY']
+
+def puzzle(words, row: int = 0, col: int = 0, direction: str = 'H') -> dict:
+    """把单词逐行（或逐列）排开的谜题，起点为 (row, col)"""
+    placed = []
+    for i, w in enumerate(words):
+        r, c = (row + 2 * i, col) if direction == 'H' else (row, col + 2 * i)
+        placed.append({'w': w, 'r': r, 'c': c, 'd': direction})
+    return {'words': placed}
+
+@pytest.mark.parametrize('copy', [
+    puzzle(WORDS),
+    puzzle(WORDS, row=3, col=5),
+    puzzle(WORDS, direction='V'),
+    puzzle(WORDS, row=1, col=2, direction='V'),
+], ids=['same', 'shifted', 'transposed', 'shifted_transposed'])
+def test_layout_duplicate(copy):
+    """平移或转置后的相同布局判为完全重复"""
+    index = PuzzleDedupIndex()
+    assert index.add(puzzle(WORDS))
+    assert index.check(copy) == 'duplicate'
+    assert not index.add(copy)
+    assert index.rejected == {'duplicate': 1, 'similar': 0} and len(index) == 1
+
+def test_near_duplicate_rejected():
+    """布局不同但单词集合高度重合的谜题判为近似重复"""
+    index = PuzzleDedupIndex(0.7)
+    assert index.add(puzzle(WORDS))
+    # 换掉一个单词并打乱顺序：Jaccard = 9/11
+    similar = puzzle(['KNIFE'] + WORDS[:0:-1])
+    assert index.check(similar) == 'similar'
+    assert not index.add(similar)
+    assert index.rejected == {'duplicate': 0, 'similar': 1}
+
+def test_different_words_accepted():
+    """单词集合重合较少的谜题都被收录"""
+    index = PuzzleDedupIndex(0.7)
+    assert index.add(puzzle(WORDS))
+    # 换掉一半单词：Jaccard = 5/15
+    other = puzzle(WORDS[:5] + ['KNIFE', 'LEMON', 'MANGO', 'NIGHT', 'OCEAN'])
+    assert index.check(other) is None
+    assert index.add(other)
+    assert len(index) == 2 and index.rejected == {'duplicate': 0, 'similar': 0}
+
+@pytest.mark.parametrize('threshold, rejected', [(0.6, True), (0.8, True), (0.9, False)])
+def test_threshold(threshold, rejected):
+    """Jaccard 相似度达到阈值才拒绝（换掉一个单词时为 9/11 ≈ 0.82）"""
+    index = PuzzleDedupIndex(threshold)
+    index.add(puzzle(WORDS))
+    similar = puzzle(WORDS[:9] + ['KNIFE'], direction='V')
+    assert (index.check(similar) == 'similar') == rejected
+
+def test_check_does_not_add():
+    """check 只查询，不收录也不计数"""
+    index = PuzzleDedupIndex()
+    assert index.check(puzzle(WORDS)) is None
+    assert index.check(puzzle(WORDS)) is None
+    assert len(index) == 0 and index.rejected == {'duplicate': 0, 'similar': 0}
+
+def test_generator_skips_known_puzzles(words):
+    """并行生成时已收录的谜题（如续写前的题库）在主进程中被去重跳过"""
+    first = ParallelGenerator(words, {}, master_seed=4)
+    known = [p for _, p, _ in first.iter_puzzles([Difficulty.EASY], {Difficulty.EASY: 3})]
+    
+    # 相同主种子重新生成：前面的槽位与已有题目完全相同，全部被拒绝
+    again = ParallelGenerator(words, {}, master_seed=4)
+    for p in known:
+        again.remember('easy', p)
+    results = list(again.iter_puzzles([Difficulty.EASY], {Difficulty.EASY: 3}))
+    assert len(results) == 3 and not again.shortfalls
+    assert all(p not in known for _, p, _ in results)
+    assert min(slot for _, _, slot in results) >= 3
+    assert again.dedup['easy'].rejected['duplicate'] >= 3
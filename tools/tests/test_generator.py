@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+生成器测试：按种子复现、各扫描后端输出一致、放置检查、束搜索、多进程与单进程输出一致
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from conftest import TOOLS_DIR
+import generate_db_aa
+from generate_db_aa import (
+    CompactGrid, Difficulty, Grid, Position, WordBank, create_generator, derive_seed
+)
+from validate_db import validate_puzzle
+
+# ==================== 按种子复现 ====================
+
+def generate_all(generator, count: int, master_seed: int = 3) -> list:
+    """按派生种子为每个难度生成 count 题，返回谜题字典列表"""
+    return [generator.generate(d, derive_seed(master_seed, d, i)).to_dict()
+            for d in Difficulty for i in range(count)]
+
+def test_same_seed_same_puzzle(words):
+    """相同种子在不同生成器实例上得到相同的谜题"""
+    first = create_generator(WordBank(words, {}))
+    second = create_generator(WordBank(words, {}))
+    assert generate_all(first, 2) == generate_all(second, 2)
+
+def test_seed_does_not_disturb_generator_rng(words):
+    """给出 seed 的调用不影响生成器自身的随机序列"""
+    generator = create_generator(WordBank(words, {}), {'compact_grid': True})
+    generator.rng.seed(1)
+    expected = generator.rng.random()
+    generator.rng.seed(1)
+    generator.generate(Difficulty.EASY, 42)
+    assert generator.rng.random() == expected
+
+def test_seed_order_independent(words):
+    """谜题只取决于自己的种子，与之前生成过哪些谜题无关"""
+    generator = create_generator(WordBank(words, {}), {'compact_grid': True})
+    seed = derive_seed(5, Difficulty.MEDIUM, 0)
+    alone = generator.generate(Difficulty.MEDIUM, seed).to_dict()
+    generator.generate(Difficulty.HARD, derive_seed(5, Difficulty.HARD, 0))
+    assert generator.generate(Difficulty.MEDIUM, seed).to_dict() == alone
+
+# ==================== 扫描后端 ====================
+
+BACKENDS = [
+    {'compact_grid': True},
+    {'pattern_scan': True},
+    {'pattern_scan': True, 'compact_grid': True},
+    {'batch': True},
+    {'batch': True, 'compact_grid': True},
+]
+# 批量扫描需要 numpy，未安装时跳过
+AVAILABLE_BACKENDS = [b for b in BACKENDS if not b.get('batch') or generate_db_aa.np is not None]
+
+@pytest.fixture(scope='module')
+def reference(words):
+    """默认后端（Grid + 逐个检查候选）的输出"""
+    return generate_all(create_generator(WordBank(words, {})), 3)
+
+@pytest.mark.parametrize('options', BACKENDS, ids=lambda o: '+'.join(o))
+def test_backends_match_default(words, reference, options):
+    """紧凑网格、模式扫描和批量扫描只影响速度，生成的谜题与默认后端相同"""
+    if options.get('batch'):
+        pytest.importorskip('numpy')
+    assert generate_all(create_generator(WordBank(words, {}), options), 3) == reference
+
+@pytest.mark.parametrize('options', [{'backtrack': True}, {'beam_width': 4}],
+                         ids=['backtrack', 'beam'])
+def test_search_modes_match_across_backends(words, options):
+    """回溯和束搜索按撤销日志回退候选池，各后端的结果同样一致"""
+    outputs = [generate_all(create_generator(WordBank(words, {}), dict(options, **backend)), 2)
+               for backend in [{}] + AVAILABLE_BACKENDS]
+    assert all(output == outputs[0] for output in outputs)
+
+# ==================== 放置检查 ====================
+
+@pytest.mark.parametrize('grid_class', [Grid, CompactGrid])
+@pytest.mark.parametrize('placed, word, pos, reason', [
+    # 同方向重叠：MOTHER 覆盖已有的 OTHER
+    (('OTHER', Position(2, 1, 'H')), 'MOTHER', Position(2, 0, 'H'), 'same_direction_overlap'),
+    # 紧贴首尾：BOX 的 O 紧接纵向 SEA 的末字母
+    (('SEA', Position(0, 4, 'V')), 'BOX', Position(3, 3, 'H'), 'touches_word_end'),
+    (('SEA', Position(2, 3, 'H')), 'BOX', Position(3, 3, 'H'), 'parallel_neighbour'),
+])
+def test_placement_rejections(grid_class, placed, word, pos, reason):
+    """同向重叠、紧贴其他单词首尾和平行相邻的放置在两种网格上都被拒绝"""
+    generator = create_generator(WordBank(['MOTHER', 'OTHER', 'SEA', 'BOX'], {}))
+    grid = grid_class(7, 8)
+    generator._place_word(grid, *placed)
+    assert generator._placement_rejection(grid, word, pos) == reason
+    assert not generator._is_valid_placement(grid, word, pos)
+
+@pytest.mark.parametrize('options', [{}] + AVAILABLE_BACKENDS, ids=lambda o: '+'.join(o) or 'default')
+def test_backends_produce_valid_layouts(words, options):
+    """各后端生成的谜题都没有重叠、紧贴或平行相邻的单词"""
+    generator = create_generator(WordBank(words, {}), options)
+    for puzzle in generate_all(generator, 3, master_seed=8):
+        assert set(validate_puzzle(puzzle)) <= {'hints'}
+
+# ==================== 束搜索 ====================
+
+def snapshot(ctx) -> tuple:
+    """上下文的可比较状态：已放置单词、网格字母与归属、开放锚点和排名靠前的候选"""
+    rows, cols = ctx.grid_size
+    cells = [(ctx.grid.get(r, c), ctx.grid.get_owner(r, c, 'H'), ctx.grid.get_owner(r, c, 'V'))
+             for r in range(rows) for c in range(cols)]
+    return (list(ctx.placed_words), set(ctx.used_words), cells, set(ctx.pool.open_anchors),
+            ctx.pool.top_scored(20))
+
+@pytest.mark.parametrize('options', [{}, {'compact_grid': True}, {'pattern_scan': True}],
+                         ids=['default', 'compact', 'pattern'])
+def test_switch_branch_matches_replay(words, options):
+    """按撤销日志切换分支后的状态与从头放置该分支相同，切回原分支也能还原"""
+    def start():
+        generator = create_generator(WordBank(words, {}), dict(options, beam_width=4))
+        generator.rng.seed(3)
+        ctx = generator._get_context(Difficulty.MEDIUM)
+        generator._start_attempt(ctx)
+        return generator, ctx
+    
+    def replay(steps):
+        generator, ctx = start()
+        for word, pos in steps:
+            ctx.place(word, pos)
+        return snapshot(ctx)
+    
+    generator, ctx = start()
+    first, second = [(word, pos) for _, word, pos in ctx.pool.top_scored(2)]
+    # 两条分支：共享第一步后各走一步，以及从第二个候选起步再走一步
+    ctx.place(*first)
+    shared = [first, [(w, p) for _, w, p in ctx.pool.top_scored(1)][0]]
+    ctx.place(*shared[1])
+    generator._switch_branch(ctx, shared, [second])
+    other = [second, [(w, p) for _, w, p in ctx.pool.top_scored(1)][0]]
+    generator._switch_branch(ctx, [second], other)
+    assert snapshot(ctx) == replay(other)
+    
+    generator._switch_branch(ctx, other, shared)
+    assert snapshot(ctx) == replay(shared)
+    generator._switch_branch(ctx, shared, shared[:1])
+    assert snapshot(ctx) == replay(shared[:1])
+
+def test_beam_raises_success_rate(words, monkeypatch):
+    """单词数目标较高时，束搜索单次尝试的成功率高于贪心；不允许切换分支时不回溯"""
+    monkeypatch.setitem(generate_db_aa.DIFFICULTY_CONFIG[Difficulty.HARD],
+                        'word_count_range', (22, 24))
+    
+    def successes(options):
+        # 模式扫描与紧凑网格只影响速度
+        generator = create_generator(WordBank(words, {}),
+                                     dict(options, pattern_scan=True, compact_grid=True))
+        generator.max_attempts = 1
+        seeds = [derive_seed(11, Difficulty.HARD, i) for i in range(40)]
+        count = sum(generator.generate(Difficulty.HARD, seed) is not None for seed in seeds)
+        return count, generator.stats.backtracks
+    
+    greedy, _ = successes({})
+    beam, switches = successes({'beam_width': 4})
+    assert beam >= greedy + 5 and switches > 0
+    assert successes({'beam_width': 4, 'max_backtracks': 0})[1] == 0
+
+# ==================== 多进程 ====================
+
+def run_generate(output: str, workers: int, *extra: str):
+    """以命令行方式生成小题库"""
+    subprocess.run([sys.executable, os.path.join(TOOLS_DIR, 'generate_db_aa.py'),
+                    '--seed', '7', '--count', '3', '--no-cache', '-j', str(workers),
+                    '-o', output, *extra],
+                   cwd=TOOLS_DIR, check=True, stdout=subprocess.DEVNULL)
+
+@pytest.mark.parametrize('extra', [(), ('--format', 'compact')])
+def test_workers_do_not_change_output(tmp_path, extra):
+    """-j1 与 -jN 生成的题库逐字节相同（固定种子时文件头不写生成时间）"""
+    single = str(tmp_path / 'single.js')
+    multi = str(tmp_path / 'multi.js')
+    run_generate(single, 1, *extra)
+    run_generate(multi, 3, *extra)
+    with open(single, 'rb') as a, open(multi, 'rb') as b:
+        assert a.read() == b.read()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+词典提示库测试：构建、查找、多个词典的优先级与缓存
+"""
+
+import gzip
+import json
+import os
+
+import pytest
+
+from generate_db_aa import HintStore, WordBank, words_with_hints
+
+@pytest.fixture
+def sources(tmp_path):
+    """一个 TSV 词典和一个压缩的 JSONL 词典，APPLE 在两者中都有"""
+    tsv = tmp_path / 'dict.tsv'
+    tsv.write_text("# 注释行\n"
+                   "apple\tA round   fruit\n"
+                   "banana\tnoun\tA yellow fruit\n"
+                   "ice-cream\tnot a plain word\n"
+                   "zebra\tA striped animal\n", encoding='utf-8')
+    jsonl = tmp_path / 'dict.jsonl.gz'
+    with gzip.open(jsonl, 'wt', encoding='utf-8') as f:
+        for entry in [{'word': 'apple', 'definition': "Loses to the TSV entry"},
+                      {'word': 'cherry', 'senses': [{'glosses': ["A small red fruit"]}]},
+                      {'word': 'date', 'gloss': "Fruit of a palm"},
+                      {'word': 'empty'}]:
+            f.write(json.dumps(entry) + "\n")
+        f.write("not json\n")
+    return [str(tsv), str(jsonl)]
+
+@pytest.fixture
+def store(tmp_path, sources):
+    """由两个词典建成的提示库"""
+    return HintStore(HintStore.ensure(sources, str(tmp_path / 'cache')))
+
+def test_lookup(store):
+    """按单词（不区分大小写）查找，靠前的词典优先，空白合并，非纯字母单词不收录"""
+    assert len(store) == 5
+    assert store.get('apple') == "A round fruit"
+    assert store.get('BANANA') == "A yellow fruit"
+    assert store.get('Cherry') == "A small red fruit"
+    assert store.get('DATE') == "Fruit of a palm"
+    assert store.get('ZEBRA') == "A striped animal"
+    for missing in ('EMPTY', 'ICECREAM', 'AARDVARK', 'ZZZ', ''):
+        assert store.get(missing) is None
+        assert missing not in store
+    assert 'zebra' in store
+
+def test_ensure_reuses_and_rebuilds(tmp_path, sources):
+    """词典不变时复用已有提示库，内容变化后重建并删除旧文件"""
+    cache = str(tmp_path / 'cache')
+    path = HintStore.ensure(sources, cache)
+    assert HintStore.ensure(sources, cache) == path
+    assert HintStore.ensure(sources[::-1], cache) != path
+    
+    with open(sources[0], 'a', encoding='utf-8') as f:
+        f.write("fig\tA soft fruit\n")
+    rebuilt = HintStore.ensure(sources, cache)
+    assert HintStore(rebuilt).get('FIG') == "A soft fruit"
+    assert sorted(os.listdir(cache)) == [os.path.basename(rebuilt)]
+
+def test_word_bank_hints(store):
+    """词库的提示表优先，其次是提示库，都没有时为占位提示；提示库参与指纹"""
+    bank = WordBank(['APPLE', 'CHERRY', 'MANGO'], {'APPLE': "From the table"})
+    before = bank.fingerprint()
+    bank.set_hint_store(store)
+    assert bank.fingerprint() != before
+    assert bank.get_hint('APPLE') == "From the table"
+    assert bank.get_hint('CHERRY') == "A small red fruit"
+    assert bank.get_hint('MANGO') == "Definition of MANGO"
+    assert words_with_hints(bank.words, bank.hints, store) == ['APPLE', 'CHERRY']
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+增量生成测试：断点续跑、截断后续跑、无断点续写与区间重新生成
+"""
+
+import os
+import subprocess
+import sys
+
+from conftest import TOOLS_DIR
+from generate_db_aa import Checkpoint, PuzzleDBReader
+
+def run(output: str, *args: str):
+    """以命令行方式生成或续写小题库"""
+    subprocess.run([sys.executable, os.path.join(TOOLS_DIR, 'generate_db_aa.py'),
+                    '--no-cache', '-o', output, *args],
+                   cwd=TOOLS_DIR, check=True, stdout=subprocess.DEVNULL)
+
+def by_difficulty(path: str) -> dict:
+    """按难度分组的谜题（续写时各难度交替写入，文件中的先后顺序可能不同）"""
+    groups = {}
+    for difficulty, puzzle in PuzzleDBReader(path):
+        groups.setdefault(difficulty, []).append(puzzle)
+    return groups
+
+def test_append_continues_checkpoint(tmp_path):
+    """分两次生成（第二次从断点续写）与一次生成的题库各难度的谜题相同"""
+    whole = str(tmp_path / 'whole.js')
+    run(whole, '--seed', '7', '--count', '4')
+    resumed = str(tmp_path / 'resumed.js')
+    run(resumed, '--seed', '7', '--count', '2', '--checkpoint-every', '1')
+    run(resumed, '--append', '--count', '4')
+    assert by_difficulty(resumed) == by_difficulty(whole)
+
+def test_resume_truncates_after_checkpoint(tmp_path):
+    """断点之后写入的残缺内容在续跑时被截掉"""
+    whole = str(tmp_path / 'whole.js')
+    run(whole, '--seed', '7', '--count', '3')
+    crashed = str(tmp_path / 'crashed.js')
+    run(crashed, '--seed', '7', '--count', '2')
+    with open(crashed, 'ab') as f:
+        f.write(b'\r\n{"gridSize":{"rows":10,')
+    run(crashed, '--append', '--count', '3')
+    assert by_difficulty(crashed) == by_difficulty(whole)
+
+def test_append_without_checkpoint_uses_new_slots(tmp_path):
+    """没有断点时沿用原种子续写，新题目不会是已有题目的重复"""
+    path = str(tmp_path / 'db.js')
+    run(path, '--seed', '7', '--count', '3')
+    os.remove(Checkpoint.path_for(path))
+    run(path, '--append', '--seed', '7', '--count', '6', '--no-dedup')
+    reader = PuzzleDBReader(path)
+    records = list(reader)
+    assert dict(reader.counts) == {'easy': 6, 'medium': 6, 'hard': 6}
+    for difficulty in reader.counts:
+        layouts = [p for d, p in records if d == difficulty]
+        assert all(layouts.count(p) == 1 for p in layouts)
+
+def test_range_replaces_only_that_range(tmp_path):
+    """--range 只替换指定难度的指定区间，其余题目不变"""
+    path = str(tmp_path / 'db.js')
+    run(path, '--seed', '7', '--count', '4')
+    before = list(PuzzleDBReader(path))
+    run(path, '--seed', '9', '--difficulty', 'hard', '--range', '1:3')
+    after = list(PuzzleDBReader(path))
+    assert len(after) == len(before)
+    hard = [i for i, (d, _) in enumerate(before) if d == 'hard']
+    changed = [i for i, (old, new) in enumerate(zip(before, after)) if old != new]
+    assert changed == hard[1:3]
+    assert not os.path.exists(Checkpoint.path_for(path))
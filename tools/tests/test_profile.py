@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+性能剖析测试：剖析不改变生成结果、各项计数自洽、--stats 报告的内容与进程数无关
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from conftest import TOOLS_DIR
+from generate_db_aa import Difficulty, GenerationProfile, WordBank, create_generator, derive_seed
+
+REASONS = {'out_of_bounds', 'start_adjacent', 'end_adjacent', 'parallel_neighbour',
+           'touches_word_end', 'letter_mismatch', 'same_direction_overlap', 'no_intersection'}
+
+def test_profile_does_not_change_output(words):
+    """开启剖析时生成的谜题与未开启时相同"""
+    plain = create_generator(WordBank(words, {}))
+    profiled = create_generator(WordBank(words, {}), {'profile': True})
+    for d in Difficulty:
+        for i in range(3):
+            seed = derive_seed(8, d, i)
+            assert plain.generate(d, seed).to_dict() == profiled.generate(d, seed).to_dict()
+
+def test_profile_counts(words):
+    """每题的尝试次数分布、累计统计与验证次数相互一致"""
+    generator = create_generator(WordBank(words, {}), {'profile': True})
+    for i in range(5):
+        generator.generate(Difficulty.MEDIUM, derive_seed(8, Difficulty.MEDIUM, i))
+    profile = generator.profile
+    report = profile.to_dict()
+    assert (report['puzzles'], report['failed_puzzles']) == (5, 0)
+    assert sum(report['attempts_per_puzzle'].values()) == 5
+    assert report['attempts'] == sum(int(n) * c for n, c in report['attempts_per_puzzle'].items())
+    assert report['iterations'] == sum(int(n) * c
+                                       for n, c in report['iterations_per_puzzle'].items())
+    assert report['attempts'] == generator.stats.attempts
+    
+    validation = report['validation']
+    assert validation['checked'] == validation['accepted'] + sum(validation['rejected'].values())
+    assert validation['accepted'] > 0 and set(validation['rejected']) <= REASONS
+    assert set(report['timers']) == set(GenerationProfile.STAGES)
+    assert report['timers']['validation']['calls'] == validation['checked']
+
+def test_profile_merge():
+    """合并两份剖析数据时各项计数相加"""
+    first, second = GenerationProfile(), GenerationProfile()
+    first.rejections['letter_mismatch'] = 2
+    second.rejections['letter_mismatch'] = 3
+    second.rejections['no_intersection'] = 1
+    first.add_time('scoring', 0.5)
+    second.add_time('scoring', 0.25)
+    first.merge(second)
+    assert dict(first.rejections) == {'letter_mismatch': 5, 'no_intersection': 1}
+    assert first.to_dict()['timers']['scoring'] == {'seconds': 0.75, 'calls': 2}
+
+def stats_report(tmp_path, workers: int) -> dict:
+    """以命令行方式生成小题库并读取 --stats 报告"""
+    output = str(tmp_path / f'db{workers}.js')
+    subprocess.run([sys.executable, os.path.join(TOOLS_DIR, 'generate_db_aa.py'), '--no-cache',
+                    '--seed', '5', '--count', '3', '-j', str(workers), '--stats', '-o', output],
+                   cwd=TOOLS_DIR, check=True, stdout=subprocess.DEVNULL)
+    with open(output + '.stats.json', encoding='utf-8') as f:
+        return json.load(f)
+
+def test_stats_report(tmp_path):
+    """--stats 报告按难度给出剖析数据，计数部分与进程数无关"""
+    single, parallel = stats_report(tmp_path, 1), stats_report(tmp_path, 2)
+    assert single['output'].endswith('db1.js') and single['shortfalls'] == {}
+    assert set(single['difficulties']) == {d.value for d in Difficulty}
+    for d in Difficulty:
+        entry = single['difficulties'][d.value]
+        # 剖析覆盖提交的全部槽位，包括达到目标后同批次多出的槽位
+        assert entry['puzzles'] >= 3 and set(entry['dedup_rejected']) == {'duplicate', 'similar'}
+        
+        # 计时随运行变化，其余计数只取决于种子
+        counts = {k: v for k, v in entry.items() if k != 'timers'}
+        assert counts == {k: v for k, v in parallel['difficulties'][d.value].items()
+                          if k != 'timers'}
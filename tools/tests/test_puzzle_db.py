@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+题库读写测试：完整、紧凑、分片与种子格式写出后原样读回
+"""
+
+import pytest
+
+from generate_db_aa import (
+    CompactPuzzleDBWriter, Difficulty, ParallelGenerator, PuzzleDBReader, PuzzleDBWriter,
+    SeedPuzzleDB, SeedPuzzleDBWriter, ShardedPuzzleDBWriter, WordBank, create_generator,
+    derive_seed
+)
+from validate_db import iter_shards
+
+@pytest.fixture(scope='module')
+def bank(words):
+    """部分单词带提示的词库（其余为占位提示），相同提示在紧凑格式中共用词表项"""
+    hints = {w: f"Hint {i % 7}" for i, w in enumerate(words[::3])}
+    return WordBank(words, hints)
+
+@pytest.fixture(scope='module')
+def records(bank):
+    """按难度排列的 (难度, 谜题字典)"""
+    generator = create_generator(bank, {'compact_grid': True})
+    return [(d.value, generator.generate(d, derive_seed(2, d, i)).to_dict())
+            for d in Difficulty for i in range(3)]
+
+def write_all(writer, records):
+    """用写入器写出全部记录"""
+    with writer:
+        for difficulty, puzzle in records:
+            writer.write(difficulty, puzzle)
+
+@pytest.mark.parametrize('writer_class, fmt', [(PuzzleDBWriter, 'full'),
+                                               (CompactPuzzleDBWriter, 'compact')])
+def test_round_trip(tmp_path, records, writer_class, fmt):
+    """写出的谜题逐题读回（紧凑格式的编号由起点推导，应与原编号一致）"""
+    path = str(tmp_path / 'db.js')
+    write_all(writer_class(path, timestamp=False), records)
+    reader = PuzzleDBReader(path)
+    assert list(reader) == records
+    assert reader.format == fmt
+    assert dict(reader.counts) == {d.value: 3 for d in Difficulty}
+
+@pytest.mark.parametrize('writer_class', [PuzzleDBWriter, CompactPuzzleDBWriter])
+def test_append(tmp_path, records, writer_class):
+    """续写已有题库与一次写完的结果相同"""
+    path = str(tmp_path / 'db.js')
+    write_all(writer_class(path, timestamp=False), records[:4])
+    write_all(writer_class(path, append=True, timestamp=False), records[4:])
+    assert list(PuzzleDBReader(path)) == records
+    
+    whole = str(tmp_path / 'whole.js')
+    write_all(writer_class(whole, timestamp=False), records)
+    with open(path, 'rb') as a, open(whole, 'rb') as b:
+        assert a.read() == b.read()
+
+@pytest.mark.parametrize('compact', [False, True], ids=['full', 'compact'])
+def test_sharded_round_trip(tmp_path, records, compact):
+    """分片题库按清单读回，校验和一致"""
+    directory = str(tmp_path / 'shards')
+    write_all(ShardedPuzzleDBWriter(directory, shard_size=2, compact=compact,
+                                    timestamp=False), records)
+    errors = []
+    assert list(iter_shards(str(tmp_path / 'shards' / 'manifest.js'), errors)) == records
+    assert errors == []
+
+def test_seed_round_trip(tmp_path, bank):
+    """种子格式按记录的选项重新生成出相同的谜题"""
+    options = {'compact_grid': True, 'backtrack': True}
+    generator = create_generator(bank, options)
+    generator.max_attempts = ParallelGenerator.MAX_ATTEMPTS
+    info = {'fingerprint': generator.fingerprint(), 'options': generator.output_options(),
+            'maxAttempts': ParallelGenerator.MAX_ATTEMPTS}
+    seeds = [(d.value, derive_seed(4, d, i)) for d in Difficulty for i in range(2)]
+    path = str(tmp_path / 'seeds.js')
+    write_all(SeedPuzzleDBWriter(path, generator_info=info, timestamp=False), seeds)
+    
+    db = SeedPuzzleDB(path, bank, cache_size=2)
+    assert len(db) == len(seeds)
+    expected = [(d, generator.generate(Difficulty(d), seed).to_dict()) for d, seed in seeds]
+    assert list(db) == expected
+    assert db.get(*db.order[-1]) == expected[-1][1]
+    assert db.hits == 1
+
+def test_seed_db_rejects_other_bank(tmp_path, bank, words):
+    """词库与题库记录的指纹不一致时拒绝加载"""
+    generator = create_generator(bank)
+    info = {'fingerprint': generator.fingerprint(), 'options': generator.output_options()}
+    path = str(tmp_path / 'seeds.js')
+    write_all(SeedPuzzleDBWriter(path, generator_info=info, timestamp=False), [('easy', 1)])
+    with pytest.raises(ValueError):
+        SeedPuzzleDB(path, WordBank(words[:-1], {}))
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+谜题服务缓冲池测试：补充到容量、排队等待、背压拒绝、工作进程出错与共享名额
+用线程池和假的槽位生成函数代替工作进程
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import puzzle_service
+from generate_db_aa import Difficulty
+from puzzle_service import PuzzlePool, ServiceBusy
+
+class FakeSlots:
+    """假的槽位生成函数：记录调用与并发数，gate 打开前阻塞，第 fail 次调用抛出异常"""
+    
+    def __init__(self):
+        self.gate = threading.Event()
+        self.fail = set()
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.running = 0
+        self.max_running = 0
+    
+    def __call__(self, task):
+        difficulty_value, seed, _ = task
+        with self.lock:
+            index = self.calls
+            self.calls += 1
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            self.gate.wait(5)
+            if index in self.fail:
+                raise RuntimeError("worker crashed")
+            return {'difficulty': difficulty_value, 'slot': index}, None, None
+        finally:
+            with self.lock:
+                self.running -= 1
+
+@pytest.fixture
+def fake(monkeypatch):
+    """安装一个闸门关闭的假槽位生成函数，测试结束时打开闸门放行阻塞的线程"""
+    slots = FakeSlots()
+    monkeypatch.setattr(puzzle_service, 'generate_slot', slots)
+    yield slots
+    slots.gate.set()
+
+async def until(condition, timeout: float = 5.0):
+    """等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "等待超时"
+        await asyncio.sleep(0.01)
+
+async def stop(tasks):
+    """取消补充任务"""
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+def run_pools(scenario, pools: int = 1, workers: int = 4, **options):
+    """在新事件循环中创建缓冲池并启动补充任务，再运行 scenario(pools)"""
+    async def main():
+        options.setdefault('capacity', 3)
+        options.setdefault('max_waiters', 2)
+        created = [PuzzlePool(d, master_seed=1, **options) for d in list(Difficulty)[:pools]]
+        slots = asyncio.Semaphore(workers)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            tasks = [asyncio.create_task(pool.refill(executor, slots)) for pool in created]
+            try:
+                await scenario(created)
+            finally:
+                await stop(tasks)
+                # 放行阻塞的线程，线程池才能关闭
+                puzzle_service.generate_slot.gate.set()
+    asyncio.run(main())
+
+def test_fills_to_capacity(fake):
+    """缓冲区补满后暂停，取走一题后再补一题"""
+    async def scenario(pools):
+        pool = pools[0]
+        fake.gate.set()
+        await until(lambda: len(pool.buffer) == 3)
+        await asyncio.sleep(0.05)
+        assert fake.calls == 3 and pool.inflight == 0
+        
+        seeds = {puzzle_service.derive_seed(1, pool.difficulty, i) for i in range(3)}
+        assert {seed for _, seed in pool.buffer} == seeds
+        await pool.get(1.0)
+        await until(lambda: len(pool.buffer) == 3)
+        assert fake.calls == 4
+        assert pool.snapshot()['buffer_hits'] == 1
+    run_pools(scenario)
+
+def test_waiter_served(fake):
+    """缓冲区为空时请求排队，拿到下一道完成的谜题"""
+    async def scenario(pools):
+        pool = pools[0]
+        getter = asyncio.create_task(pool.get(5.0))
+        await until(lambda: pool.waiters)
+        fake.gate.set()
+        puzzle, _ = await getter
+        assert puzzle['difficulty'] == pool.difficulty.value
+        # 排队的请求让补充任务多开一个槽位：容量 3 + 排队 1
+        assert fake.calls <= 4
+        assert (pool.metrics['waited'], pool.metrics['served']) == (1, 1)
+        await until(lambda: len(pool.buffer) == 3)
+    run_pools(scenario)
+
+def test_rejects_when_too_many_waiters(fake):
+    """排队请求达到上限时立即拒绝"""
+    async def scenario(pools):
+        pool = pools[0]
+        getter = asyncio.create_task(pool.get(5.0))
+        await until(lambda: pool.waiters)
+        with pytest.raises(ServiceBusy):
+            await pool.get(5.0)
+        assert pool.metrics['rejected'] == 1
+        fake.gate.set()
+        await getter
+        assert (pool.metrics['served'], pool.metrics['waited']) == (1, 1)
+    run_pools(scenario, max_waiters=1)
+
+def test_rejects_on_timeout(fake):
+    """等待超时时拒绝，排队记录随之移除"""
+    async def scenario(pools):
+        pool = pools[0]
+        with pytest.raises(ServiceBusy):
+            await pool.get(0.05)
+        assert (pool.metrics['served'], pool.metrics['rejected']) == (0, 1)
+        assert not pool.waiters
+    run_pools(scenario)
+
+def test_worker_errors_do_not_stop_refill(fake):
+    """工作进程出错的槽位被计数并丢弃，补充任务继续补满缓冲区"""
+    async def scenario(pools):
+        pool = pools[0]
+        fake.fail = {0, 2}
+        fake.gate.set()
+        await until(lambda: len(pool.buffer) == 3)
+        assert sorted(puzzle['slot'] for puzzle, _ in pool.buffer) == [1, 3, 4]
+        assert pool.snapshot()['worker_errors'] == 2
+        assert pool.metrics['generated'] == 3
+    run_pools(scenario)
+
+def test_shared_slots_cap_inflight(fake):
+    """多个难度共享工作进程名额，生成中的槽位总数不超过名额数"""
+    async def scenario(pools):
+        await until(lambda: fake.running == 2)
+        await asyncio.sleep(0.05)
+        assert fake.calls == 2
+        assert sum(pool.inflight for pool in pools) == 2
+        fake.gate.set()
+        await until(lambda: all(len(pool.buffer) == 3 for pool in pools))
+        assert fake.max_running == 2
+        assert fake.calls == 9
+    run_pools(scenario, pools=3, workers=2)
+
+def test_cancel_returns_acquired_slot(fake):
+    """补充任务在申请到名额、尚未使用时被取消，名额仍归还"""
+    async def main():
+        pool = PuzzlePool(Difficulty.EASY, 3, 1, 2)
+        slots = asyncio.Semaphore(1)
+        await slots.acquire()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            task = asyncio.create_task(pool.refill(executor, slots))
+            await asyncio.sleep(0.01)
+            # 名额交给补充任务的同时取消它
+            slots.release()
+            task.cancel()
+            await stop([task])
+            assert fake.calls == 0
+            await asyncio.wait_for(slots.acquire(), 1.0)
+    asyncio.run(main())
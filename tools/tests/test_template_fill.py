@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+模板填充引擎测试：随机格栅的单词数、输出通过题库校验、模板筛选、填不满时改用默认引擎
+"""
+
+import json
+import random
+
+import pytest
+
+from generate_db_aa import (
+    DIFFICULTY_CONFIG, Difficulty, GridTemplate, ParallelGenerator, WordBank,
+    create_generator, derive_seed
+)
+from validate_db import validate_puzzle
+
+@pytest.mark.parametrize('difficulty', list(Difficulty), ids=lambda d: d.value)
+def test_lattice_within_config(difficulty):
+    """随机格栅的槽位数与长度都在难度配置内，白格连通"""
+    config = DIFFICULTY_CONFIG[difficulty]
+    min_count, max_count = config['word_count_range']
+    lengths = set(range(config['word_length_range'][0], config['word_length_range'][1] + 1))
+    rng = random.Random(1)
+    for _ in range(20):
+        template = GridTemplate.lattice(*config['grid_size'], lengths,
+                                        config['word_count_range'], rng)
+        assert template.size == config['grid_size']
+        assert template.is_connected()
+        slots = template.slots()
+        assert min_count <= len(slots) <= max_count
+        assert {length for _, length in slots} <= lengths
+
+def test_lattice_gives_up():
+    """单词数范围无法满足时返回 None"""
+    assert GridTemplate.lattice(10, 10, {3, 4}, (40, 50), random.Random(1)) is None
+
+@pytest.mark.parametrize('difficulty', list(Difficulty), ids=lambda d: d.value)
+def test_output_passes_validation(words, difficulty):
+    """填满的模板通过全部结构规则，单词数在难度配置内，不回退到默认引擎"""
+    generator = create_generator(WordBank(words, {}), {'template_fill': True})
+    min_count, max_count = DIFFICULTY_CONFIG[difficulty]['word_count_range']
+    for i in range(5):
+        puzzle = generator.generate(difficulty, derive_seed(2, difficulty, i)).to_dict()
+        assert set(validate_puzzle(puzzle)) <= {'hints'}
+        assert min_count <= len(puzzle['words']) <= max_count
+    assert generator.stats.fallbacks == 0
+
+def test_templates_outside_word_count_ignored(words):
+    """槽位数超出单词数范围的模板被忽略，范围内的模板按槽位填满"""
+    # 3 个横向单词 + 3 个纵向单词，共 6 个槽位
+    fitting = GridTemplate(["....." + "#" * 5, ".#.#." + "#" * 5, "....." + "#" * 5,
+                            ".#.#." + "#" * 5, "....." + "#" * 5] + ["#" * 10] * 5)
+    # 5 个横向 + 5 个纵向单词，超出 easy 的 5-7 个
+    crowded = GridTemplate(["." * 10 if r % 2 == 0 else ".#" * 5 for r in range(10)])
+    assert (len(fitting.slots()), len(crowded.slots())) == (6, 10)
+    generator = create_generator(WordBank(words, {}), {
+        'template_fill': True, 'templates': [fitting.cells, crowded.cells]})
+    ctx = generator._get_context(Difficulty.EASY)
+    assert ctx.templates == [fitting]
+    puzzle = generator.generate(Difficulty.EASY, 5)
+    assert sorted((w.row, w.col, w.direction) for w in puzzle.words) == sorted(
+        (pos.row, pos.col, pos.direction) for pos, _ in fitting.slots())
+
+def test_unfillable_falls_back(words):
+    """模板一次都填不满时改用默认引擎，输出仍然合格，改用的尝试计入统计"""
+    generator = create_generator(WordBank(words, {}), {'template_fill': True, 'max_nodes': 0})
+    for i in range(3):
+        puzzle = generator.generate(Difficulty.EASY, derive_seed(2, Difficulty.EASY, i))
+        assert set(validate_puzzle(puzzle.to_dict())) <= {'hints'}
+    assert generator.stats.fallbacks == generator.stats.attempts > 0
+
+def test_fallbacks_reported(words, tmp_path):
+    """并行生成汇总改用默认引擎的尝试次数，并写入统计报告"""
+    generator = ParallelGenerator(words, {}, master_seed=1, dedup_threshold=None,
+                                  generator_options={'template_fill': True, 'max_nodes': 0})
+    puzzles = list(generator.iter_puzzles([Difficulty.EASY], {Difficulty.EASY: 2}))
+    assert len(puzzles) == 2 and not generator.shortfalls
+    assert generator.fallbacks['easy'] >= 2
+    
+    path = str(tmp_path / 'stats.json')
+    generator.save_stats(path)
+    with open(path, encoding='utf-8') as f:
+        assert json.load(f)['fallbacks'] == generator.fallbacks
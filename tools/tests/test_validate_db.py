@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+题库校验测试：每条规则在手工构造的合格/不合格谜题上的判定
+"""
+
+import copy
+
+import pytest
+
+from generate_db_aa import Difficulty, PuzzleDBWriter, WordBank, create_generator, derive_seed
+from validate_db import validate_db, validate_puzzle
+
+def word(w: str, r: int, c: int, d: str, n: int, h: str = "A clue") -> dict:
+    return {'w': w, 'r': r, 'c': c, 'd': d, 'n': n, 'h': h}
+
+# 5x6 网格：
+#   . . . . . .
+#   O . . . T .
+#   H E L L O .
+#   M . . . P .
+#   . . . . . .
+GOOD = {
+    'gridSize': {'rows': 5, 'cols': 6},
+    'words': [word('OHM', 1, 0, 'V', 1), word('TOP', 1, 4, 'V', 2), word('HELLO', 2, 0, 'H', 3)],
+}
+
+def variant(*extra: dict, **changes) -> dict:
+    """GOOD 的副本：changes 按 单词序号_字段 修改已有单词，extra 为追加的单词"""
+    puzzle = copy.deepcopy(GOOD)
+    for key, value in changes.items():
+        index, field = key.split('_')
+        puzzle['words'][int(index[1:])][field] = value
+    puzzle['words'].extend(extra)
+    return puzzle
+
+def test_good_puzzle_passes():
+    assert validate_puzzle(GOOD) == {}
+
+@pytest.mark.parametrize('puzzle, rule', [
+    (variant(w2_w='HELL0'), 'format'),
+    (variant(w0_d='X'), 'format'),
+    ({'gridSize': {'rows': 5, 'cols': 6}, 'words': []}, 'format'),
+    (variant(w2_c=2), 'bounds'),
+    ({'words': GOOD['words']}, 'bounds'),
+    (variant(w0_w='OAM'), 'crossing'),
+    # 同方向重叠：LO 与 HELLO 的末两个字母重合
+    (variant(word('LO', 2, 3, 'H', 4)), 'adjacency'),
+    # 平行相邻：ON 紧贴 HELLO 下方
+    (variant(word('ON', 3, 1, 'H', 4)), 'adjacency'),
+    # 首尾紧贴：IT 的首字母紧接 HELLO 的末字母
+    (variant(word('IT', 2, 5, 'V', 4)), 'adjacency'),
+    (variant(word('AT', 4, 2, 'H', 4)), 'connectivity'),
+    (variant(w0_n=2, w1_n=1), 'numbering'),
+    (variant(w2_h="Definition of HELLO"), 'hints'),
+    (variant(w1_h=""), 'hints'),
+])
+def test_rule_failures(puzzle, rule):
+    """每个不合格的谜题都触发对应规则"""
+    assert rule in validate_puzzle(puzzle)
+
+@pytest.mark.parametrize('puzzle, rule', [
+    (variant(word('LO', 2, 3, 'H', 4)), 'adjacency'),
+    (variant(word('AT', 4, 2, 'H', 4)), 'connectivity'),
+    (variant(w0_n=2, w1_n=1), 'numbering'),
+    (variant(w2_h="Definition of HELLO"), 'hints'),
+])
+def test_rule_failures_are_isolated(puzzle, rule):
+    """只违反一条规则时不牵连其他规则"""
+    assert list(validate_puzzle(puzzle)) == [rule]
+
+def test_legacy_array_format():
+    """旧版数组格式没有 gridSize，只报告 bounds"""
+    assert list(validate_puzzle(GOOD['words'])) == ['bounds']
+
+@pytest.mark.parametrize('options', [{}, {'backtrack': True}, {'beam_width': 4}],
+                         ids=['greedy', 'backtrack', 'beam'])
+def test_generated_puzzles_pass(words, options):
+    """生成器的输出通过全部结构规则（自带数据没有提示，只有 hints 警告）"""
+    generator = create_generator(WordBank(words, {}), dict(options, compact_grid=True))
+    for d in Difficulty:
+        for i in range(3):
+            puzzle = generator.generate(d, derive_seed(6, d, i)).to_dict()
+            assert set(validate_puzzle(puzzle)) <= {'hints'}
+
+def test_hints_are_warnings(tmp_path):
+    """占位提示默认只计入警告，warn 为空（--strict）时计入失败"""
+    path = str(tmp_path / 'db.js')
+    with PuzzleDBWriter(path, timestamp=False) as writer:
+        writer.write('easy', GOOD)
+        writer.write('easy', variant(w2_h="Definition of HELLO"))
+        writer.write('medium', variant(w0_w='OAM'))
+    report = validate_db(path, None, 2, [], 1)
+    assert (report['puzzles'], report['failed_puzzles'], report['warned_puzzles']) == (3, 1, 1)
+    assert report['rules']['hints'] == {'failed': 1, 'warning': True, 'examples': [
+        {'difficulty': 'easy', 'index': 1, 'message': "HELLO 只有占位提示: Definition of HELLO"}]}
+
+    strict = validate_db(path, None, 2, [], 1, warn=())
+    assert (strict['failed_puzzles'], strict['warned_puzzles']) == (2, 0)
+    assert validate_db(path, None, 2, ['crossing', 'hints'], 1)['failed_puzzles'] == 0
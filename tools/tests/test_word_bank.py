@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+词库测试：紧凑词库与默认词库的查询结果一致，模式查询与逐个比对单词的结果一致
+"""
+
+import random
+
+import pytest
+
+from generate_db_aa import CompactWordBank, WordBank
+
+LENGTH_RANGES = [(3, 15), (3, 5), (4, 8), (6, 6), (9, 15)]
+
+@pytest.fixture(scope='module')
+def banks(words):
+    """同一份单词（含重复项）构建的默认词库与紧凑词库"""
+    bank_words = words + words[::5]
+    return WordBank(bank_words, {}), CompactWordBank(bank_words, {})
+
+def test_compact_words_by_length(banks):
+    """各长度范围的单词及其顺序相同"""
+    bank, compact = banks
+    for min_len, max_len in LENGTH_RANGES:
+        assert compact.get_words_by_length(min_len, max_len) == \
+            bank.get_words_by_length(min_len, max_len)
+
+def test_compact_words_with_char_at(banks):
+    """每个 (位置, 字母) 在各长度范围内的单词相同，字母不区分大小写"""
+    bank, compact = banks
+    for min_len, max_len in LENGTH_RANGES:
+        for position, char in bank.by_char_at:
+            assert compact.get_words_with_char_at(position, char.lower(), min_len, max_len) == \
+                bank.get_words_with_char_at(position, char, min_len, max_len)
+    assert compact.get_words_with_char_at(20, 'A') == bank.get_words_with_char_at(20, 'A') == []
+
+def test_compact_char_index(banks):
+    """倒排索引的字母集合与每个字母的 (单词, 位置) 序列都相同"""
+    bank, compact = banks
+    for min_len, max_len in LENGTH_RANGES:
+        expected = bank.get_char_index(min_len, max_len)
+        index = compact.get_char_index(min_len, max_len)
+        assert {char: list(postings) for char, postings in index.items()} == expected
+        assert all(len(index[char]) == len(expected[char]) for char in expected)
+
+def test_compact_lengths_and_fingerprint(banks):
+    """长度数组与单词一一对应，指纹与索引实现无关"""
+    bank, compact = banks
+    assert list(compact.lengths) == [len(w) for w in bank.words]
+    assert compact.fingerprint() == bank.fingerprint()
+
+def matching(bank, length: int, constraints) -> list:
+    """逐个比对：长度为 length 且在各 (位置, 字母) 上一致的单词"""
+    return [w for w in bank.get_words_by_length(length, length)
+            if all(w[position] == char for position, char in constraints)]
+
+@pytest.mark.parametrize('which', [0, 1], ids=['default', 'compact'])
+def test_match_constraints(banks, which):
+    """位图查询与逐个比对的结果及顺序相同，包括无约束和无结果的查询"""
+    bank = banks[which]
+    rng = random.Random(4)
+    for length in range(3, 14):
+        words = bank.get_words_by_length(length, length)
+        assert bank.match_constraints(length, []) == words
+        for _ in range(30):
+            # 取一个已有单词的部分字母作为约束，保证大多数查询有结果
+            word = rng.choice(words)
+            positions = rng.sample(range(length), rng.randint(1, min(length, 4)))
+            constraints = [(p, word[p]) for p in positions]
+            result = bank.match_constraints(length, constraints)
+            assert word in result and result == matching(bank, length, constraints)
+        assert bank.match_constraints(length, [(0, 'Q'), (1, 'X')]) == []
+    assert bank.match_constraints(20, []) == bank.match_constraints(20, [(0, 'A')]) == []
+
+@pytest.mark.parametrize('pattern', ['?A??E?S', 'c?t', '?????', 'S????', '?Q?', 'APPLE'])
+def test_match_pattern(banks, pattern):
+    """'?' 匹配任意字母，其余字母不区分大小写"""
+    bank, compact = banks
+    constraints = [(i, char.upper()) for i, char in enumerate(pattern) if char != '?']
+    expected = matching(bank, len(pattern), constraints)
+    assert bank.match_pattern(pattern) == compact.match_pattern(pattern) == expected
+
+def test_pattern_index_cached(banks):
+    """每个长度的位图索引只构建一次，位图中的单词与逐个比对一致"""
+    bank, _ = banks
+    words, bitsets = bank._pattern_index(5)
+    assert bank._pattern_index(5)[1] is bitsets
+    for (position, char), bits in bitsets.items():
+        assert [w for i, w in enumerate(words) if bits >> i & 1] == \
+            matching(bank, 5, [(position, char)])
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+词库索引缓存测试：命中、输入变化时重建、不同输入并存与两种加载方式
+"""
+
+import os
+
+import pytest
+
+from generate_db_aa import CompactWordBank, WordBank, WordBankCache
+
+HTML = """<script>
+const KNOWN_HINTS = {
+    "APPLE": "A round fruit",
+    "CHERRY": "A small red fruit",
+};
+</script>
+"""
+
+@pytest.fixture
+def inputs(tmp_path):
+    """词库文件和带 KNOWN_HINTS 的 HTML 文件"""
+    words_file = tmp_path / 'words.txt'
+    words_file.write_text("apple\nbanana\ncherry\ndate\napple\nmango\n", encoding='utf-8')
+    html_file = tmp_path / 'hints.html'
+    html_file.write_text(HTML, encoding='utf-8')
+    return str(words_file), str(html_file)
+
+@pytest.fixture
+def cache(tmp_path):
+    """空缓存目录"""
+    return WordBankCache(str(tmp_path / 'cache'))
+
+def cache_files(cache: WordBankCache) -> list:
+    """缓存目录中的词库缓存文件名"""
+    return sorted(name for name in os.listdir(cache.cache_dir) if name.startswith('wordbank-'))
+
+def test_hit_does_not_rebuild(cache, inputs, monkeypatch):
+    """输入不变时直接返回已有的缓存文件"""
+    path = cache.ensure(*inputs)
+    monkeypatch.setattr(WordBankCache, 'save', lambda *args: pytest.fail("缓存命中时不应重建"))
+    assert cache.ensure(*inputs) == path
+
+def test_rebuild_on_input_change(cache, inputs):
+    """词库内容变化时生成新的缓存文件，旧的保留供原输入使用"""
+    path = cache.ensure(*inputs)
+    with open(inputs[0], 'a', encoding='utf-8') as f:
+        f.write("melon\n")
+    rebuilt = cache.ensure(*inputs)
+    assert rebuilt != path
+    assert 'MELON' in WordBankCache.load(rebuilt).words
+    assert cache_files(cache) == sorted(os.path.basename(p) for p in (path, rebuilt))
+
+def test_variants_keep_each_other(cache, inputs, monkeypatch):
+    """交替使用 require_hints 时两份缓存并存，之后都能命中"""
+    plain = cache.ensure(*inputs)
+    hinted = cache.ensure(*inputs, require_hints=True)
+    assert plain != hinted
+    assert WordBankCache.load(hinted).words == ['APPLE', 'CHERRY', 'APPLE']
+    monkeypatch.setattr(WordBankCache, 'save', lambda *args: pytest.fail("缓存命中时不应重建"))
+    assert cache.ensure(*inputs) == plain
+    assert cache.ensure(*inputs, require_hints=True) == hinted
+
+def test_evicts_least_recently_used(cache, inputs, monkeypatch):
+    """超过 MAX_ENTRIES 时删除最久未使用的缓存文件"""
+    monkeypatch.setattr(WordBankCache, 'MAX_ENTRIES', 2)
+    paths = []
+    for i, extra in enumerate(["melon", "peach", "grape"]):
+        with open(inputs[0], 'a', encoding='utf-8') as f:
+            f.write(extra + "\n")
+        paths.append(cache.ensure(*inputs))
+        os.utime(paths[-1], (i, i))
+    assert cache_files(cache) == sorted(os.path.basename(p) for p in paths[1:])
+
+@pytest.mark.parametrize('compact', [False, True], ids=['default', 'compact'])
+def test_load_matches_fresh_bank(cache, inputs, compact):
+    """两种加载方式的查询结果与直接构建的词库相同"""
+    bank = WordBankCache.load(cache.ensure(*inputs), compact)
+    assert isinstance(bank, CompactWordBank) == compact
+    fresh = WordBank(['APPLE', 'BANANA', 'CHERRY', 'DATE', 'APPLE', 'MANGO'],
+                     {'APPLE': "A round fruit", 'CHERRY': "A small red fruit"})
+    assert bank.words == fresh.words
+    assert bank.fingerprint() == fresh.fingerprint()
+    assert bank.get_words_by_length(4, 6) == fresh.get_words_by_length(4, 6)
+    assert bank.get_words_with_char_at(0, 'a', 4, 6) == fresh.get_words_with_char_at(0, 'a', 4, 6)
+    assert {char: list(postings) for char, postings in bank.get_char_index(4, 6).items()} == \
+        fresh.get_char_index(4, 6)
+    assert bank.get_hint('cherry') == "A small red fruit"
+    assert bank.get_hint('MANGO') == "Definition of MANGO"
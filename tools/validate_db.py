@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+填字游戏题库校验
+流式读取生成的题库（完整/紧凑/分片/旧版格式，以及手写的 JS 字面量题库），
+多进程逐题检查边界、交叉字母、平行相邻、连通性、编号和提示，
+输出按规则汇总的失败报告；结构规则有失败时以非零状态退出，可用作发布前的检查
+（占位提示默认只报告为警告，--strict 时同样视为失败）
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing
+from multiprocessing.pool import Pool
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from generate_db_aa import PuzzleDBReader, unpack_puzzle
+
+# ==================== 校验规则 ====================
+
+RULES = {
+    'format': "字段缺失或取值非法",
+    'bounds': "单词超出网格或缺少 gridSize",
+    'crossing': "交叉格字母不一致",
+    'adjacency': "相邻字母连成了未登记的单词（首尾紧贴、平行相邻或同向重叠）",
+    'connectivity': "单词没有全部连通",
+    'numbering': "编号与起点顺序不符",
+    'hints': "提示缺失或为占位提示",
+}
+
+# 默认只报告、不影响退出状态的规则（自带数据没有提示，生成器按设计使用占位提示）
+WARNING_RULES = ('hints',)
+
+# 格子编码为 r * CELL_STRIDE + c，横向相邻相差 1，纵向相邻相差 CELL_STRIDE
+CELL_STRIDE = 1 << 10
+
+# 生成器找不到提示时的占位文本
+PLACEHOLDER_HINT = re.compile(r'^Definition of [A-Z]+$')
+
+def _cell_name(cell: int) -> str:
+    """格子编码转为 (行,列)"""
+    r, c = divmod(cell, CELL_STRIDE)
+    return f"({r},{c})"
+
+def validate_puzzle(puzzle) -> Dict[str, str]:
+    """检查一道谜题，返回 {规则: 第一条失败说明}，全部通过时为空"""
+    failures: Dict[str, str] = {}
+    
+    def fail(rule: str, message: str):
+        failures.setdefault(rule, message)
+    
+    # 数组格式（旧版）只有单词列表，没有 gridSize
+    if isinstance(puzzle, list):
+        size, words = None, puzzle
+    elif isinstance(puzzle, dict):
+        size, words = puzzle.get('gridSize'), puzzle.get('words')
+    else:
+        return {'format': "谜题不是对象或数组"}
+    if not isinstance(words, list) or not words:
+        return {'format': "缺少单词列表"}
+    
+    entries = []
+    for i, w in enumerate(words):
+        try:
+            word, r, c, d = w['w'], w['r'], w['c'], w['d']
+        except (KeyError, TypeError):
+            fail('format', f"第 {i} 个单词缺少 w/r/c/d 字段")
+            continue
+        if not (isinstance(word, str) and word.isalpha() and word.isupper() and len(word) >= 2):
+            fail('format', f"第 {i} 个单词不是大写字母串: {word!r}")
+            continue
+        if d not in ('H', 'V') or not isinstance(r, int) or not isinstance(c, int):
+            fail('format', f"{word}: 位置或方向非法 ({r!r}, {c!r}, {d!r})")
+            continue
+        entries.append((i, word, r, c, d, w))
+    
+    # 边界
+    if not (isinstance(size, dict) and isinstance(size.get('rows'), int) and
+            isinstance(size.get('cols'), int)):
+        fail('bounds', "缺少 gridSize（页面只能猜测网格大小）")
+    else:
+        rows, cols = size['rows'], size['cols']
+        for _, word, r, c, d, _ in entries:
+            end_r = r if d == 'H' else r + len(word) - 1
+            end_c = c + len(word) - 1 if d == 'H' else c
+            if r < 0 or c < 0 or end_r >= rows or end_c >= cols:
+                fail('bounds', f"{word} ({r},{c},{d}) 超出 {rows}x{cols} 网格")
+    
+    # 连通性用并查集，共享格子的单词合并为一组
+    parent = list(range(len(entries)))
+    
+    def find(x: int) -> int:
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+    
+    # 交叉字母与同向重叠：逐格记录字母和各方向覆盖它的单词
+    letters: Dict[int, str] = {}
+    owners: Dict[str, Dict[int, int]] = {'H': {}, 'V': {}}
+    for index, (_, word, r, c, d, _) in enumerate(entries):
+        step = 1 if d == 'H' else CELL_STRIDE
+        cell = r * CELL_STRIDE + c
+        cover = owners[d]
+        for char in word:
+            existing = letters.setdefault(cell, char)
+            if existing != char:
+                fail('crossing', f"{word} 在 {_cell_name(cell)} 处与其他单词字母不一致 "
+                                 f"({existing}/{char})")
+            if cell in cover:
+                fail('adjacency', f"{word} 与同方向的 {entries[cover[cell]][1]} 重叠")
+                parent[find(cover[cell])] = find(index)
+            cover[cell] = index
+            cell += step
+    
+    # 平行相邻：同一行（列）上相邻的两个字母必须属于同一个横向（纵向）单词，
+    # 这同时排除了首尾紧贴其他字母和平行排列连成的未登记单词
+    for d, step in (('H', 1), ('V', CELL_STRIDE)):
+        cover = owners[d]
+        for cell in letters:
+            if cell + step in letters:
+                here = cover.get(cell)
+                if here is None or here != cover.get(cell + step):
+                    fail('adjacency', f"{_cell_name(cell)} 与{'右' if d == 'H' else '下'}侧字母"
+                                      f"连成了未登记的单词")
+    
+    # 连通性：横纵单词在交叉格合并
+    vertical = owners['V']
+    for cell, index in owners['H'].items():
+        other = vertical.get(cell)
+        if other is not None:
+            parent[find(other)] = find(index)
+    components = len({find(i) for i in range(len(entries))})
+    if components > 1:
+        fail('connectivity', f"单词分成了 {components} 个互不相交的部分")
+    
+    # 编号：起点按从上到下、从左到右排序，同一起点共用编号
+    starts = sorted({(r, c) for _, _, r, c, _, _ in entries})
+    numbers = {start: number for number, start in enumerate(starts, 1)}
+    for _, word, r, c, _, w in entries:
+        if w.get('n') != numbers[(r, c)]:
+            fail('numbering', f"{word} 的编号为 {w.get('n')!r}，按起点顺序应为 {numbers[(r, c)]}")
+    
+    # 提示
+    for _, word, _, _, _, w in entries:
+        hint = w.get('h')
+        if not isinstance(hint, str) or not hint.strip():
+            fail('hints', f"{word} 缺少提示")
+        elif PLACEHOLDER_HINT.match(hint):
+            fail('hints', f"{word} 只有占位提示: {hint}")
+    return failures
+
+def _validate_chunk(chunk: List[Tuple[str, int, object]]) -> List[Tuple[str, int, Dict[str, str]]]:
+    """校验一批谜题，只返回有失败的 (难度, 序号, 失败)"""
+    results = []
+    for difficulty, index, puzzle in chunk:
+        failures = validate_puzzle(puzzle)
+        if failures:
+            results.append((difficulty, index, failures))
+    return results
+
+# ==================== 题库读取 ====================
+
+def iter_shards(manifest_path: str, errors: List[str]) -> Iterator[Tuple[str, object]]:
+    """按清单读取分片题库，同时核对分片的 SHA-256 校验和"""
+    with open(manifest_path, 'r', encoding='utf-8') as f:
+        match = re.search(r'PUZZLE_DB_MANIFEST = (.*);\s*$', f.read(), re.DOTALL)
+    if not match:
+        raise ValueError(f"无法识别的分片清单: {manifest_path}")
+    manifest = json.loads(match.group(1))
+    directory = os.path.dirname(manifest_path)
+    for difficulty, info in manifest['difficulties'].items():
+        for shard in info['shards']:
+            with open(os.path.join(directory, shard['file']), 'rb') as f:
+                content = f.read()
+            if hashlib.sha256(content).hexdigest() != shard['sha256']:
+                errors.append(f"分片 {shard['file']} 的校验和与清单不一致")
+            payload = json.loads(content.decode('utf-8').split('] = ', 1)[1].rstrip().rstrip(';'))
+            puzzles = payload['puzzles']
+            if len(puzzles) != shard['end'] - shard['start']:
+                errors.append(f"分片 {shard['file']} 有 {len(puzzles)} 题，清单记录为 "
+                              f"{shard['end'] - shard['start']} 题")
+            for puzzle in puzzles:
+                if manifest.get('format') == 'compact':
+                    puzzle = unpack_puzzle(puzzle, payload['words'], payload['hints'])
+                yield difficulty, puzzle
+
+def iter_db(path: str, errors: List[str]) -> Iterator[Tuple[str, object]]:
+    """读取题库文件或分片清单，产出 (难度, 谜题)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(4096)
+    if 'PUZZLE_DB_MANIFEST' in head:
+        yield from iter_shards(path, errors)
+        return
+    reader = PuzzleDBReader(path)
+    for difficulty, puzzle in reader:
+        if reader.format == 'seeds':
+            raise ValueError("种子格式题库需先用 SeedPuzzleDB 重新生成后再校验")
+        yield difficulty, puzzle
+
+# ==================== 主程序 ====================
+
+def parse_args() -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description="填字游戏题库校验")
+    parser.add_argument('paths', nargs='+',
+                        help="题库文件（.js）或分片清单（manifest.js）")
+    parser.add_argument('-j', '--workers', type=int, default=0,
+                        help="校验进程数 (默认 0 = CPU 核心数)")
+    parser.add_argument('--chunk-size', type=int, default=2000,
+                        help="每批交给一个进程的谜题数 (默认 2000)")
+    parser.add_argument('--skip', action='append', choices=list(RULES), default=[],
+                        help="跳过指定规则，可重复指定")
+    parser.add_argument('--strict', action='store_true',
+                        help=f"{'/'.join(WARNING_RULES)} 规则的失败也计入退出状态（默认只报告为警告）")
+    parser.add_argument('--examples', type=int, default=5,
+                        help="每条规则在报告中列出的失败示例数 (默认 5)")
+    parser.add_argument('--report', default=None, metavar='FILE',
+                        help="把完整报告保存为 JSON")
+    return parser.parse_args()
+
+def validate_db(path: str, pool: Optional[Pool], chunk_size: int,
+                skip: List[str], examples: int, warn: Tuple[str, ...] = WARNING_RULES) -> dict:
+    """校验一个题库，返回报告；warn 中规则的失败只计入 warned_puzzles"""
+    started = time.perf_counter()
+    errors: List[str] = []
+    counts: Dict[str, int] = defaultdict(int)
+    failed: Dict[str, int] = {rule: 0 for rule in RULES if rule not in skip}
+    samples: Dict[str, List[dict]] = {rule: [] for rule in failed}
+    failed_puzzles = 0
+    warned_puzzles = 0
+    
+    def chunks() -> Iterator[List[Tuple[str, int, object]]]:
+        chunk = []
+        for difficulty, puzzle in iter_db(path, errors):
+            chunk.append((difficulty, counts[difficulty], puzzle))
+            counts[difficulty] += 1
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    
+    results = pool.imap(_validate_chunk, chunks()) if pool else map(_validate_chunk, chunks())
+    for chunk_results in results:
+        for difficulty, index, failures in chunk_results:
+            failures = {rule: message for rule, message in failures.items() if rule in failed}
+            if not failures:
+                continue
+            if any(rule not in warn for rule in failures):
+                failed_puzzles += 1
+            else:
+                warned_puzzles += 1
+            for rule, message in failures.items():
+                failed[rule] += 1
+                if len(samples[rule]) < examples:
+                    samples[rule].append({'difficulty': difficulty, 'index': index,
+                                          'message': message})
+    
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    return {
+        'path': path,
+        'puzzles': total,
+        'counts': dict(counts),
+        'failed_puzzles': failed_puzzles,
+        'warned_puzzles': warned_puzzles,
+        'rules': {rule: {'failed': failed[rule], 'warning': rule in warn,
+                         'examples': samples[rule]} for rule in failed},
+        'errors': errors,
+        'seconds': round(elapsed, 3),
+        'puzzles_per_sec': round(total / elapsed, 1) if elapsed else 0.0,
+    }
+
+def print_report(report: dict):
+    """打印按规则汇总的报告"""
+    print(f"\n{report['path']}: {report['puzzles']} 题 "
+          f"({', '.join(f'{d}={n}' for d, n in report['counts'].items())}), "
+          f"用时 {report['seconds']} 秒 ({report['puzzles_per_sec']} 题/秒)")
+    for message in report['errors']:
+        print(f"  错误: {message}")
+    for rule, result in report['rules'].items():
+        if not result['failed']:
+            status = "通过"
+        else:
+            status = f"{result['failed']} 题{'警告' if result['warning'] else '失败'}"
+        print(f"  {rule:13s} {status:>12s}  {RULES[rule]}")
+        for example in result['examples']:
+            print(f"      - {example['difficulty']} #{example['index']}: {example['message']}")
+    if report['failed_puzzles'] or report['errors']:
+        print(f"  共 {report['failed_puzzles']} 题未通过校验")
+    elif report['warned_puzzles']:
+        print(f"  全部通过（{report['warned_puzzles']} 题有警告）")
+    else:
+        print("  全部通过")
+
+def main() -> int:
+    """主函数"""
+    args = parse_args()
+    workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+    warn = () if args.strict else WARNING_RULES
+    
+    print("=" * 50)
+    print("填字游戏题库校验")
+    print("=" * 50)
+    
+    reports = []
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        for path in args.paths:
+            try:
+                report = validate_db(path, pool, args.chunk_size, args.skip, args.examples, warn)
+            except (OSError, ValueError) as e:
+                print(f"\n错误: 无法读取 {path}: {e}")
+                report = {'path': path, 'puzzles': 0, 'failed_puzzles': 0, 'errors': [str(e)]}
+                reports.append(report)
+                continue
+            print_report(report)
+            reports.append(report)
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+    
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            json.dump(reports, f, ensure_ascii=False, indent=2)
+        print(f"\n报告已保存到 {args.report}")
+    return 1 if any(r['failed_puzzles'] or r['errors'] for r in reports) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())